@@ -77,6 +77,28 @@ def unique_slugify(instance, value, slug_field_name='slug', queryset=None,
     setattr(instance, slug_field.attname, slug)
 
 
+def unique_slug(value, taken, slug_len=None, slug_separator='-'):
+    """
+    Returns a slug of ``value`` that is not in the set ``taken``, adding '-2',
+    '-3', etc. the way ``unique_slugify`` does.  The set is checked instead of
+    the database so slugs for many objects can be made without any queries.
+    """
+    slug = slugify(value)
+    if slug_len:
+        slug = slug[:slug_len]
+    slug = _slug_strip(slug, slug_separator)
+    original_slug = slug
+    next = 2
+    while not slug or slug in taken:
+        slug = original_slug
+        end = '%s%s' % (slug_separator, next)
+        if slug_len and len(slug) + len(end) > slug_len:
+            slug = slug[:slug_len-len(end)]
+            slug = _slug_strip(slug, slug_separator)
+        slug = '%s%s' % (slug, end)
+        next += 1
+    return slug
+
 def _slug_strip(value, separator='-'):
     """
     Cleans up a slug by removing slug separator characters that occur at the
@@ -0,0 +1,48 @@
+# file actions.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Helpers for admin actions.
+
+from django.contrib.admin import helpers
+from django.shortcuts import render_to_response
+from django.template import RequestContext
+
+def bulk_form(modeladmin, request, queryset, form_class, apply, message):
+    '''
+    Asks for the arguments of a bulk action on an intermediate page and
+    applies it to the selection once they are submitted.
+
+    :param form_class: Form asking for the arguments.
+    :param apply: Callable taking the queryset and the cleaned form data and
+                  returning the number of objects changed.
+    :param message: Message for the user with a %s for that number.
+
+    '''
+    if 'apply' in request.POST:
+        form = form_class(request.POST)
+        if form.is_valid():
+            count = apply(queryset, form.cleaned_data)
+            modeladmin.message_user(request, message % count)
+            return None
+    else:
+        form = form_class()
+    return render_to_response('admin/bulk_action.html', {
+        'title': modeladmin.get_actions(request)[request.POST['action']][2],
+        'opts': modeladmin.model._meta,
+        'form': form,
+        'action': request.POST['action'],
+        'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        }, context_instance=RequestContext(request))
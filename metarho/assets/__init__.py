@@ -0,0 +1,33 @@
+# file assets/__init__.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Assets
+======
+
+Fingerprinted copies of the media.  ``manage.py buildassets`` copies every
+file of ``ASSETS_SOURCE`` to ``ASSETS_ROOT`` under a name holding a hash of
+its content, next to a copy under its own name for scripts such as TinyMCE
+that load files relative to themselves.  Text files get gzip and, when the
+brotli module is installed, brotli siblings, and ``manifest.json`` maps each
+logical name to its hashed name.
+
+``{% load asset_tags %}{% asset "style/layout.css" %}`` returns the url of
+the hashed copy, or the file under ``MEDIA_URL`` before a build.  A hashed
+name never changes content, so it is served with a far future
+``Cache-Control``, see ``metarho.assets.views.serve``.
+
+"""
@@ -0,0 +1,39 @@
+# file buildassets.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from metarho.assets.manifest import SIBLINGS
+from metarho.assets.manifest import build
+
+class Command(BaseCommand):
+    help = ('Copies the media to content hashed names with compressed siblings and a manifest '
+            'the asset template tag reads, run it on every deploy.')
+
+    option_list = BaseCommand.option_list + (
+            make_option("--source", dest="source", default=None,
+                        help="Directory of the media, ASSETS_SOURCE by default."),
+            make_option("--output", dest="output", default=None,
+                        help="Directory the build is written to, ASSETS_ROOT by default."),
+        )
+
+    def handle(self, *args, **options):
+        mapping, (plain, compressed) = build(options['source'], options['output'])
+        sys.stderr.write('Built %s files, %s bytes, %s bytes compressed with %s.\n' % (len(mapping),
+                         plain, compressed, ', '.join([coding for coding, ext in SIBLINGS])))
@@ -0,0 +1,154 @@
+# file assets/manifest.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import posixpath
+import re
+import time
+
+from django.conf import settings
+from django.utils import simplejson
+from django.utils.hashcompat import md5_constructor
+
+from metarho.caching.variants import CODINGS
+from metarho.caching.variants import compress
+
+MANIFEST_NAME = 'manifest.json'
+
+# Files with these extensions get compressed siblings.
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.htm', '.html', '.svg', '.txt', '.xml', '.json', '.ico')
+
+# Content codings written next to the files with their extension, in order
+# of preference.  Codings whose module is not installed are left out.
+SIBLINGS = [(coding, ext) for coding, ext in (('br', '.br'), ('gzip', '.gz')) if coding in dict(CODINGS)]
+
+# Relative references in style sheets, rewritten to the hashed names.
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+# Characters of the content hash kept in the name.
+HASH_LENGTH = 12
+
+def hashed_name(name, content):
+    '''Returns ``name`` with a hash of ``content`` before its extension.'''
+    root, ext = posixpath.splitext(name)
+    return '%s.%s%s' % (root, md5_constructor(content).hexdigest()[:HASH_LENGTH], ext)
+
+def _rewrite_css(name, content, manifest):
+    '''Points the relative url()s of a style sheet to the hashed names.'''
+    directory = posixpath.dirname(name)
+    def replace(match):
+        quote, url = match.groups()
+        if ':' in url or url.startswith('/') or url.startswith('#'):
+            return match.group(0)
+        path, suffix = url, ''
+        for mark in ('?', '#'):
+            if mark in path:
+                path, rest = path.split(mark, 1)
+                suffix = mark + rest + suffix
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in manifest:
+            return match.group(0)
+        return 'url(%s%s%s%s)' % (quote, posixpath.relpath(manifest[target], directory or '.'), suffix, quote)
+    return CSS_URL.sub(replace, content)
+
+def _write(path, content):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    out = open(path, 'wb')
+    try:
+        out.write(content)
+    finally:
+        out.close()
+
+def _siblings(path, content):
+    '''Writes the compressed siblings of a file that are smaller than it, returns their sizes.'''
+    sizes = {}
+    if os.path.splitext(path)[1].lower() not in COMPRESSED_EXTENSIONS:
+        return sizes
+    for coding, ext in SIBLINGS:
+        encoded = compress(coding, content)
+        if len(encoded) < len(content):
+            _write(path + ext, encoded)
+            sizes[coding] = len(encoded)
+    return sizes
+
+def build(source=None, output=None):
+    '''
+    Copies the files of ``source`` to ``output`` under their own and their
+    hashed names with their compressed siblings, and writes the manifest.
+    Files of earlier builds are kept so pages rendered before a deploy still
+    find them.  Returns the manifest and the total of (plain, compressed)
+    bytes of the hashed copies.
+
+    '''
+    source = source or settings.ASSETS_SOURCE
+    output = output or settings.ASSETS_ROOT
+    names = []
+    for directory, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            full = os.path.join(directory, filename)
+            names.append(os.path.relpath(full, source).replace(os.sep, '/'))
+    # Style sheets last, they refer to the hashed names of the others.
+    names.sort(key=lambda name: name.endswith('.css'))
+
+    mapping, plain, compressed = {}, 0, 0
+    for name in names:
+        content = open(os.path.join(source, name), 'rb').read()
+        if name.endswith('.css'):
+            content = _rewrite_css(name, content, mapping)
+        mapping[name] = hashed_name(name, content)
+        for copy in (name, mapping[name]):
+            path = os.path.join(output, *copy.split('/'))
+            _write(path, content)
+            sizes = _siblings(path, content)
+        plain += len(content)
+        compressed += min([len(content)] + sizes.values())
+    _write(os.path.join(output, MANIFEST_NAME), simplejson.dumps(mapping, indent=1, sort_keys=True))
+    _cache.clear()
+    return mapping, (plain, compressed)
+
+_cache = {}
+
+def manifest(output=None):
+    '''
+    Returns the manifest of the latest build, an empty one before the first
+    build.  The file is checked at most every ASSETS_CHECK_INTERVAL seconds
+    and read again when it changed.
+
+    '''
+    path = os.path.join(output or settings.ASSETS_ROOT, MANIFEST_NAME)
+    now = time.time()
+    checked, mtime, mapping = _cache.get(path, (None, None, {}))
+    if checked is not None and now - checked < getattr(settings, 'ASSETS_CHECK_INTERVAL', 5):
+        return mapping
+    try:
+        current = os.stat(path).st_mtime
+    except OSError:
+        current, mapping = None, {}
+    else:
+        if current != mtime:
+            mapping = simplejson.load(open(path))
+    _cache[path] = (now, current, mapping)
+    return mapping
+
+def asset_url(name):
+    '''Returns the url of the hashed copy of a file, or of the file under MEDIA_URL before a build.'''
+    hashed = manifest().get(name)
+    if hashed is None:
+        return '%s/%s' % (settings.MEDIA_URL.rstrip('/'), name)
+    return settings.ASSETS_URL + hashed
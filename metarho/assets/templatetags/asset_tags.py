@@ -0,0 +1,31 @@
+# file asset_tags.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tags resolving the logical names of media files to their fingerprinted urls.
+from django import template
+
+from metarho.assets.manifest import asset_url
+
+register = template.Library()
+
+@register.simple_tag
+def asset(name):
+    '''
+    Returns the url of the hashed copy of a media file, ie
+    {% asset "style/layout.css" %}.
+
+    '''
+    return asset_url(name)
@@ -0,0 +1,92 @@
+# file assets/tests.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+from gzip import GzipFile
+from StringIO import StringIO
+
+from django.test import TestCase
+from django.conf import settings
+from django.http import HttpRequest
+from django.template import Context
+from django.template import Template
+
+from metarho.assets.manifest import build
+from metarho.assets.manifest import manifest
+from metarho.assets.manifest import MANIFEST_NAME
+from metarho.assets.manifest import hashed_name
+from metarho.assets.views import serve
+
+CSS = 'body { background: url("images/bg.png") repeat-x; }\n' * 20
+
+class BuildTest(TestCase):
+    '''Tests building fingerprinted media.'''
+
+    def setUp(self):
+        self.source, self.output = tempfile.mkdtemp(), tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.source, 'style', 'images'))
+        open(os.path.join(self.source, 'style', 'layout.css'), 'w').write(CSS)
+        open(os.path.join(self.source, 'style', 'images', 'bg.png'), 'wb').write('\x89PNG')
+        self.saved = settings.ASSETS_ROOT
+        settings.ASSETS_ROOT = self.output
+
+    def tearDown(self):
+        settings.ASSETS_ROOT = self.saved
+        shutil.rmtree(self.source)
+        shutil.rmtree(self.output)
+
+    def test_build(self):
+        '''Files get hashed copies, style sheets point to them and text is compressed.'''
+        mapping, sizes = build(self.source, self.output)
+        image = hashed_name('style/images/bg.png', '\x89PNG')
+        self.failUnlessEqual(image, mapping['style/images/bg.png'], 'Unexpected hashed name %s' % mapping)
+        css = open(os.path.join(self.output, *mapping['style/layout.css'].split('/'))).read()
+        self.failUnless('url("%s")' % image[len('style/'):] in css, 'The style sheet was not rewritten: %s' % css[:80])
+        self.failUnless(os.path.exists(os.path.join(self.output, 'style', 'layout.css')), 'The plain name is missing.')
+        self.failIf(os.path.exists(os.path.join(self.output, *image.split('/')) + '.gz'), 'Images are not compressed.')
+        self.failUnless(sizes[1] < sizes[0], 'Expected smaller compressed sizes but were %s' % (sizes,))
+
+        rendered = Template('{% load asset_tags %}{% asset "style/layout.css" %}').render(Context())
+        self.failUnlessEqual(settings.ASSETS_URL + mapping['style/layout.css'], rendered, 'Unexpected url %s' % rendered)
+
+        request = HttpRequest()
+        request.method = 'GET'
+        request.META['HTTP_ACCEPT_ENCODING'] = 'gzip'
+        response = serve(request, mapping['style/layout.css'])
+        self.failUnlessEqual('gzip', response['Content-Encoding'], 'Expected the gzip sibling.')
+        self.failUnless(response['Content-Type'].startswith('text/css'), 'Unexpected type %s' % response['Content-Type'])
+        self.failUnlessEqual(css, GzipFile(fileobj=StringIO(response.content)).read(), 'The sibling differs.')
+        self.failUnless('max-age=%s' % settings.ASSETS_MAX_AGE in response['Cache-Control'], 'Hashed names are cached for long.')
+        response = serve(request, 'style/layout.css')
+        self.failIf(response.has_header('Cache-Control'), 'Plain names must not be cached for long.')
+
+    def test_check_interval(self):
+        '''The manifest is checked for changes at most every ASSETS_CHECK_INTERVAL seconds.'''
+        mapping, sizes = build(self.source, self.output)
+        self.failUnlessEqual(mapping, manifest(), 'The built manifest was not read.')
+        path = os.path.join(self.output, MANIFEST_NAME)
+        open(path, 'w').write('{}')
+        os.utime(path, (0, 0))
+        self.failUnlessEqual(mapping, manifest(), 'The manifest was checked again within the interval.')
+        interval = settings.ASSETS_CHECK_INTERVAL
+        settings.ASSETS_CHECK_INTERVAL = 0
+        try:
+            self.failUnlessEqual({}, manifest(), 'The changed manifest was not read.')
+        finally:
+            settings.ASSETS_CHECK_INTERVAL = interval
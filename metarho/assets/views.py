@@ -0,0 +1,62 @@
+# file assets/views.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.utils.cache import patch_vary_headers
+from django.views import static
+
+from metarho.assets.manifest import SIBLINGS
+from metarho.assets.manifest import manifest
+from metarho.decorators import accepted_types
+
+def _sibling(request, path, root):
+    '''Returns the (coding, extension) of the compressed sibling to answer with, if any.'''
+    if posixpath.normpath(path) != path or path.startswith('..'):
+        return None
+    accepted = dict(accepted_types(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+    for coding, ext in SIBLINGS:
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0 and \
+                os.path.isfile(os.path.join(root, *path.split('/')) + ext):
+            return coding, ext
+    return None
+
+def serve(request, path, document_root=None):
+    '''
+    Serves a file of the asset build, compressed when the client accepts
+    the coding of one of its siblings.  Hashed names are cached by clients
+    for ASSETS_MAX_AGE seconds.  Front end servers should do the same, this
+    view is meant for development.
+
+    '''
+    root = document_root or settings.ASSETS_ROOT
+    sibling = _sibling(request, path, root)
+    if sibling:
+        coding, ext = sibling
+        response = static.serve(request, path + ext, root)
+        if response.status_code == 200:
+            response['Content-Type'] = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            response['Content-Encoding'] = coding
+    else:
+        response = static.serve(request, path, root)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if path in manifest(root).values():
+        patch_cache_control(response, public=True, max_age=getattr(settings, 'ASSETS_MAX_AGE', 365 * 24 * 60 * 60))
+    return response
@@ -0,0 +1,26 @@
+# file benchmark/__init__.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmarks
+==========
+
+Tools for measuring the hot paths of the site against generated data.  The
+``benchmark`` management command builds a throwaway test database, fills it
+with a deterministic synthetic blog and requests every public URL through the
+test client, recording time, SQL queries and memory for each one.
+
+"""
@@ -0,0 +1,159 @@
+# file benchmark/data.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from datetime import datetime
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+
+from metarho import PUBLISHED_STATUS
+from metarho import UNPUBLISHED_STATUS
+from metarho.blog.models import Post
+from metarho.blog.models import PostMeta
+from metarho.ontology.models import Tag
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import Topic
+from metarho.ontology.models import TopicCatalog
+from metarho.sitemeta.models import SiteInformation
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua enim ad '
+         'minim veniam quis nostrud exercitation ullamco laboris nisi aliquip '
+         'ex ea commodo consequat duis aute irure in reprehenderit voluptate '
+         'velit esse cillum fugiat nulla pariatur excepteur sint occaecat').split()
+
+class SyntheticBlog(object):
+    '''
+    Generates a deterministic blog for benchmarking.
+
+    The same parameters and seed always produce the same posts, tags, topics
+    and authors so results from different runs can be compared.
+
+    :param posts: Number of posts to create.
+    :param tags: Number of tags to create.
+    :param topic_depth: Depth of the topic tree.
+    :param topic_breadth: Number of children of each topic in the tree.
+    :param meta_per_post: Number of PostMeta rows for each post.
+    :param authors: Number of authors posts are spread over.
+    :param tags_per_post: Maximum number of tags on a post.
+    :param unpublished: Ratio of posts left unpublished.
+    :param seed: Seed for the random generator.
+
+    '''
+
+    def __init__(self, posts=200, tags=50, topic_depth=3, topic_breadth=3,
+                 meta_per_post=4, authors=5, tags_per_post=5, unpublished=0.1,
+                 seed=1):
+        self.post_count = posts
+        self.tag_count = tags
+        self.topic_depth = topic_depth
+        self.topic_breadth = topic_breadth
+        self.meta_per_post = meta_per_post
+        self.author_count = authors
+        self.tags_per_post = tags_per_post
+        self.unpublished = unpublished
+        self.random = random.Random(seed)
+        self.start = datetime(2005, 1, 1, 9, 0)
+
+        self.authors = []
+        self.tags = []
+        self.topics = []
+        self.posts = []
+
+    def parameters(self):
+        '''Returns the generation parameters as a dictionary.'''
+        return {
+            'posts': self.post_count,
+            'tags': self.tag_count,
+            'topic_depth': self.topic_depth,
+            'topic_breadth': self.topic_breadth,
+            'meta_per_post': self.meta_per_post,
+            'authors': self.author_count,
+        }
+
+    def generate(self):
+        '''Creates all the objects for the blog.'''
+        self.make_authors()
+        self.make_site_information()
+        self.make_tags()
+        self.make_topics()
+        self.make_posts()
+
+    def words(self, count):
+        '''Returns a string of ``count`` random words.'''
+        return ' '.join([self.random.choice(WORDS) for i in range(count)])
+
+    def make_authors(self):
+        '''Creates the authors, half of them with full names.'''
+        for i in range(self.author_count):
+            user = User(username='author%s' % i, email='author%s@example.com' % i)
+            if i % 2:
+                user.first_name = 'Author'
+                user.last_name = str(i)
+            user.save()
+            self.authors.append(user)
+
+    def make_site_information(self):
+        '''Creates the default SiteInformation the feeds depend on.'''
+        info = SiteInformation(title='Benchmark Blog', slug='benchmark-blog')
+        info.site = Site.objects.get_current()
+        info.owner = self.authors[0]
+        info.description = self.words(12)
+        info.save()
+
+    def make_tags(self):
+        '''Creates the tags.'''
+        for i in range(self.tag_count):
+            tag = Tag(text='%s %s' % (self.random.choice(WORDS), i), slug='tag-%s' % i)
+            tag.save()
+            self.tags.append(tag)
+
+    def make_topics(self, parent=None, level=1):
+        '''Creates a topic tree ``topic_depth`` levels deep.'''
+        if level > self.topic_depth:
+            return
+        for i in range(self.topic_breadth):
+            topic = Topic(text='%s %s' % (self.random.choice(WORDS).title(), i),
+                          slug='topic-%s-%s' % (level, i), parent=parent)
+            topic.save()
+            self.topics.append(topic)
+            self.make_topics(topic, level + 1)
+
+    def make_posts(self):
+        '''Creates posts spread over several years with their meta and catalog rows.'''
+        for i in range(self.post_count):
+            post = Post(title='%s %s' % (self.words(4).capitalize(), i))
+            post.slug = 'post-%s' % i
+            post.author = self.random.choice(self.authors)
+            post.content = '<p>%s</p>' % self.words(self.random.randint(100, 600))
+            if self.random.random() < 0.5:
+                post.teaser = self.words(40)
+            post.pub_date = self.start + timedelta(days=i * 2, hours=self.random.randint(0, 12))
+            post.status = PUBLISHED_STATUS
+            if self.random.random() < self.unpublished:
+                post.status = UNPUBLISHED_STATUS
+            post.save()
+            self.posts.append(post)
+
+            PostMeta(post=post, key='wp_post_id', value=str(i + 1)).save()
+            for m in range(self.meta_per_post - 1):
+                PostMeta(post=post, key='meta_%s' % m, value=self.words(3)).save()
+            for tag in self.random.sample(self.tags, self.random.randint(0, min(self.tags_per_post, len(self.tags)))):
+                TaggedItem(content_object=post, tag=tag).save()
+            if self.topics:
+                TopicCatalog(content_object=post, topic=self.random.choice(self.topics)).save()
@@ -0,0 +1,79 @@
+# file benchmark/imports.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from django.core.management import call_command
+
+from metarho.benchmark.runner import peak_rss
+from metarho.blog.importer import WordPressExportParser
+from metarho.instrumentation import recorder
+
+def measure_phase(fn, items):
+    '''
+    Calls ``fn`` and returns the time, throughput, queries and peak memory
+    of the call.  Queries are counted with the instrumentation recorder so
+    long imports don't keep every statement in memory.
+
+    :param fn: Callable running the phase.
+    :param items: Number of items the phase handles.
+
+    '''
+    rec = recorder.start()
+    start = time.time()
+    try:
+        fn()
+    finally:
+        elapsed = time.time() - start
+        recorder.stop()
+    result = {
+        'items': items,
+        'time': round(elapsed, 4),
+        'queries': rec.queries,
+        'sql_time': round(rec.sql_time, 4),
+        'peak_rss_kb': peak_rss(),
+    }
+    result['items_per_second'] = elapsed and round(items / elapsed, 2) or None
+    result['queries_per_item'] = items and round(float(rec.queries) / items, 2) or None
+    return result
+
+def run_parser(path, username):
+    '''
+    Runs each phase of WordPressExportParser against an export file and
+    returns the measurements keyed by phase.
+
+    '''
+    results = {}
+    holder = {}
+    def parse():
+        holder['parser'] = WordPressExportParser(path, username)
+    results['parse_file'] = measure_phase(parse, 1)
+
+    wp = holder['parser']
+    chan = wp.chan
+    phases = (
+        ('site_information', wp.import_site_information, 1),
+        ('tags', wp.import_tags, len(chan.findall(wp.wp_ns + 'tag'))),
+        ('categories', wp.import_catagories, len(chan.findall(wp.wp_ns + 'category'))),
+        ('posts', wp.import_posts, len(chan.findall('item'))),
+    )
+    for name, fn, items in phases:
+        results[name] = measure_phase(fn, items)
+    return results
+
+def run_command(path, username, items):
+    '''Runs the blogimport command end to end against an export file.'''
+    return measure_phase(lambda: call_command('blogimport', path, username=username), items)
@@ -0,0 +1,216 @@
+# file benchmark/runner.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import resource
+import time
+from StringIO import StringIO
+
+from django.conf import settings
+from django.db import connection
+from django.core.handlers.wsgi import WSGIRequest
+from django.core.urlresolvers import get_resolver
+from django.core.urlresolvers import reverse
+from django.core.urlresolvers import RegexURLResolver
+from django.test.client import Client
+
+from metarho.blog.models import Post
+from metarho.blog.feeds import PostsFeed
+from metarho.blog.feeds import PostsFeedAtom
+from metarho.blog.feeds import feed_render
+from metarho.blog.sitemaps import SITEMAP_SIZE
+from metarho.ontology.models import Tag
+from metarho.ontology.models import Topic
+
+# URLs that are not public pages and are left out of the run.
+EXCLUDED_NAMESPACES = ('admin',)
+EXCLUDED_NAMES = ('instrumentation-stats',)
+
+def peak_rss():
+    '''Returns the peak resident set size of this process in kilobytes.'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def url_names(resolver=None, namespace=None):
+    '''
+    Returns the names of all named URL patterns in the URLconf, prefixed with
+    their namespace as they would be passed to ``reverse``.
+
+    '''
+    if resolver is None:
+        resolver = get_resolver(None)
+    names = []
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, RegexURLResolver):
+            ns = pattern.namespace or namespace
+            if ns in EXCLUDED_NAMESPACES:
+                continue
+            if pattern.namespace and namespace:
+                ns = '%s:%s' % (namespace, pattern.namespace)
+            names.extend(url_names(pattern, ns))
+        elif pattern.name and pattern.name not in EXCLUDED_NAMES:
+            if namespace:
+                names.append('%s:%s' % (namespace, pattern.name))
+            else:
+                names.append(pattern.name)
+    return names
+
+def _date_args(date, parts):
+    '''Returns the url arguments for a date archive.'''
+    args = [date.strftime('%Y'), date.strftime('%b'), str(date.day)]
+    return args[:parts]
+
+def endpoints():
+    '''
+    Returns a list of (name, url) tuples to request, covering each named URL
+    pattern with an example built from the database.
+
+    Archive urls also get a ``?format=rss`` variant for their feed and post
+    urls a ``?format=json`` variant.
+
+    '''
+    post = Post.objects.published().order_by('-pub_date')[0]
+    tag = Tag.objects.filter(taggeditem__isnull=False)[0]
+    topic = Topic.objects.filter(topiccatalog__isnull=False)[0]
+    args = {
+        'site-index': [],
+        'blog:index': [],
+        'blog:archive-list': [],
+        'blog:list-year': _date_args(post.pub_date, 1),
+        'blog:list-month': _date_args(post.pub_date, 2),
+        'blog:list-day': _date_args(post.pub_date, 3),
+        'blog:post-detail': _date_args(post.pub_date, 3) + [post.slug],
+        'blog:tag-list': [tag.slug],
+        'blog:post-topic': [topic.path],
+        'blog:sitemap': [],
+        'blog:sitemap-posts': [post.pk // SITEMAP_SIZE],
+        'blog:sitemap-pages': [0],
+    }
+    feeds = ('blog:index', 'blog:list-year', 'blog:list-month', 'blog:list-day')
+    json = feeds + ('blog:post-detail', 'blog:tag-list')
+
+    found = []
+    for name in url_names():
+        if name not in args:
+            raise KeyError('No benchmark arguments for url %s.  Add it to '
+                           'metarho.benchmark.runner.endpoints.' % name)
+        url = reverse(name, args=args[name])
+        found.append((name, url))
+        if name in feeds:
+            found.append(('%s?format=rss' % name, '%s?format=rss' % url))
+        if name in json:
+            found.append(('%s?format=json' % name, '%s?format=json' % url))
+    return found
+
+def _feed_request(path):
+    '''Returns a bare GET request for calling a feed class directly.'''
+    return WSGIRequest({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'SCRIPT_NAME': '',
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'wsgi.input': StringIO(),
+    })
+
+def feed_endpoints():
+    '''
+    Returns (name, callable) tuples rendering every feed class over all
+    published posts, independent of which ones are routed.
+
+    '''
+    found = []
+    for feed_class in (PostsFeed, PostsFeedAtom):
+        def render(feed_class=feed_class):
+            feed = feed_class('myslug', _feed_request(reverse('blog:index')))
+            feed.items = Post.objects.published().order_by('-pub_date')
+            return feed_render(feed)
+        found.append(('feed:%s' % feed_class.__name__, render))
+    return found
+
+def measure(fn):
+    '''
+    Calls ``fn`` and returns its response and a dictionary with the wall
+    time, SQL queries and memory it took.  ``settings.DEBUG`` must be on for
+    queries to be recorded.
+
+    '''
+    rss_before = peak_rss()
+    del connection.queries[:]
+    start = time.time()
+    response = fn()
+    content = response.content # Consume content so lazy output is counted.
+    elapsed = time.time() - start
+    return response, {
+        'status': response.status_code,
+        'time': round(elapsed, 4),
+        'queries': len(connection.queries),
+        'bytes': len(content),
+        'peak_rss_kb': peak_rss(),
+        'rss_growth_kb': peak_rss() - rss_before,
+    }
+
+def run(repeat=3):
+    '''
+    Requests every endpoint ``repeat`` times and returns the results keyed by
+    endpoint name.  Time is the best of the runs, queries and memory are
+    taken from the first run.  The response cache is off so every run
+    renders.
+
+    '''
+    debug = settings.DEBUG
+    timeout = getattr(settings, 'CACHE_VARIANTS_TIMEOUT', 0)
+    settings.DEBUG = True
+    settings.CACHE_VARIANTS_TIMEOUT = 0
+    try:
+        client = Client()
+        calls = [(name, lambda url=url: client.get(url)) for name, url in endpoints()]
+        calls.extend(feed_endpoints())
+        results = {}
+        for name, fn in calls:
+            response, result = measure(fn)
+            for i in range(repeat - 1):
+                result['time'] = min(result['time'], measure(fn)[1]['time'])
+            results[name] = result
+        return results
+    finally:
+        settings.DEBUG = debug
+        settings.CACHE_VARIANTS_TIMEOUT = timeout
+
+def compare(results, baseline, tolerance=1.5, floor=0.01):
+    '''
+    Compares results to a baseline and returns a list of regression messages.
+
+    Any increase in SQL queries is a regression since the data is
+    deterministic.  Times are regressions when they are more than
+    ``tolerance`` times the baseline and slower by at least ``floor`` seconds.
+
+    :param results: Results as returned by ``run``.
+    :param baseline: Results of a previous run to compare against.
+    :param tolerance: Allowed ratio of time to baseline time.
+    :param floor: Minimum slow down in seconds worth reporting.
+
+    '''
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['status'] != base['status']:
+            regressions.append('%s: status %s, baseline %s' % (name, result['status'], base['status']))
+        if result['queries'] > base['queries']:
+            regressions.append('%s: %s queries, baseline %s' % (name, result['queries'], base['queries']))
+        if result['time'] > base['time'] * tolerance and result['time'] - base['time'] > floor:
+            regressions.append('%s: %.4fs, baseline %.4fs' % (name, result['time'], base['time']))
+    return regressions
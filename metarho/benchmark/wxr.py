@@ -0,0 +1,159 @@
+# file benchmark/wxr.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from datetime import datetime
+from datetime import timedelta
+from xml.sax.saxutils import XMLGenerator
+
+from metarho.benchmark.data import WORDS
+
+WP_NS = 'http://wordpress.org/export/1.0/'
+NAMESPACES = {
+    'xmlns:excerpt': 'http://wordpress.org/export/1.0/excerpt/',
+    'xmlns:content': 'http://purl.org/rss/1.0/modules/content/',
+    'xmlns:dc': 'http://purl.org/dc/elements/1.1/',
+    'xmlns:wp': WP_NS,
+}
+
+class SyntheticWXR(object):
+    '''
+    Writes a deterministic WordPress eXtended RSS export of a given size.
+
+    Items are written one at a time so files far larger than memory can be
+    generated.
+
+    :param posts: Number of post items.
+    :param tags: Number of tags.
+    :param category_depth: Depth of the nested category tree.
+    :param category_breadth: Number of child categories of each category.
+    :param meta_per_item: Number of wp:postmeta elements per item.
+    :param body_words: Number of words in each post body.
+    :param tags_per_item: Maximum number of tags on an item.
+    :param seed: Seed for the random generator.
+
+    '''
+
+    def __init__(self, posts=1000, tags=100, category_depth=3, category_breadth=3,
+                 meta_per_item=4, body_words=400, tags_per_item=5, seed=1):
+        self.posts = posts
+        self.tags = tags
+        self.category_depth = category_depth
+        self.category_breadth = category_breadth
+        self.meta_per_item = meta_per_item
+        self.body_words = body_words
+        self.tags_per_item = tags_per_item
+        self.random = random.Random(seed)
+        self.start = datetime(2005, 1, 1, 9, 0)
+
+    def parameters(self):
+        '''Returns the generation parameters as a dictionary.'''
+        return {
+            'posts': self.posts,
+            'tags': self.tags,
+            'category_depth': self.category_depth,
+            'category_breadth': self.category_breadth,
+            'meta_per_item': self.meta_per_item,
+            'body_words': self.body_words,
+        }
+
+    def words(self, count):
+        '''Returns a string of ``count`` random words.'''
+        return ' '.join([self.random.choice(WORDS) for i in range(count)])
+
+    def categories(self, parent='', level=1):
+        '''
+        Returns (nicename, parent nicename) tuples for the category tree with
+        parents before their children, as the importer expects.
+
+        '''
+        found = []
+        if level > self.category_depth:
+            return found
+        for i in range(self.category_breadth):
+            nicename = '%s-%s' % (parent or 'cat', i)
+            found.append((nicename, parent))
+            found.extend(self.categories(nicename, level + 1))
+        return found
+
+    def write(self, out):
+        '''Writes the export to the file like object ``out``.'''
+        xml = XMLGenerator(out, 'utf-8')
+        xml.startDocument()
+        xml.startElement('rss', dict(NAMESPACES, version='2.0'))
+        xml.startElement('channel', {})
+        self._element(xml, 'title', 'Synthetic Blog')
+        self._element(xml, 'link', 'http://synthetic.example.com')
+        self._element(xml, 'description', 'A generated WordPress export.')
+        self._element(xml, 'wp:wxr_version', '1.0')
+        self._element(xml, 'wp:base_site_url', 'http://synthetic.example.com/')
+        self._element(xml, 'wp:base_blog_url', 'http://synthetic.example.com/')
+
+        categories = self.categories()
+        for nicename, parent in categories:
+            xml.startElement('wp:category', {})
+            self._element(xml, 'wp:category_nicename', nicename)
+            self._element(xml, 'wp:category_parent', parent)
+            self._element(xml, 'wp:cat_name', nicename.replace('-', ' ').title())
+            xml.endElement('wp:category')
+        tags = ['tag-%s' % i for i in range(self.tags)]
+        for slug in tags:
+            xml.startElement('wp:tag', {})
+            self._element(xml, 'wp:tag_slug', slug)
+            self._element(xml, 'wp:tag_name', slug.replace('-', ' '))
+            xml.endElement('wp:tag')
+
+        for i in range(self.posts):
+            self._write_item(xml, i, categories, tags)
+
+        xml.endElement('channel')
+        xml.endElement('rss')
+        xml.endDocument()
+
+    def _write_item(self, xml, i, categories, tags):
+        '''Writes a single post item.'''
+        date = self.start + timedelta(hours=i * 7)
+        xml.startElement('item', {})
+        self._element(xml, 'title', '%s %s' % (self.words(4).capitalize(), i))
+        self._element(xml, 'link', 'http://synthetic.example.com/?p=%s' % (i + 1))
+        self._element(xml, 'dc:creator', 'author%s' % (i % 5))
+        if categories:
+            nicename = self.random.choice(categories)[0]
+            xml.startElement('category', {'domain': 'category', 'nicename': nicename})
+            xml.characters(nicename)
+            xml.endElement('category')
+        for slug in self.random.sample(tags, self.random.randint(0, min(self.tags_per_item, len(tags)))):
+            xml.startElement('category', {'domain': 'tag', 'nicename': slug})
+            xml.characters(slug)
+            xml.endElement('category')
+        self._element(xml, 'content:encoded', self.words(self.body_words))
+        self._element(xml, 'excerpt:encoded', self.words(30))
+        self._element(xml, 'wp:post_id', str(i + 1))
+        self._element(xml, 'wp:post_date', date.strftime('%Y-%m-%d %H:%M:%S'))
+        self._element(xml, 'wp:post_name', 'post-%s' % i)
+        self._element(xml, 'wp:status', self.random.random() < 0.9 and 'publish' or 'draft')
+        self._element(xml, 'wp:post_type', 'post')
+        for m in range(self.meta_per_item):
+            xml.startElement('wp:postmeta', {})
+            self._element(xml, 'wp:meta_key', 'meta_%s' % m)
+            self._element(xml, 'wp:meta_value', self.words(3))
+            xml.endElement('wp:postmeta')
+        xml.endElement('item')
+
+    def _element(self, xml, name, text):
+        xml.startElement(name, {})
+        xml.characters(text)
+        xml.endElement(name)
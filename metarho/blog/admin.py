@@ -15,8 +15,12 @@
 # limitations under the License.
 
 # Admin classes for blog models
+from metarho.actions import bulk_form
+from metarho.blog import bulk
 from metarho.blog.models import Post
 from metarho.blog.models import PostMeta
+from metarho.ontology.models import Tag
+from metarho.ontology.models import Topic
 
 from django.contrib import admin
 from django.db import models
@@ -28,6 +32,15 @@ media = settings.MEDIA_URL
 class PostMetaInline(admin.TabularInline):
     model = PostMeta
 
+class RedateForm(forms.Form):
+    pub_date = forms.DateTimeField(help_text='YYYY-MM-DD HH:MM:SS')
+
+class TagsForm(forms.Form):
+    tags = forms.ModelMultipleChoiceField(Tag.objects.all())
+
+class TopicsForm(forms.Form):
+    topics = forms.ModelMultipleChoiceField(Topic.objects.all())
+
 class PostAdmin(admin.ModelAdmin):
     '''
     Admin interface options for the Post model.
@@ -37,6 +50,42 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('status', 'pub_date', 'author', 'topics')
     inlines = [PostMetaInline,]
     formfield_overrides = { models.TextField: {'widget': forms.Textarea(attrs={'class':'tinymce'})}, }
+    actions = ['publish_posts', 'unpublish_posts', 'redate_posts', 'add_tags',
+               'remove_tags', 'add_topics', 'remove_topics']
+
+    # Bulk actions, see metarho.blog.bulk.
+    def publish_posts(self, request, queryset):
+        self.message_user(request, '%s posts published.' % bulk.publish(queryset))
+    publish_posts.short_description = 'Publish selected posts'
+
+    def unpublish_posts(self, request, queryset):
+        self.message_user(request, '%s posts unpublished.' % bulk.unpublish(queryset))
+    unpublish_posts.short_description = 'Unpublish selected posts'
+
+    def redate_posts(self, request, queryset):
+        return bulk_form(self, request, queryset, RedateForm,
+                         lambda qs, data: bulk.redate(qs, data['pub_date']), '%s posts redated.')
+    redate_posts.short_description = 'Change the publication date of selected posts'
+
+    def add_tags(self, request, queryset):
+        return bulk_form(self, request, queryset, TagsForm,
+                         lambda qs, data: bulk.add_tags(qs, data['tags']), '%s tags added.')
+    add_tags.short_description = 'Tag selected posts'
+
+    def remove_tags(self, request, queryset):
+        return bulk_form(self, request, queryset, TagsForm,
+                         lambda qs, data: bulk.remove_tags(qs, data['tags']), '%s tags removed.')
+    remove_tags.short_description = 'Remove tags from selected posts'
+
+    def add_topics(self, request, queryset):
+        return bulk_form(self, request, queryset, TopicsForm,
+                         lambda qs, data: bulk.add_topics(qs, data['topics']), '%s topics added.')
+    add_topics.short_description = 'File selected posts under topics'
+
+    def remove_topics(self, request, queryset):
+        return bulk_form(self, request, queryset, TopicsForm,
+                         lambda qs, data: bulk.remove_topics(qs, data['topics']), '%s topics removed.')
+    remove_topics.short_description = 'Remove selected posts from topics'
     
     class Media:
         js = (
@@ -0,0 +1,209 @@
+# file blog/bulk.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Changes applied to many posts at once with set based statements in a single
+# transaction.  Post.save() and its per post validation queries are skipped,
+# the caches and PostCards are refreshed once for the whole batch.
+
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+
+from django.db import connection
+from django.db import transaction
+from django.contrib.contenttypes.models import ContentType
+
+from metarho import PUBLISHED_STATUS
+from metarho import UNPUBLISHED_STATUS
+from metarho import unique_slug
+from metarho.blog.cards import rebuild
+from metarho.blog.models import Post
+from metarho.blog.models import post_permalink
+from metarho.caching.generations import batch
+from metarho.ontology.bulk import add_links
+from metarho.ontology.bulk import remove_links
+from metarho.ontology.bulk import chunks
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import TopicCatalog
+
+def _ids(posts):
+    '''Returns the primary keys of a queryset or list of posts.'''
+    if hasattr(posts, 'values_list'):
+        return list(posts.values_list('pk', flat=True))
+    return [getattr(post, 'pk', post) for post in posts]
+
+def _touch(ids, **changes):
+    '''Updates the posts and their date_modified.'''
+    changes['date_modified'] = datetime.now()
+    for chunk in chunks(ids):
+        Post.objects.filter(pk__in=chunk).update(**changes)
+
+def _set_column(field, values):
+    '''
+    Writes a value per post to the column of ``field`` with one UPDATE per
+    chunk.
+
+    :param values: Dictionary of values keyed by the primary key of a post.
+
+    '''
+    qn = connection.ops.quote_name
+    table, column = qn(Post._meta.db_table), qn(Post._meta.get_field(field).column)
+    pk_column = qn(Post._meta.pk.column)
+    cursor = connection.cursor()
+    for chunk in chunks(values.items()):
+        cases = ' '.join(['WHEN %s THEN %s'] * len(chunk))
+        sql = 'UPDATE %s SET %s = CASE %s %s END WHERE %s IN (%s)' % (table, column,
+                pk_column, cases, pk_column, ', '.join(['%s'] * len(chunk)))
+        params = [value for item in chunk for value in item] + [pk for pk, value in chunk]
+        cursor.execute(sql, params)
+    transaction.set_dirty()
+
+def _fix_slugs(ids):
+    '''
+    Gives published posts without a slug one and renames slugs shared with
+    another post on the same day, as ``Post.clean`` requires.  The slugs in
+    use are read once for all the dates involved and new slugs are written
+    with one UPDATE per chunk.
+
+    '''
+    posts = []
+    for chunk in chunks(ids):
+        posts.extend(Post.objects.filter(pk__in=chunk, pub_date__isnull=False).order_by()
+                     .values_list('pk', 'title', 'slug', 'status', 'pub_date'))
+    if not posts:
+        return 0
+    posts.sort()
+    selected = set(ids)
+    dates = set([pub_date.date() for pk, title, slug, status, pub_date in posts])
+    start = datetime.combine(min(dates), time.min)
+    end = datetime.combine(max(dates), time.min) + timedelta(days=1)
+    taken = {}
+    for pk, slug, pub_date in Post.objects.filter(pub_date__gte=start, pub_date__lt=end,
+            slug__isnull=False).order_by().values_list('pk', 'slug', 'pub_date'):
+        if pk not in selected and pub_date.date() in dates:
+            taken.setdefault(pub_date.date(), set()).add(slug)
+
+    slug_len = Post._meta.get_field('slug').max_length
+    renamed = {}
+    for pk, title, slug, status, pub_date in posts:
+        day = taken.setdefault(pub_date.date(), set())
+        if slug and slug not in day:
+            day.add(slug)
+        elif slug or status == PUBLISHED_STATUS:
+            slug = unique_slug(title, day, slug_len)
+            day.add(slug)
+            renamed[pk] = slug
+
+    _set_column('slug', renamed)
+    return len(renamed)
+
+def _permalinks(ids):
+    '''Stores the permalink of the posts from their pub_date and slug.'''
+    permalinks = {}
+    for chunk in chunks(ids):
+        for pk, pub_date, slug, permalink in Post.objects.filter(pk__in=chunk).order_by().values_list(
+                'pk', 'pub_date', 'slug', 'permalink'):
+            current = post_permalink(pub_date, slug)
+            if current != permalink:
+                permalinks[pk] = current
+    _set_column('permalink', permalinks)
+    return len(permalinks)
+
+@batch('blog')
+def publish(posts, pub_date=None):
+    '''
+    Publishes posts.  Posts without a pub_date get ``pub_date``, now by
+    default, and published posts without a slug get one.  Returns the number
+    of posts.
+
+    :param posts: QuerySet or list of posts or their primary keys.
+    :param pub_date: Date given to posts that don't have one.
+
+    '''
+    ids = _ids(posts)
+    pub_date = pub_date or datetime.now()
+    for chunk in chunks(ids):
+        Post.objects.filter(pk__in=chunk, pub_date__isnull=True).update(pub_date=pub_date)
+    _touch(ids, status=PUBLISHED_STATUS)
+    _fix_slugs(ids)
+    _permalinks(ids)
+    rebuild(ids)
+    return len(ids)
+
+@batch('blog')
+def unpublish(posts):
+    '''Unpublishes posts and returns their number.'''
+    ids = _ids(posts)
+    _touch(ids, status=UNPUBLISHED_STATUS)
+    rebuild(ids)
+    return len(ids)
+
+@batch('blog')
+def redate(posts, pub_date):
+    '''
+    Moves posts to a new pub_date, slugs already used on that day are
+    replaced.  Returns the number of posts.
+
+    '''
+    ids = _ids(posts)
+    _touch(ids, pub_date=pub_date)
+    _fix_slugs(ids)
+    _permalinks(ids)
+    rebuild(ids)
+    return len(ids)
+
+@batch('blog')
+def refresh_permalinks(posts):
+    '''
+    Stores the permalink of posts whose stored one is missing or stale, ie
+    after loading a dump.  Returns the number of posts changed.
+
+    '''
+    ids = _ids(posts)
+    changed = _permalinks(ids)
+    rebuild(ids)
+    return changed
+
+def _relink(link_model, field, adding, posts, targets):
+    ids = _ids(posts)
+    ct = ContentType.objects.get_for_model(Post)
+    targets = [getattr(target, 'pk', target) for target in targets]
+    if adding:
+        changed = add_links(link_model, field, ct, ids, targets)
+    else:
+        changed = remove_links(link_model, field, ct, ids, targets)
+    _touch(ids)
+    return changed
+
+@batch('blog', 'ontology')
+def add_tags(posts, tags):
+    '''Tags posts with every tag and returns the number of links added.'''
+    return _relink(TaggedItem, 'tag', True, posts, tags)
+
+@batch('blog', 'ontology')
+def remove_tags(posts, tags):
+    '''Removes tags from posts and returns the number of links removed.'''
+    return _relink(TaggedItem, 'tag', False, posts, tags)
+
+@batch('blog', 'ontology')
+def add_topics(posts, topics):
+    '''Files posts under every topic and returns the number of links added.'''
+    return _relink(TopicCatalog, 'topic', True, posts, topics)
+
+@batch('blog', 'ontology')
+def remove_topics(posts, topics):
+    '''Removes posts from topics and returns the number of links removed.'''
+    return _relink(TopicCatalog, 'topic', False, posts, topics)
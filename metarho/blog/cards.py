@@ -0,0 +1,219 @@
+# file blog/cards.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Builds the PostCard rows of posts.  A chunk of posts is read with one query
+# per table and its cards are written with one DELETE and one INSERT.
+
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db import transaction
+from django.db.models import signals
+from django.utils import simplejson
+from django.utils.text import truncate_html_words
+
+from metarho import user_name
+from metarho.blog.models import Post
+from metarho.blog.models import PostCard
+from metarho.blog.models import post_permalink
+from metarho.caching.generations import namespace
+from metarho.jobs.models import Job
+from metarho.jobs.models import QUEUED_STATUS
+from metarho.jobs.tasks import enqueue
+from metarho.ontology.bulk import CHUNK_SIZE
+from metarho.ontology.bulk import chunks
+from metarho.ontology.models import Tag
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import Topic
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.signals import links_changed
+from metarho.ontology.tree import topic_tree
+
+# Words of the content used as teaser for posts without one.
+TEASER_WORDS = 300
+
+# Link changes to more posts than this, ie merging or deleting a large tag,
+# leave their cards to a job worker so the change commits in seconds.
+QUEUE_OVER = CHUNK_SIZE
+
+COLUMNS = ('post', 'title', 'slug', 'status', 'pub_date', 'permalink', 'author_name',
+           'teaser', 'tags', 'topics', 'tag_slugs', 'date_built')
+
+def _rows(ids):
+    '''Returns the card values of the posts among ``ids`` in COLUMNS order.'''
+    posts = Post.objects.filter(pk__in=ids).order_by().values_list('pk', 'title', 'slug', 'status',
+            'pub_date', 'permalink', 'author', 'teaser', 'content')
+    authors = set([post[6] for post in posts])
+    names = dict([(user.pk, user_name(user)) for user in User.objects.filter(pk__in=authors)])
+
+    ct = ContentType.objects.get_for_model(Post)
+    tags = {}
+    for object_id, slug, text in TaggedItem.objects.filter(content_type=ct, object_id__in=ids
+            ).order_by('tag__text').values_list('object_id', 'tag__slug', 'tag__text'):
+        tags.setdefault(object_id, []).append([slug, text])
+    tree = topic_tree()
+    topics = {}
+    for object_id, topic_id in TopicCatalog.objects.filter(content_type=ct, object_id__in=ids
+            ).order_by().values_list('object_id', 'topic'):
+        topic = tree.get(topic_id)
+        if topic is not None:
+            topics.setdefault(object_id, []).append([tree.path(topic), tree.name(topic), topic.description or ''])
+
+    now = datetime.now()
+    rows = []
+    for pk, title, slug, status, pub_date, permalink, author_id, teaser, content in posts:
+        # Posts loaded from fixtures or dumps may not have one stored yet.
+        permalink = permalink or post_permalink(pub_date, slug)
+        post_tags = tags.get(pk, [])
+        post_topics = sorted(topics.get(pk, []), key=lambda t: t[1])
+        rows.append((pk, title, slug, status, pub_date, permalink, names.get(author_id, u''),
+                     teaser or truncate_html_words(content or u'', TEASER_WORDS),
+                     simplejson.dumps(post_tags), simplejson.dumps(post_topics),
+                     u' %s ' % u' '.join([s for s, t in post_tags]), now))
+    return rows
+
+def _columns():
+    qn = connection.ops.quote_name
+    return qn(PostCard._meta.db_table), [qn(PostCard._meta.get_field(name).column) for name in COLUMNS]
+
+def rebuild(ids):
+    '''
+    Writes the cards of posts, the cards of posts that no longer exist are
+    deleted.  Returns the number of cards written.
+
+    :param ids: Primary keys of the posts.
+
+    '''
+    table, columns = _columns()
+    cursor = connection.cursor()
+    written = 0
+    for chunk in chunks(ids):
+        rows = _rows(chunk)
+        cursor.execute('DELETE FROM %s WHERE %s IN (%s)' % (table, columns[0],
+                       ', '.join(['%s'] * len(chunk))), chunk)
+        if rows:
+            cursor.executemany('INSERT INTO %s (%s) VALUES (%s)' % (table, ', '.join(columns),
+                               ', '.join(['%s'] * len(columns))), rows)
+        written += len(rows)
+    transaction.set_dirty()
+    return written
+
+def refresh(ids):
+    '''
+    Rewrites the existing cards of posts and returns their number.  Posts
+    without a card are left without one, so it is safe to call while a post
+    and its links are being deleted.
+
+    '''
+    table, columns = _columns()
+    sql = 'UPDATE %s SET %s WHERE %s = %%s' % (table,
+          ', '.join(['%s = %%s' % column for column in columns[1:]]), columns[0])
+    cursor = connection.cursor()
+    written = 0
+    for chunk in chunks(ids):
+        existing = list(PostCard.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+        rows = existing and _rows(existing) or []
+        if rows:
+            cursor.executemany(sql, [row[1:] + row[:1] for row in rows])
+        written += len(rows)
+    transaction.set_dirty()
+    return written
+
+def rebuild_all(chunk_size=500, progress=None):
+    '''
+    Rebuilds the cards of every post, each chunk of posts in its own
+    transaction, and deletes the cards of posts removed with SQL.  Returns
+    the number of cards written.
+
+    :param progress: Callable taking the cards written so far and the total.
+
+    '''
+    ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+    written = 0
+    for i in range(0, len(ids), chunk_size):
+        written += transaction.commit_on_success(rebuild)(ids[i:i + chunk_size])
+        if progress:
+            progress(written, len(ids))
+    PostCard.objects.exclude(post__in=Post.objects.values('pk')).delete()
+    namespace('blog').bump()
+    return written
+
+def queue_rebuild():
+    '''
+    Queues a rebuild of every card, see the blog.rebuildcards job, unless
+    one is already waiting.  Returns the queued Job.
+
+    '''
+    waiting = list(Job.objects.filter(name='blog.rebuildcards', status=QUEUED_STATUS)[:1])
+    if waiting:
+        return waiting[0]
+    return enqueue('blog.rebuildcards')
+
+def _linked_posts(link_model, **filters):
+    ct = ContentType.objects.get_for_model(Post)
+    return list(link_model.objects.filter(content_type=ct, **filters).order_by(
+                ).values_list('object_id', flat=True).distinct())
+
+# Signal receivers.
+def _post_saved(sender, instance, **kwargs):
+    rebuild([instance.pk])
+
+def _link_saved(sender, instance, **kwargs):
+    if instance.content_type_id == ContentType.objects.get_for_model(Post).pk:
+        refresh([instance.object_id])
+
+def _tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh(_linked_posts(TaggedItem, tag=instance))
+
+def _topic_saved(sender, instance, created, **kwargs):
+    if not created:
+        # The names of the descendants include the name of the topic.
+        tree = topic_tree()
+        subtree, level = [], [instance]
+        while level:
+            subtree.extend(level)
+            level = [child for topic in level for child in tree.children(topic)]
+        refresh(_linked_posts(TopicCatalog, topic__in=[topic.pk for topic in subtree]))
+
+def _user_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh(PostCard.objects.filter(post__author=instance).exclude(
+                author_name=user_name(instance)).values_list('pk', flat=True))
+
+def _links_changed(sender, content_type, object_ids, **kwargs):
+    if content_type.model_class() is not Post:
+        return
+    if len(object_ids) > QUEUE_OVER:
+        queue_rebuild()
+    else:
+        rebuild(object_ids)
+
+def track():
+    '''Keeps the cards current as posts, their authors, tags and topics change.'''
+    signals.post_save.connect(_post_saved, sender=Post, dispatch_uid='cards.post')
+    for model in (TaggedItem, TopicCatalog):
+        uid = 'cards.%s' % model._meta.object_name
+        signals.post_save.connect(_link_saved, sender=model, dispatch_uid=uid)
+        signals.post_delete.connect(_link_saved, sender=model, dispatch_uid=uid)
+    signals.post_save.connect(_tag_saved, sender=Tag, dispatch_uid='cards.tag')
+    signals.post_save.connect(_topic_saved, sender=Topic, dispatch_uid='cards.topic')
+    signals.post_save.connect(_user_saved, sender=User, dispatch_uid='cards.user')
+    links_changed.connect(_links_changed, dispatch_uid='cards.links')
+
+track()
@@ -16,9 +16,13 @@
 
 from django.http import Http404
 from django.http import HttpResponseRedirect
-from django.core.urlresolvers import reverse
+from django.utils.functional import wraps
+from django.utils.hashcompat import md5_constructor
+from django.views.decorators.http import condition
 
 from metarho.blog.models import Post
+from metarho.decorators import request_format
+from metarho.caching.variants import cached_variants
 
 def wp_post_redirect(view_fn):
     '''
@@ -29,19 +33,66 @@ def wp_post_redirect(view_fn):
     To use just decorate the view method for your default blog location.
     
     '''
+    @wraps(view_fn)
     def decorator(request, *args, **kwargs):
         wp_query = request.GET.get('p', None)
         if wp_query:
             try:
                 post = Post.objects.published().get(postmeta__key='wp_post_id', 
                                                     postmeta__value=wp_query)
-                ar = post.pub_date.strftime("%Y/%b/%d").split('/')
-                ar.append(post.slug)
-                htr = HttpResponseRedirect(reverse('blog:post-detail', args=ar))
+                htr = HttpResponseRedirect(post.get_absolute_url())
                 htr.status_code = 301 # This should reflect a 'Moved Permanently' code.
                 return htr
             except Post.DoesNotExist:
                 raise Http404
         return view_fn(request, *args, **kwargs)
     
-    return decorator
\ No newline at end of file
+    return decorator
+
+def conditional(validator, cache=False):
+    '''
+    Answers conditional GET requests before the view renders anything.
+
+    ``validator`` is called with the view arguments and returns a tuple of
+    (version, last_modified) or None if the content does not exist.  The
+    version is any string that changes with the content, it is combined with
+    the query string and negotiated format into the ETag so each page and
+    format of a view gets its own tag.  The validator runs once per request.
+
+    With ``cache`` the response of each ETag is cached with its compressed
+    variants, see ``metarho.caching.variants``.
+
+    :param validator: Callable computing the content version of a request.
+    :param cache: Cache responses by ETag.
+
+    '''
+    def _decorator(view_fn):
+        def _validate(request, *args, **kwargs):
+            if not hasattr(request, '_validator'):
+                request._validator = validator(request, *args, **kwargs) or (None, None)
+            return request._validator
+
+        def _etag(request, *args, **kwargs):
+            version = _validate(request, *args, **kwargs)[0]
+            if version is None:
+                return None
+            key = '%s?%s' % (version, request.GET.urlencode())
+            if hasattr(view_fn, 'formats'):
+                # Negotiated views vary on Accept, so does their ETag.
+                key = '%s;%s' % (key, request_format(request, view_fn.formats))
+            return md5_constructor(key).hexdigest()
+
+        def _last_modified(request, *args, **kwargs):
+            return _validate(request, *args, **kwargs)[1]
+
+        def _cached(request, *args, **kwargs):
+            etag = _etag(request, *args, **kwargs)
+            if etag is None:
+                return view_fn(request, *args, **kwargs)
+            return cached_variants(request, etag, lambda: view_fn(request, *args, **kwargs))
+
+        inner = view_fn
+        if cache:
+            inner = _cached
+        return wraps(view_fn)(condition(_etag, _last_modified)(inner))
+    return _decorator
@@ -0,0 +1,222 @@
+# file blog/exporter.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from xml.sax.saxutils import XMLGenerator
+
+from django.contrib.sites.models import Site
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+
+from metarho import PUBLISHED_STATUS
+from metarho.blog.models import Post
+from metarho.blog.models import PostMeta
+from metarho.blog.importer import IMPORT_META_KEYS
+from metarho.blog.importer import WP_POST_ID
+from metarho.blog.importer import category_nicename
+from metarho.ontology.models import Tag
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.tree import topic_tree
+from metarho.sitemeta.models import SiteInformation
+
+WXR_NAMESPACES = {
+    'xmlns:excerpt': 'http://wordpress.org/export/1.0/excerpt/',
+    'xmlns:content': 'http://purl.org/rss/1.0/modules/content/',
+    'xmlns:dc': 'http://purl.org/dc/elements/1.1/',
+    'xmlns:wp': 'http://wordpress.org/export/1.0/',
+}
+
+def post_records(since=None, chunk_size=500):
+    '''
+    Yields a dictionary for every post with its meta, tags and topics.
+
+    Posts are read ``chunk_size`` at a time in pk order, each chunk continues
+    after the last pk read.  The meta, tags and topics of a chunk are read
+    with one query each.
+
+    :param since: Only export posts modified at or after this datetime.
+    :param chunk_size: Number of posts read at a time.
+
+    '''
+    posts = Post.objects.select_related('author').order_by('pk')
+    if since:
+        posts = posts.filter(date_modified__gte=since)
+    ct = ContentType.objects.get_for_model(Post)
+    last = 0
+    while True:
+        chunk = list(posts.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return
+        records = {}
+        for post in chunk:
+            records[post.pk] = {'post': post, 'meta': [], 'tags': [], 'topics': []}
+        ids = records.keys()
+        for post_id, key, value in PostMeta.objects.filter(post__in=ids).order_by('pk').values_list('post', 'key', 'value'):
+            records[post_id]['meta'].append((key, value))
+        for object_id, slug, text in TaggedItem.objects.filter(content_type=ct,
+                object_id__in=ids).values_list('object_id', 'tag__slug', 'tag__text'):
+            records[object_id]['tags'].append((slug, text))
+        for object_id, path, text in TopicCatalog.objects.filter(content_type=ct,
+                object_id__in=ids).values_list('object_id', 'topic__path', 'topic__text'):
+            records[object_id]['topics'].append((path, text))
+        for post in chunk:
+            yield records[post.pk]
+        last = chunk[-1].pk
+
+class WXRExporter(object):
+    '''
+    Writes the blog as a WordPress eXtended RSS file that
+    ``WordPressExportParser`` can import.  Output is written as it is read.
+
+    :param out: File like object to write to.
+    :param since: Only export posts modified at or after this datetime.
+    :param chunk_size: Number of posts read at a time.
+
+    '''
+
+    def __init__(self, out, since=None, chunk_size=500):
+        self.out = out
+        self.since = since
+        self.chunk_size = chunk_size
+
+    def export(self):
+        '''Writes the export and returns the number of posts written.'''
+        xml = XMLGenerator(self.out, 'utf-8')
+        xml.startDocument()
+        xml.startElement('rss', dict(WXR_NAMESPACES, version='2.0'))
+        xml.startElement('channel', {})
+        self._channel(xml)
+
+        for topic in topic_tree().walk():
+            xml.startElement('wp:category', {})
+            self._element(xml, 'wp:category_nicename', category_nicename(topic.path))
+            self._element(xml, 'wp:category_parent', topic.parent and category_nicename(topic.parent.path) or '')
+            self._element(xml, 'wp:cat_name', topic.text)
+            xml.endElement('wp:category')
+        for slug, text in Tag.objects.order_by('pk').values_list('slug', 'text').iterator():
+            xml.startElement('wp:tag', {})
+            self._element(xml, 'wp:tag_slug', slug)
+            self._element(xml, 'wp:tag_name', text)
+            xml.endElement('wp:tag')
+
+        count = 0
+        for record in post_records(self.since, self.chunk_size):
+            self._item(xml, record)
+            count += 1
+
+        xml.endElement('channel')
+        xml.endElement('rss')
+        xml.endDocument()
+        return count
+
+    def _channel(self, xml):
+        '''Writes the channel information of the default SiteInformation.'''
+        try:
+            info = SiteInformation.objects.select_related('site').get(default=True)
+            title, description, domain = info.title, info.description, info.site.domain
+        except SiteInformation.DoesNotExist:
+            site = Site.objects.get_current()
+            title, description, domain = site.name, '', site.domain
+        url = 'http://%s/' % domain
+        self._element(xml, 'title', title)
+        self._element(xml, 'link', url)
+        self._element(xml, 'description', description or '')
+        self._element(xml, 'wp:wxr_version', '1.0')
+        self._element(xml, 'wp:base_site_url', url)
+        self._element(xml, 'wp:base_blog_url', url)
+
+    def _item(self, xml, record):
+        '''Writes a single post item.'''
+        post = record['post']
+        meta = dict(record['meta'])
+        date = post.pub_date or post.date_created
+        xml.startElement('item', {})
+        self._element(xml, 'title', post.title)
+        self._element(xml, 'dc:creator', meta.get('wp_author', post.author.username))
+        for path, text in record['topics']:
+            xml.startElement('category', {'domain': 'category', 'nicename': category_nicename(path)})
+            xml.characters(text)
+            xml.endElement('category')
+        for slug, text in record['tags']:
+            xml.startElement('category', {'domain': 'tag', 'nicename': slug})
+            xml.characters(text)
+            xml.endElement('category')
+        self._element(xml, 'content:encoded', post.content or '')
+        self._element(xml, 'excerpt:encoded', post.teaser or '')
+        self._element(xml, 'wp:post_id', meta.get(WP_POST_ID, str(post.pk)))
+        self._element(xml, 'wp:post_date', date.strftime('%Y-%m-%d %H:%M:%S'))
+        self._element(xml, 'wp:post_name', post.slug or '')
+        self._element(xml, 'wp:status', post.status == PUBLISHED_STATUS and 'publish' or 'draft')
+        self._element(xml, 'wp:post_type', 'post')
+        for key, value in record['meta']:
+            if key in IMPORT_META_KEYS:
+                continue
+            xml.startElement('wp:postmeta', {})
+            self._element(xml, 'wp:meta_key', key)
+            self._element(xml, 'wp:meta_value', value)
+            xml.endElement('wp:postmeta')
+        xml.endElement('item')
+
+    def _element(self, xml, name, text):
+        xml.startElement(name, {})
+        xml.characters(text)
+        xml.endElement(name)
+
+class JSONLinesExporter(object):
+    '''
+    Writes the blog as newline delimited JSON, one post per line with its
+    meta, tags, topics and author.
+
+    :param out: File like object to write to.
+    :param since: Only export posts modified at or after this datetime.
+    :param chunk_size: Number of posts read at a time.
+
+    '''
+
+    def __init__(self, out, since=None, chunk_size=500):
+        self.out = out
+        self.since = since
+        self.chunk_size = chunk_size
+
+    def export(self):
+        '''Writes the export and returns the number of posts written.'''
+        encoder = DjangoJSONEncoder()
+        count = 0
+        for record in post_records(self.since, self.chunk_size):
+            post = record['post']
+            line = encoder.encode({
+                'id': post.pk,
+                'title': post.title,
+                'slug': post.slug,
+                'author': post.author.username,
+                'content': post.content,
+                'teaser': post.teaser,
+                'status': post.status,
+                'pub_date': post.pub_date,
+                'date_created': post.date_created,
+                'date_modified': post.date_modified,
+                'meta': record['meta'],
+                'tags': [{'slug': slug, 'text': text} for slug, text in record['tags']],
+                'topics': [{'path': path, 'text': text} for path, text in record['topics']],
+            })
+            self.out.write(line + '\n')
+            count += 1
+        return count
+
+EXPORTERS = {
+    'wxr': WXRExporter,
+    'ndjson': JSONLinesExporter,
+}
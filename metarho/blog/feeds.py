@@ -15,16 +15,47 @@
 # limitations under the License.
 
 from datetime import date
+from datetime import datetime
+from datetime import timedelta
+from StringIO import StringIO
 
 from django.http import Http404
 from django.http import HttpResponse
+from django.db.models import Q
+from django.db.models import Max
 from django.contrib.syndication import feeds
+from django.contrib.sites.models import Site
+from django.contrib.sites.models import RequestSite
+from django.contrib.contenttypes.models import ContentType
+from django.template import loader
+from django.template import Template
+from django.template import RequestContext
+from django.template import TemplateDoesNotExist
 from django.utils import feedgenerator
+from django.utils.tzinfo import FixedOffset
+from django.utils.xmlutils import SimplerXMLGenerator
 from django.core.urlresolvers import reverse
 # from django.core.exceptions import ObjectDoesNotExist
-from django.shortcuts import get_object_or_404
 
-from metarho.sitemeta.models import SiteInformation
+from metarho import user_name
+from metarho.blog.models import authors
+from metarho.sitemeta.models import site_information
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.models import TaggedItem
+
+# Number of posts read from the database at a time while streaming a feed.
+FEED_CHUNK_SIZE = 100
+
+# Streamed output is sent once this many bytes are buffered.
+FEED_BUFFER_SIZE = 16384
+
+# Minimum number of posts in the current feed, older posts are in archives.
+FEED_CURRENT_SIZE = 20
+
+# Feed paging and archiving, see RFC 5005.
+HISTORY_NS = u'http://purl.org/syndication/history/1.0'
+ATOM_NS = u'http://www.w3.org/2005/Atom'
+HISTORY_RELS = (u'current', u'prev-archive', u'next-archive')
 
 def feed_render(feed):
     '''
@@ -34,14 +65,145 @@ def feed_render(feed):
     
     '''
     try: # Try to create the feed or throw an error if it doesn't exist.
-        feedgen =feed.get_feed('')
+        feedgen = feed.get_header()
     except feeds.FeedDoesNotExist:
         raise Http404, 'Invalid parameters.  A feed exists for %s but the parameters passed are incorrect.' % feed.link
 
-    # Good to Go!  Create the feed as a response.
-    response = HttpResponse(mimetype=feedgen.mime_type)
-    feedgen.write(response, 'utf-8')
-    return response
+    # Good to Go!  Stream the feed as a response.
+    return HttpResponse(feedgen.stream(feed.stream_items(), 'utf-8'), mimetype=feedgen.mime_type)
+
+def feed_class(request):
+    '''
+    Returns the feed class for the format negotiated for a request, Atom
+    unless RSS was asked for.
+
+    '''
+    if getattr(request, 'format', None) == 'rss':
+        return PostsFeed
+    return PostsFeedAtom
+
+def _local_offset():
+    '''
+    Returns the offset of local time to UTC rounded to the nearest half hour,
+    as the syndication framework applies it to naive dates.
+
+    '''
+    now = datetime.now()
+    utcnow = datetime.utcnow()
+    if utcnow > now:
+        minutes = -(((utcnow - now).seconds / 60 + 15) / 30) * 30
+    else:
+        minutes = (((now - utcnow).seconds / 60 + 15) / 30) * 30
+    return FixedOffset(timedelta(minutes=minutes))
+
+class StreamingFeedMixin(object):
+    '''
+    Writes a feed document in parts so entries are sent as they are built
+    rather than collected in memory first.
+
+    Subclasses set ``item_element`` and implement ``write_head`` and
+    ``write_tail``.  ``latest`` replaces the latest item date in the channel
+    information since no items are known when it is written.
+
+    '''
+
+    item_element = None
+    latest = None
+
+    def history_links(self):
+        '''Returns (rel, href) tuples of the paging links of the feed.'''
+        history = self.feed.get('history') or {}
+        return [(rel, history[rel]) for rel in HISTORY_RELS if rel in history]
+
+    def latest_post_date(self):
+        if self.latest is not None:
+            return self.latest
+        return super(StreamingFeedMixin, self).latest_post_date()
+
+    def stream(self, items, encoding):
+        '''
+        Yields the document in chunks.
+
+        :param items: Iterable of add_item keyword argument dictionaries.
+        :param encoding: Encoding of the document.
+
+        '''
+        out = StringIO()
+        handler = SimplerXMLGenerator(out, encoding)
+        self.write_head(handler)
+        for kwargs in items:
+            self.add_item(**kwargs)
+            item = self.items.pop()
+            handler.startElement(self.item_element, self.item_attributes(item))
+            self.add_item_elements(handler, item)
+            handler.endElement(self.item_element)
+            if out.tell() > FEED_BUFFER_SIZE:
+                yield self._drain(out)
+        self.write_tail(handler)
+        yield self._drain(out)
+
+    def _drain(self, out):
+        '''Returns and clears the buffered output.'''
+        value = out.getvalue()
+        out.seek(0)
+        out.truncate()
+        return value
+
+class StreamingRss201rev2Feed(StreamingFeedMixin, feedgenerator.Rss201rev2Feed):
+    '''RSS 2.0 feed generator written in parts.'''
+
+    item_element = u'item'
+
+    def rss_attributes(self):
+        attrs = super(StreamingRss201rev2Feed, self).rss_attributes()
+        if self.history_links():
+            attrs[u'xmlns:atom'] = ATOM_NS
+        if self.feed.get('archive'):
+            attrs[u'xmlns:fh'] = HISTORY_NS
+        return attrs
+
+    def add_root_elements(self, handler):
+        super(StreamingRss201rev2Feed, self).add_root_elements(handler)
+        for rel, href in self.history_links():
+            handler.addQuickElement(u'atom:link', None, {u'rel': rel, u'href': href})
+        if self.feed.get('archive'):
+            handler.addQuickElement(u'fh:archive')
+
+    def write_head(self, handler):
+        handler.startDocument()
+        handler.startElement(u'rss', self.rss_attributes())
+        handler.startElement(u'channel', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_tail(self, handler):
+        self.endChannelElement(handler)
+        handler.endElement(u'rss')
+
+class StreamingAtom1Feed(StreamingFeedMixin, feedgenerator.Atom1Feed):
+    '''Atom 1.0 feed generator written in parts.'''
+
+    item_element = u'entry'
+
+    def root_attributes(self):
+        attrs = super(StreamingAtom1Feed, self).root_attributes()
+        if self.feed.get('archive'):
+            attrs[u'xmlns:fh'] = HISTORY_NS
+        return attrs
+
+    def add_root_elements(self, handler):
+        super(StreamingAtom1Feed, self).add_root_elements(handler)
+        for rel, href in self.history_links():
+            handler.addQuickElement(u'link', None, {u'rel': rel, u'href': href})
+        if self.feed.get('archive'):
+            handler.addQuickElement(u'fh:archive')
+
+    def write_head(self, handler):
+        handler.startDocument()
+        handler.startElement(u'feed', self.root_attributes())
+        self.add_root_elements(handler)
+
+    def write_tail(self, handler):
+        handler.endElement(u'feed')
 
 class PostsFeed(feeds.Feed):
     '''
@@ -54,12 +216,15 @@ class PostsFeed(feeds.Feed):
     
     '''
 
-    feed_type = feedgenerator.Rss201rev2Feed
+    feed_type = StreamingRss201rev2Feed
 
     # These have alternate ways they can be called in a feed.  See `Django
     # Syndication Famework <http://docs.djangoproject.com/en/dev/ref/contrib/syndication/>`
     items = None
-    ttl = 600 # Hard-coded Time To Live.
+    chunk_size = FEED_CHUNK_SIZE
+    history = None # RFC 5005 {rel: url} paging links.
+    archive = False # True for archive documents that no longer change.
+    ttl = '600' # Hard-coded Time To Live, the RSS writer needs a string.
 
     def get_object(self, bits):
         '''
@@ -67,7 +232,114 @@ class PostsFeed(feeds.Feed):
         information from.
 
         '''
-        return get_object_or_404(SiteInformation, default__exact=True)
+        return site_information.get_or_404(True)
+
+    def _site(self):
+        if Site._meta.installed:
+            return Site.objects.get_current()
+        return RequestSite(self.request)
+
+    def feed_extra_kwargs(self, obj):
+        '''Passes the paging links as absolute urls to the feed generator.'''
+        domain = self._site().domain
+        history = dict([(rel, feeds.add_domain(domain, url)) for rel, url in (self.history or {}).items()])
+        return {'history': history, 'archive': self.archive}
+
+    def get_header(self):
+        '''
+        Returns the feed generator with the channel information and no items,
+        items are added while streaming.
+
+        '''
+        items = self.items
+        self.items = ()
+        try:
+            feedgen = self.get_feed('')
+        finally:
+            self.items = items
+        latest = self.items.aggregate(latest=Max('pub_date'))['latest']
+        if latest is not None:
+            feedgen.latest = latest.replace(tzinfo=_local_offset())
+        return feedgen
+
+    def item_chunks(self):
+        '''
+        Yields the posts of the feed newest first, reading ``chunk_size`` posts
+        at a time.  Each chunk continues after the pub_date and pk of the last post
+        read so later chunks cost no more than the first.
+
+        '''
+        posts = self.items.select_related('author').order_by('-pub_date', '-pk')
+        last = None
+        while True:
+            chunk = posts
+            if last is not None:
+                chunk = chunk.filter(Q(pub_date__lt=last.pub_date) |
+                                     Q(pub_date=last.pub_date, pk__lt=last.pk))
+            chunk = list(chunk[:self.chunk_size])
+            if chunk:
+                self.load_categories(chunk)
+            for post in chunk:
+                yield post
+            if len(chunk) < self.chunk_size:
+                return
+            last = chunk[-1]
+
+    def load_categories(self, posts):
+        '''
+        Reads the topics and tags of a list of posts with one query each and
+        sets them as ``categories`` on every post.
+
+        '''
+        ct = ContentType.objects.get_for_model(posts[0])
+        categories = dict([(post.pk, ([], [])) for post in posts])
+        ids = categories.keys()
+        for object_id, text in TopicCatalog.objects.filter(content_type=ct,
+                object_id__in=ids).values_list('object_id', 'topic__text'):
+            categories[object_id][0].append(text)
+        for object_id, text in TaggedItem.objects.filter(content_type=ct,
+                object_id__in=ids).values_list('object_id', 'tag__text'):
+            categories[object_id][1].append(text)
+        for post in posts:
+            topics, tags = categories[post.pk]
+            post.categories = topics + tags
+
+    def stream_items(self):
+        '''
+        Yields the add_item keyword arguments of each post, rendering titles
+        and descriptions like the syndication framework does.
+
+        '''
+        site = self._site()
+        title_tmp = self._load_template(self.title_template_name)
+        description_tmp = self._load_template(self.description_template_name)
+        context = RequestContext(self.request, {'site': site})
+        offset = _local_offset()
+
+        for item in self.item_chunks():
+            link = feeds.add_domain(site.domain, self.item_link(item))
+            context.update({'obj': item})
+            kwargs = {
+                'title': title_tmp.render(context),
+                'link': link,
+                'description': description_tmp.render(context),
+                'unique_id': self.item_guid(item),
+                'pubdate': self.item_pubdate(item).replace(tzinfo=offset),
+                'author_name': self.item_author_name(item),
+                'author_email': self.item_author_email(item),
+                'author_link': self.item_author_link(item),
+                'categories': self.item_categories(item),
+                'item_copyright': self.item_copyright(item),
+            }
+            context.pop()
+            yield kwargs
+
+    def _load_template(self, name):
+        '''Returns a feed template or the framework's default.'''
+        try:
+            return loader.get_template(name)
+        except TemplateDoesNotExist:
+            return Template('{{ obj }}')
 
     def title(self, obj):
         '''Returns the title of the publication.'''
@@ -82,13 +354,11 @@ class PostsFeed(feeds.Feed):
 
     def author_name(self, obj):
         '''Returns the publication owners name.'''
-        if obj.owner.get_full_name():
-            obj.owner.get_full_name()
-        return obj.owner.username
+        return user_name(authors.get(obj.owner_id))
 
     def author_email(self, obj):
         '''Returns the publication owners email.'''
-        return obj.owner.email
+        return authors.get(obj.owner_id).email
 
     def author_link(self, obj):
         '''
@@ -143,7 +413,18 @@ class PostsFeed(feeds.Feed):
         Takes an item, as returned by items(), and returns the item's URL.
         
         """
-        return reverse('blog:post-detail', args=[item.pub_date.year, item.pub_date.strftime('%b'), item.pub_date.day, item.slug])
+        return item.get_absolute_url()
+
+    def item_guid(self, item):
+        """
+        Returns the id of an item.  Feeds were published with the month of
+        the link capitalized, the ids keep that spelling so readers do not
+        show the posts again.
+
+        """
+        month = '/%s/' % item.pub_date.strftime('%b')
+        link = item.get_absolute_url().replace(month.lower(), month, 1)
+        return feeds.add_domain(self._site().domain, link)
     
     def item_author_name(self, item):
         """
@@ -186,12 +467,15 @@ class PostsFeed(feeds.Feed):
         categories.
         
         """
-        cats = [topic.text for topic in item.topics.published()]
-        return cats.extend([tag.text for tag in item.tags.published()])
+        if hasattr(item, 'categories'):
+            return item.categories
+        cats = [tc.topic.text for tc in item.topics.select_related('topic')]
+        cats.extend([ti.tag.text for ti in item.tags.select_related('tag')])
+        return cats
 
 class PostsFeedAtom(PostsFeed):
 
-    feed_type = feedgenerator.Atom1Feed
+    feed_type = StreamingAtom1Feed
 
     def subtitle(self):
         return self.description(self.get_object(''))
\ No newline at end of file
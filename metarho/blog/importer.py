@@ -14,6 +14,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import logging
 import sys
 from datetime import datetime
 from urlparse import urlparse
@@ -22,6 +23,11 @@ from xml.etree import ElementTree
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 from django.core.exceptions  import ObjectDoesNotExist
+from django.core.exceptions import ValidationError
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError
+from django.db import transaction
+from django.utils.hashcompat import md5_constructor
 
 from metarho.blog.models import Post
 from metarho.blog.models import PostMeta
@@ -31,6 +37,21 @@ from metarho.ontology.models import Tag
 from metarho.ontology.models import TaggedItem
 from metarho.sitemeta.models import SiteInformation
 
+# PostMeta keys written by the importer rather than read from wp:postmeta.
+WP_POST_ID = 'wp_post_id'
+WP_CONTENT_HASH = 'wp_content_hash'
+IMPORT_META_KEYS = (WP_POST_ID, 'wp_blog_title', 'wp_blog_link', 'wp_author', WP_CONTENT_HASH)
+
+log = logging.getLogger('metarho.blog.importer')
+
+def category_nicename(path):
+    '''
+    Returns the category nicename of a topic path, ie "python-django" for
+    "python/django/".  Topic slugs are only unique under their parent, the
+    nicename is unique across the tree.
+
+    '''
+    return path.strip('/').replace('/', '-')
    
 class WordPressExportParser:
     '''
@@ -38,11 +59,23 @@ class WordPressExportParser:
     
     Some code pulled from 
     http://www.beardygeek.com/2009/01/from-wordpress-to-django-part-two/
+
+    Imports can be repeated with the same or a later export of the blog.
+    Existing tags, topics and site information are reused, posts are matched
+    on their wp:post_id and only updated when the hash of their item
+    changed.  Each post is written in its own transaction, a post that
+    fails is logged and left as it was.  ``stats`` counts the created,
+    updated, unchanged and failed posts.
+
+    ``progress`` may be set to a callable taking the items parsed so far and
+    their total, it is called after each item.
     '''
     
     blog = []
     _author = None
     _pub = None
+    _topics = None
+    progress = None
     
     def __init__(self, file, username):
         try:
@@ -52,6 +85,7 @@ class WordPressExportParser:
             self.content_ns = '{http://purl.org/rss/1.0/modules/content/}'
             self.dc_ns = '{http://purl.org/dc/elements/1.1/}'
             self.excerpt_ns = '{http://wordpress.org/export/1.0/excerpt/}'
+            self.stats = {'created': 0, 'updated': 0, 'unchanged': 0, 'failed': 0}
             try: # Need an owner to assosite the site information and posts to.
                 self.owner = User.objects.get(username=username)
             except User.DoesNotExist:
@@ -85,10 +119,16 @@ class WordPressExportParser:
         # Create the Site object
         url = urlparse(self.chan.find(self.wp_ns + 'base_blog_url').text)
         name = self.chan.find('title').text
-        site = Site(domain=url.netloc, name=name)
-        site.save()
+        sites = Site.objects.filter(domain=url.netloc)[:1]
+        if sites:
+            site = sites[0]
+        else:
+            site = Site(domain=url.netloc, name=name)
+            site.save()
 
-        # Create SiteInformation object.
+        # Create SiteInformation object unless a previous import did.
+        if SiteInformation.objects.filter(site=site, title=name).count():
+            return
         info = SiteInformation()
         info.title = name
         info.default = False # Don't override any site settings.
@@ -98,37 +138,97 @@ class WordPressExportParser:
         info.save()
     
     def import_tags(self):
-        '''Import Tags.'''
+        '''Import Tags, existing tags are matched on slug or text.'''
+        slugs, texts = set(), set()
+        for slug, text in Tag.objects.values_list('slug', 'text'):
+            slugs.add(slug)
+            texts.add(text)
         tags = self.chan.findall(self.wp_ns + 'tag')
         for tag in tags:
             t = Tag()
             t.text=tag.find(self.wp_ns + 'tag_name').text
             t.slug=tag.find(self.wp_ns + 'tag_slug').text
+            if t.slug in slugs or t.text in texts:
+                continue
             t.save()
+            slugs.add(t.slug)
+            texts.add(t.text)
     
     def import_catagories(self):
-        '''Parses and imports the catagories from a blog posts.'''
+        '''
+        Parses and imports the catagories from a blog posts, existing topics
+        are matched on slug and parent.  Parents and the categories of posts
+        are resolved on their nicename.
+
+        '''
+        self._load_topics()
         topics = self.chan.findall(self.wp_ns + 'category')
         for topic in topics:
+            nicename = topic.find(self.wp_ns + 'category_nicename').text
+            parent = topic.find(self.wp_ns + 'category_parent').text
             t = Topic()
             t.text = topic.find(self.wp_ns + 'cat_name').text
-            t.slug = topic.find(self.wp_ns + 'category_nicename').text
-            if topic.find(self.wp_ns + 'category_parent').text:
-                t.parent = Topic.objects.get(slug=topic.find(self.wp_ns + 'category_parent').text)
-            t.save()
+            t.slug = nicename
+            if parent:
+                t.parent = self._topic(parent)
+                # Nicenames of exported children start with the one of their parent.
+                if nicename.startswith(parent + '-'):
+                    t.slug = nicename[len(parent) + 1:]
+            existing = list(Topic.objects.filter(parent=t.parent, slug__in=[t.slug, nicename])[:1])
+            if existing:
+                t = existing[0]
+            else:
+                t.save()
+            self._topics[nicename] = t
+
+    def _load_topics(self):
+        '''Maps the nicename of every existing topic to it.'''
+        self._topics = dict([(category_nicename(t.path), t) for t in Topic.objects.all()])
+
+    def _topic(self, nicename):
+        '''Returns the topic of a category nicename.'''
+        if self._topics is None:
+            self._load_topics()
+        try:
+            return self._topics[nicename]
+        except KeyError:
+            raise Topic.DoesNotExist('No category %s.' % nicename)
 
     def import_posts(self):
         '''Parses the Export File.'''
+        # Posts of previous imports by wp:post_id with their content hash.
+        self._imported = {}
+        hashes = dict(PostMeta.objects.filter(key=WP_CONTENT_HASH).values_list('post', 'value'))
+        for post_id, wp_id in PostMeta.objects.filter(key=WP_POST_ID).values_list('post', 'value'):
+            self._imported[wp_id] = (post_id, hashes.get(post_id))
         items = self.chan.findall('item')
-        for item in items:
+        for i, item in enumerate(items):
             self._import_post(item)
+            if self.progress:
+                self.progress(i + 1, len(items))
+
+    def _content_hash(self, item):
+        '''Returns a hash of everything in an item.'''
+        return md5_constructor(ElementTree.tostring(item, 'utf-8')).hexdigest()
            
     def _import_post(self, item):
-        '''Creates a new Entry object from a post and saves it.'''
+        '''
+        Creates a new Entry object from a post and saves it, or updates the
+        post a previous import created from it if the item changed.
+
+        '''
         wp_ns = self.wp_ns
         content_ns = self.content_ns
         if item.find(wp_ns + 'post_type').text == 'post':
-            post = Post()
+            content_hash = self._content_hash(item)
+            post_id, previous_hash = self._imported.get(item.find(wp_ns + 'post_id').text, (None, None))
+            if post_id is not None and content_hash == previous_hash:
+                self.stats['unchanged'] += 1
+                return
+            if post_id is not None:
+                post = Post.objects.get(pk=post_id)
+            else:
+                post = Post()
             post.author = self.get_author()
             post.title = item.find('title').text
             if not post.title:
@@ -145,23 +245,45 @@ class WordPressExportParser:
                 post.status = 'P'
             else:
                 post.status = 'U'
-            try: 
-                post.save()
-                
-                # modify date_created after save because autonow is on.
-                post.date_created = postdate
-                post.save()
-                # Enrich the rest of the post.
-                self._post_meta(post, item)
-                self._catalog_post(post, item)
-    
-            except:
-                sys.stderr.write("Error importing %s" % post.title)
-                pass
-            
+            try:
+                transaction.commit_on_success(self._save_post)(post, item, postdate, content_hash)
+            except (ValidationError, DatabaseError, ObjectDoesNotExist), e:
+                self.stats['failed'] += 1
+                log.error('Error importing %s: %s' % (post.title, e))
+                return
+            if post_id is None:
+                self.stats['created'] += 1
+            else:
+                self.stats['updated'] += 1
+
+    def _save_post(self, post, item, postdate, content_hash):
+        '''
+        Saves a post with its meta, tags and topics, replacing those of a
+        previous import.  Runs in one transaction so a failure keeps the
+        wp_post_id the next import matches the post on.
+
+        '''
+        if post.pk:
+            self._clear_post(post)
+        post.save()
+        # modify date_created after save because autonow is on.
+        post.date_created = postdate
+        post.save()
+        # Enrich the rest of the post.
+        self._post_meta(post, item)
+        self._catalog_post(post, item)
+        PostMeta(post=post, key=WP_CONTENT_HASH, value=content_hash).save()
+
+    def _clear_post(self, post):
+        '''Removes the meta, tags and topics of a post before it is updated.'''
+        ct = ContentType.objects.get_for_model(post)
+        PostMeta.objects.filter(post=post).delete()
+        TaggedItem.objects.filter(content_type=ct, object_id=post.pk).delete()
+        TopicCatalog.objects.filter(content_type=ct, object_id=post.pk).delete()
+
     def _post_meta(self, post, item):
         '''Create Post Meta items.'''
-        wi = PostMeta(post=post, key='wp_post_id', 
+        wi = PostMeta(post=post, key=WP_POST_ID, 
                          value=item.find(self.wp_ns + 'post_id').text)
         wi.save()
         wbt = PostMeta(post=post, key='wp_blog_title',
@@ -193,10 +315,24 @@ class WordPressExportParser:
             #check for attributes
             if pc.get('nicename'):
                 if pc.attrib['domain'] == 'category':
-                    t = Topic.objects.get(slug=pc.attrib['nicename'])
+                    t = self._topic(pc.attrib['nicename'])
                     tc = TopicCatalog(content_object=post, topic=t)
                     tc.save()
                 elif pc.attrib['domain'] == 'tag':
-                    t = Tag.objects.get(slug=pc.attrib['nicename'])
+                    t = self._tag(pc.attrib['nicename'], pc.text)
                     tc = TaggedItem(content_object=post, tag=t)
-                    tc.save()
\ No newline at end of file
+                    tc.save()
+
+    def _tag(self, slug, text):
+        '''
+        Returns the tag of a post category.  Tags are matched on slug or
+        text as import_tags does, missing ones are created.
+
+        '''
+        for tag in Tag.objects.filter(slug=slug)[:1]:
+            return tag
+        for tag in Tag.objects.filter(text=text)[:1]:
+            return tag
+        tag = Tag(text=text, slug=slug)
+        tag.save()
+        return tag
\ No newline at end of file
@@ -0,0 +1,35 @@
+# file blog/jobs.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Background tasks of the blog, see metarho.jobs.
+
+from metarho.blog.cards import rebuild_all
+from metarho.blog.importer import WordPressExportParser
+from metarho.jobs.tasks import task
+
+@task('blog.import')
+def import_wordpress(job, file, username):
+    '''Imports a WordPress export file on the worker host.'''
+    wp = WordPressExportParser(file, username)
+    wp.progress = job.progress
+    wp.parse()
+    return '%s created, %s updated, %s unchanged, %s failed.' % (wp.stats['created'],
+            wp.stats['updated'], wp.stats['unchanged'], wp.stats['failed'])
+
+@task('blog.rebuildcards')
+def rebuild_cards(job, chunk_size=500):
+    '''Rebuilds the PostCards of every post.'''
+    return 'Rebuilt %s cards.' % rebuild_all(chunk_size, job.progress)
@@ -0,0 +1,87 @@
+# file benchmark.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from os import path
+from optparse import make_option
+
+from django.conf import settings
+from django.db import connection
+from django.utils import simplejson
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from metarho.benchmark import runner
+from metarho.benchmark.data import SyntheticBlog
+
+BASELINE = path.join(path.dirname(runner.__file__), 'baseline.json')
+
+class Command(BaseCommand):
+    help = 'Benchmarks views and feeds against a generated blog in a test database.'
+
+    option_list = BaseCommand.option_list + (
+            make_option("--posts", dest="posts", type="int", default=200),
+            make_option("--tags", dest="tags", type="int", default=50),
+            make_option("--depth", dest="depth", type="int", default=3),
+            make_option("--meta", dest="meta", type="int", default=4),
+            make_option("--authors", dest="authors", type="int", default=5),
+            make_option("--seed", dest="seed", type="int", default=1),
+            make_option("--repeat", dest="repeat", type="int", default=3),
+            make_option("-o", "--output", dest="output", default=None,
+                        help="File to write the JSON results to."),
+            make_option("--baseline", dest="baseline", default=BASELINE,
+                        help="Baseline JSON file to compare results against."),
+            make_option("--update-baseline", dest="update", action="store_true",
+                        default=False, help="Write the results as the new baseline."),
+        )
+
+    def handle(self, *args, **options):
+        data = SyntheticBlog(posts=options['posts'], tags=options['tags'],
+                             topic_depth=options['depth'],
+                             meta_per_post=options['meta'],
+                             authors=options['authors'], seed=options['seed'])
+
+        old_name = settings.DATABASE_NAME
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            data.generate()
+            results = runner.run(repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        report = {'parameters': data.parameters(), 'results': results}
+        output = simplejson.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            out = open(options['output'], 'w')
+            out.write(output)
+            out.close()
+        else:
+            sys.stdout.write(output + '\n')
+
+        if options['update']:
+            out = open(options['baseline'], 'w')
+            out.write(output)
+            out.close()
+            return
+
+        if path.exists(options['baseline']):
+            baseline = simplejson.load(open(options['baseline']))
+            if baseline['parameters'] != report['parameters']:
+                sys.stderr.write('Parameters differ from the baseline, skipping comparison.\n')
+                return
+            regressions = runner.compare(results, baseline['results'])
+            if regressions:
+                raise CommandError('Regressions against baseline:\n%s' % '\n'.join(regressions))
@@ -0,0 +1,95 @@
+# file benchmarkimport.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+import tempfile
+from optparse import make_option
+
+from django.conf import settings
+from django.db import connection
+from django.utils import simplejson
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from metarho.benchmark import imports
+from metarho.benchmark.wxr import SyntheticWXR
+
+class Command(BaseCommand):
+    help = 'Benchmarks the WordPress importer against a generated WXR file in a test database.'
+
+    option_list = BaseCommand.option_list + (
+            make_option("--posts", dest="posts", type="int", default=1000),
+            make_option("--tags", dest="tags", type="int", default=100),
+            make_option("--depth", dest="depth", type="int", default=3),
+            make_option("--breadth", dest="breadth", type="int", default=3),
+            make_option("--meta", dest="meta", type="int", default=4),
+            make_option("--words", dest="words", type="int", default=400),
+            make_option("--seed", dest="seed", type="int", default=1),
+            make_option("--wxr", dest="wxr", default=None,
+                        help="Keep the generated export at this path."),
+            make_option("-o", "--output", dest="output", default=None,
+                        help="File to write the JSON results to."),
+        )
+
+    def handle(self, *args, **options):
+        wxr = SyntheticWXR(posts=options['posts'], tags=options['tags'],
+                           category_depth=options['depth'],
+                           category_breadth=options['breadth'],
+                           meta_per_item=options['meta'],
+                           body_words=options['words'], seed=options['seed'])
+        path = options['wxr']
+        if not path:
+            fd, path = tempfile.mkstemp(suffix='.xml')
+            os.close(fd)
+        out = open(path, 'w')
+        wxr.write(out)
+        out.close()
+        size = os.path.getsize(path)
+
+        old_name = settings.DATABASE_NAME
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            username = self._make_user().username
+            parser = imports.run_parser(path, username)
+
+            # Start from an empty database again for the command run.
+            call_command('flush', interactive=False, verbosity=0)
+            username = self._make_user().username
+            command = imports.run_command(path, username, options['posts'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if not options['wxr']:
+                os.remove(path)
+
+        report = {
+            'parameters': wxr.parameters(),
+            'file_bytes': size,
+            'parser': parser,
+            'blogimport': command,
+        }
+        output = simplejson.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            out = open(options['output'], 'w')
+            out.write(output)
+            out.close()
+        else:
+            sys.stdout.write(output + '\n')
+
+    def _make_user(self):
+        '''Creates the owner the import is attributed to.'''
+        return User.objects.create_user('importer', 'importer@example.com')
@@ -0,0 +1,68 @@
+# file blogexport.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from datetime import datetime
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from metarho.blog.exporter import EXPORTERS
+
+class Command(BaseCommand):
+    help = 'Exports all posts with their meta, tags and topics as WXR or newline delimited JSON.'
+
+    option_list = BaseCommand.option_list + (
+            make_option("-f", "--format", dest="format", default="wxr",
+                        help="wxr or ndjson."),
+            make_option("-o", "--output", dest="output", default=None,
+                        help="File to write the export to, stdout by default."),
+            make_option("--since", dest="since", default=None,
+                        help="Only export posts modified since this date, YYYY-MM-DD or 'YYYY-MM-DD HH:MM:SS'."),
+            make_option("--chunk-size", dest="chunk_size", type="int", default=500),
+        )
+
+    def handle(self, *args, **options):
+        if options['format'] not in EXPORTERS:
+            raise CommandError('Unknown format %s, use one of %s.' % (options['format'], ', '.join(EXPORTERS.keys())))
+        since = self._parse_since(options['since'])
+        out = sys.stdout
+        if options['output']:
+            out = open(options['output'], 'w')
+        try:
+            exporter = EXPORTERS[options['format']](out, since, options['chunk_size'])
+            count = exporter.export()
+        finally:
+            if options['output']:
+                out.close()
+        sys.stderr.write('Exported %s posts.\n' % count)
+
+    def _parse_since(self, value):
+        """
+        Returns the datetime of the --since option or None.
+
+        :param value: Date string to parse.
+
+        """
+        if not value:
+            return None
+        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(value, fmt)
+            except ValueError:
+                pass
+        raise CommandError('Unable to parse --since %s.' % value)
@@ -14,6 +14,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import sys
 from optparse import make_option
 
 from django.core.management.base import BaseCommand
@@ -21,18 +23,27 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.contrib.auth.models import User
 
 from metarho.blog.importer import WordPressExportParser
+from metarho.jobs.tasks import enqueue
 
 class Command(BaseCommand):
     option_list = BaseCommand.option_list + (
             make_option("-u", "--username", dest="username", default=None),
+            make_option("--queue", dest="queue", action="store_true", default=False,
+                        help="Leave each import to the job workers, see runjobs."),
         )
 
     def handle(self, *args, **options):
         # Throws an error if not a valid user.
         user = self._get_user(options["username"]) 
         for file in args:
+            if options['queue']:
+                job = enqueue('blog.import', file=os.path.abspath(file), username=user.username)
+                sys.stderr.write('%s: queued job %s.\n' % (file, job.pk))
+                continue
             wp = WordPressExportParser(file, user.username)
             wp.parse()
+            sys.stderr.write('%s: %s created, %s updated, %s unchanged, %s failed.\n' % (file,
+                wp.stats['created'], wp.stats['updated'], wp.stats['unchanged'], wp.stats['failed']))
         
     def _get_user(self, username):
         """
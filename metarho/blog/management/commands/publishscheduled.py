@@ -0,0 +1,72 @@
+# file publishscheduled.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+from datetime import datetime
+from datetime import timedelta
+from optparse import make_option
+
+from django.conf import settings
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from metarho.blog import schedule
+from metarho.caching.generations import shared_cache
+
+class Command(BaseCommand):
+    help = ('Waits for the pub_date of scheduled posts, then refreshes the caches and renders the '
+            'pages they appear on.  Runs until stopped unless --once is given.')
+
+    option_list = BaseCommand.option_list + (
+            make_option("--once", dest="once", action="store_true", default=False,
+                        help="Release the posts that are due and exit, ie from cron."),
+            make_option("--interval", dest="interval", type="int", default=60,
+                        help="Longest sleep in seconds, posts scheduled meanwhile are noticed after it."),
+            make_option("--no-render", dest="render", action="store_false", default=True,
+                        help="Only refresh the caches, leave rendering to the first readers."),
+            make_option("--host", dest="host", default="localhost",
+                        help="Host name pages are requested with."),
+        )
+
+    def handle(self, *args, **options):
+        if not shared_cache():
+            raise CommandError('The cache backend %s is private to this process, the web processes '
+                               'would not see the release.  Set a shared CACHE_BACKEND, see '
+                               'localsettings-dist.py.' % settings.CACHE_BACKEND)
+        interval = options['interval']
+        # Runs from cron pick up where the last one stopped.
+        since = schedule.last_released() or datetime.now() - timedelta(seconds=interval)
+        while True:
+            now = datetime.now()
+            posts = list(schedule.due(since, now))
+            for url, status, seconds, size in schedule.release(posts, options['render'], options['host']):
+                sys.stderr.write('%s %s %.3fs %s bytes\n' % (status, url, seconds, size))
+            if posts:
+                sys.stderr.write('Released %s posts.\n' % len(posts))
+            since = now
+            schedule.mark_released(since)
+            if options['once']:
+                break
+            following = schedule.upcoming(now)
+            # Don't hold a connection or a stale snapshot while sleeping.
+            connection.close()
+            delay = interval
+            if following is not None:
+                wait = following - datetime.now()
+                delay = min(interval, wait.days * 86400 + wait.seconds + wait.microseconds / 1e6)
+            time.sleep(max(delay, 0))
@@ -0,0 +1,43 @@
+# file rebuildcards.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from metarho.blog.cards import rebuild_all
+from metarho.jobs.tasks import enqueue
+
+class Command(BaseCommand):
+    help = 'Rebuilds the PostCards post lists are read from, ie after installing them or restoring a dump.'
+
+    option_list = BaseCommand.option_list + (
+            make_option("--chunk-size", dest="chunk_size", type="int", default=500,
+                        help="Posts rebuilt in each transaction."),
+            make_option("--queue", dest="queue", action="store_true", default=False,
+                        help="Leave the rebuild to the job workers, see runjobs."),
+        )
+
+    def handle(self, *args, **options):
+        if options['queue']:
+            job = enqueue('blog.rebuildcards', chunk_size=options['chunk_size'])
+            sys.stderr.write('Queued job %s.\n' % job.pk)
+            return
+        def progress(written, total):
+            sys.stderr.write('%s of %s cards\r' % (written, total))
+        written = rebuild_all(options['chunk_size'], progress)
+        sys.stderr.write('\nRebuilt %s cards.\n' % written)
@@ -0,0 +1,29 @@
+# file refreshpermalinks.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+from metarho.blog import bulk
+from metarho.blog.models import Post
+
+class Command(BaseCommand):
+    help = 'Stores the permalink of posts saved without one, ie after adding the column or restoring a dump.'
+
+    def handle(self, *args, **options):
+        changed = bulk.refresh_permalinks(Post.objects.all())
+        sys.stderr.write('Refreshed %s permalinks.\n' % changed)
@@ -0,0 +1,63 @@
+# file warmcache.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+import time
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from metarho.blog.pages import public_urls
+from metarho.caching.variants import CODINGS
+from metarho.caching.warm import warm
+
+class Command(BaseCommand):
+    help = ('Renders every public page through the WSGI app so the caches are filled, '
+            'ie after a deploy or a cache flush.  Prints the status, time and size of each url.')
+
+    option_list = BaseCommand.option_list + (
+            make_option("-c", "--concurrency", dest="concurrency", type="int", default=4,
+                        help="Number of pages rendered at once."),
+            make_option("--host", dest="host", default="localhost",
+                        help="Host name pages are requested with."),
+            make_option("--coding", dest="coding", default=None,
+                        help="Content coding cached next to the identity bytes, one of %s." %
+                        ', '.join([name for name, factory in CODINGS])),
+            make_option("--slowest", dest="slowest", type="int", default=10,
+                        help="Number of slowest urls listed at the end."),
+        )
+
+    def handle(self, *args, **options):
+        if options['coding'] and options['coding'] not in dict(CODINGS):
+            raise CommandError('Unknown coding %s.' % options['coding'])
+        def report(result):
+            sys.stdout.write('%s %.3fs %8d %s\n' % (result[1], result[2], result[3], result[0]))
+            sys.stdout.flush()
+        started = time.time()
+        results = warm(public_urls(), options['host'], options['coding'],
+                       max(options['concurrency'], 1), report)
+        elapsed = time.time() - started
+
+        failed = [r for r in results if r[1] != 200]
+        sys.stderr.write('Rendered %s urls in %.1fs, %s did not return 200.\n' % (len(results), elapsed, len(failed)))
+        if results:
+            total = sum([r[2] for r in results])
+            sys.stderr.write('Mean %.3fs per url.\n' % (total / len(results)))
+        if options['slowest']:
+            results.sort(key=lambda r: r[2], reverse=True)
+            for url, status, seconds, size in results[:options['slowest']]:
+                sys.stderr.write('  %.3fs %s\n' % (seconds, url))
@@ -21,10 +21,15 @@ from django.contrib.auth.models import User
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ValidationError
 from django.contrib.contenttypes import generic
+from django.utils import simplejson
 
 from metarho import PUBLISHED_STATUS
 from metarho import PUB_STATUS
 from metarho import unique_slugify
+from metarho.caching.lookups import ModelLookup
+from metarho.caching.generations import namespace
+from metarho import replicas
+from metarho.replicas import route
 from metarho.ontology.models import TopicCatalog
 from metarho.ontology.models import TaggedItem
 
@@ -40,6 +45,7 @@ class PostManager(models.Manager):
     def published(self, pub_date=None):
         '''
         Only returns posts that are published and of pub_date or earlier.
+        Public requests read them from a replica, see metarho.replicas.
 
         :param pub_date: Posts with pub_date later than this are not considered
                          published.
@@ -47,8 +53,18 @@ class PostManager(models.Manager):
         '''
         if not pub_date:
             pub_date = datetime.now()
-        return self.filter(status=PUBLISHED_STATUS, pub_date__lte=pub_date, pub_date__isnull=False)
+        return route(self.filter(status=PUBLISHED_STATUS, pub_date__lte=pub_date, pub_date__isnull=False))
     
+def post_permalink(pub_date, slug):
+    '''
+    Returns the canonical url of a post, None until it has a pub_date and a
+    slug.  The month is spelled in lower case as the templates link it.
+
+    '''
+    if not pub_date or not slug:
+        return None
+    return reverse('blog:post-detail', args=[pub_date.year, pub_date.strftime('%b').lower(), pub_date.day, slug])
+
 class Post(models.Model):
     '''Blog Entries'''
 
@@ -62,6 +78,8 @@ class Post(models.Model):
     status = models.CharField(max_length=1, choices=PUB_STATUS)
     date_created = models.DateTimeField(null=False, blank=False, auto_now_add=True)
     date_modified = models.DateTimeField(null=False, blank=False, auto_now=True, auto_now_add=True)
+    permalink = models.CharField(max_length=255, null=True, blank=True, editable=False,
+                                 help_text='Url of the post, set on save from pub_date and slug.')
 
     # Reverse Generic Relationships
     topics = generic.GenericRelation(TopicCatalog)
@@ -69,10 +87,9 @@ class Post(models.Model):
     
     objects = PostManager()
 
-    @models.permalink
     def get_absolute_url(self):
-        '''Get projects url.'''
-        return reverse('blog:post-detail', args=[self.pub_date.year, self.pud_date.month, self.pub_date.day, self.slug])
+        '''Returns the stored permalink, posts loaded without one get it computed.'''
+        return self.permalink or post_permalink(self.pub_date, self.slug)
 
     def __unicode__(self):
         return self.title
@@ -112,15 +129,93 @@ class Post(models.Model):
         '''
         # @NOTE this is a work around until I go to django 1.2
         self.clean()
+        self.permalink = post_permalink(self.pub_date, self.slug)
         super(Post, self).save(force_insert, force_update) # Actual Save method.
 
     class Meta:
         get_latest_by = 'pub_date'
         ordering = ['-pub_date']
 
+class PostCardManager(models.Manager):
+    '''Adds the published filter of PostManager to the cards of posts.'''
+
+    def published(self, pub_date=None):
+        '''
+        Only returns the cards of posts that are published and of pub_date or
+        earlier.
+
+        :param pub_date: Cards with pub_date later than this are not considered
+                         published.
+
+        '''
+        if not pub_date:
+            pub_date = datetime.now()
+        return route(self.filter(status=PUBLISHED_STATUS, pub_date__lte=pub_date, pub_date__isnull=False))
+
+class PostCard(models.Model):
+    '''
+    Everything a list of posts shows of a post in one row, so lists read a
+    single table instead of joining authors, tags and topics for each item.
+    Rebuilt by metarho.blog.cards whenever the post or its tags and topics
+    change, never edited directly.
+
+    '''
+
+    post = models.OneToOneField(Post, primary_key=True, related_name='card')
+    title = models.CharField(max_length=75)
+    slug = models.SlugField(max_length=75, null=True)
+    status = models.CharField(max_length=1, choices=PUB_STATUS)
+    pub_date = models.DateTimeField(null=True, db_index=True)
+    permalink = models.CharField(max_length=255, null=True)
+    author_name = models.CharField(max_length=255)
+    teaser = models.TextField()
+    # JSON lists of [slug, text] and [path, name, description].
+    tags = models.TextField()
+    topics = models.TextField()
+    # Tag slugs separated and surrounded by spaces for filtering by tag.
+    tag_slugs = models.TextField()
+    date_built = models.DateTimeField()
+
+    objects = PostCardManager()
+
+    def tag_list(self):
+        '''Returns the tags of the post as dictionaries of slug and text.'''
+        return [{'slug': slug, 'text': text} for slug, text in simplejson.loads(self.tags)]
+
+    def topic_list(self):
+        '''Returns the topics of the post as dictionaries of path, name and description.'''
+        return [{'path': path, 'name': name, 'description': description}
+                for path, name, description in simplejson.loads(self.topics)]
+
+    def __unicode__(self):
+        return self.title
+
+    class Meta:
+        ordering = ['-pub_date']
+
 class PostMeta(models.Model):
     '''Holds additional data in key:value pairs for posts.'''
     
     post = models.ForeignKey(Post)
     key = models.CharField(max_length=30, null=False, blank=False)
-    value = models.CharField(max_length=255, null=False, blank=False)
\ No newline at end of file
+    value = models.CharField(max_length=255, null=False, blank=False)
+
+class ScheduleRun(models.Model):
+    '''
+    Time up to which posts with a future pub_date were released, so runs of
+    publishscheduled from cron carry on where the last one stopped.  Holds a
+    single row, see metarho.blog.schedule.
+
+    '''
+
+    released = models.DateTimeField()
+
+# Cached lookup of post authors and site owners by primary key, with the
+# fields their names are made of and the email feeds credit them with.
+authors = ModelLookup(User, 'pk', fields=('id', 'username', 'first_name', 'last_name', 'email'))
+
+namespace('blog').track(Post, PostMeta)
+replicas.track(Post, PostMeta)
+
+# Connects the receivers keeping the PostCards current.
+import metarho.blog.cards
@@ -0,0 +1,118 @@
+# file blog/pages.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The urls of the public pages, read from the database, for rendering them
+# ahead of readers.
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+
+from metarho.blog.models import Post
+from metarho.blog.models import post_permalink
+from metarho.ontology.catalog import topic_counts
+from metarho.ontology.models import Tag
+from metarho.ontology.tree import topic_tree
+
+FEED_FORMATS = ['rss', 'atom']
+
+def with_feeds(url):
+    '''Returns a url followed by its feed urls.'''
+    return [url] + ['%s?format=%s' % (url, fmt) for fmt in FEED_FORMATS]
+
+def _month(date):
+    return date.strftime('%b').lower()
+
+def post_url(post):
+    '''Returns the detail url of a post.'''
+    return post.get_absolute_url()
+
+def day_url(date):
+    '''Returns the day archive of a date.'''
+    return reverse('blog:list-day', args=[date.year, _month(date), date.day])
+
+def month_url(date):
+    '''Returns the month archive of a date.'''
+    return reverse('blog:list-month', args=[date.year, _month(date)])
+
+def year_url(date):
+    '''Returns the year archive of a date.'''
+    return reverse('blog:list-year', args=[date.year])
+
+def day_urls(date):
+    '''Returns the day archive of a date with its feeds.'''
+    return with_feeds(day_url(date))
+
+def month_urls(date):
+    '''Returns the month archive of a date with its feeds, the month is linked with both spellings.'''
+    urls = with_feeds(month_url(date))
+    urls.extend(with_feeds(reverse('blog:list-month', args=[date.year, date.strftime('%b')])))
+    return urls
+
+def year_urls(date):
+    '''Returns the year archive of a date with its feeds.'''
+    return with_feeds(year_url(date))
+
+def index_urls():
+    '''Returns the index with its feeds and the archive list.'''
+    return with_feeds(reverse('blog:index')) + [reverse('blog:archive-list')]
+
+def _tag_urls(tags):
+    return [reverse('blog:tag-list', args=[slug]) for slug in tags.values_list('slug', flat=True)]
+
+def _unique(urls):
+    seen = set()
+    return [url for url in urls if url not in seen and not seen.add(url)]
+
+def affected_urls(posts):
+    '''
+    Returns the urls of the cached pages a list of posts appear on: the
+    index, the archive list and their date archives, details and tags.
+
+    '''
+    urls = index_urls()
+    for post in posts:
+        urls.append(post_url(post))
+        urls.extend(day_urls(post.pub_date) + month_urls(post.pub_date) + year_urls(post.pub_date))
+    ct = ContentType.objects.get_for_model(Post)
+    tags = Tag.objects.filter(taggeditem__content_type=ct,
+                              taggeditem__object_id__in=[post.pk for post in posts]).distinct()
+    return _unique(urls + _tag_urls(tags))
+
+def public_urls():
+    '''
+    Yields the url of every public page: the index, the date archives, the
+    posts, the tags and topics with published posts and the feeds.  Posts
+    are read in one query without loading whole rows.
+
+    '''
+    posts = Post.objects.published().order_by()
+    for url in index_urls():
+        yield url
+    for kind, urls in (('year', year_urls), ('month', month_urls), ('day', day_urls)):
+        for date in posts.dates('pub_date', kind, order='DESC'):
+            for url in urls(date):
+                yield url
+    for permalink, pub_date, slug in posts.order_by('-pub_date').values_list('permalink', 'pub_date', 'slug').iterator():
+        yield permalink or post_permalink(pub_date, slug)
+    ct = ContentType.objects.get_for_model(Post)
+    tags = Tag.objects.filter(taggeditem__content_type=ct,
+                              taggeditem__object_id__in=posts.values('pk')).distinct()
+    for url in _tag_urls(tags):
+        yield url
+    counts = topic_counts(Post, descendants=False)
+    for topic in topic_tree().walk():
+        if topic.pk in counts:
+            yield reverse('blog:post-topic', args=[topic.path])
@@ -0,0 +1,71 @@
+# file blog/schedule.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Posts saved with a future pub_date become visible when that time passes
+# without any write, so nothing bumps the caches then.  Releasing them bumps
+# the blog namespace and renders the pages they appear on ahead of readers.
+# Cached pages are keyed on ETags that count the published posts so they
+# change on their own, the fragments keyed on generations are what go stale.
+#
+# The bump and the rendered pages reach the web processes through the cache
+# backend, so releasing needs one shared with them.
+
+from django.db.models import Min
+
+from metarho import PUBLISHED_STATUS
+from metarho.blog.models import Post
+from metarho.blog.models import ScheduleRun
+from metarho.blog.pages import affected_urls
+from metarho.caching.generations import namespace
+from metarho.caching.warm import warm
+
+def upcoming(now):
+    '''Returns the next pub_date after ``now`` of a published post or None.'''
+    return Post.objects.filter(status=PUBLISHED_STATUS,
+            pub_date__gt=now).aggregate(date=Min('pub_date'))['date']
+
+def due(since, until):
+    '''Returns the published posts whose pub_date passed after ``since`` up to ``until``.'''
+    return Post.objects.published(until).filter(pub_date__gt=since)
+
+def last_released():
+    '''Returns the time up to which posts were released, None before the first release.'''
+    for run in ScheduleRun.objects.all()[:1]:
+        return run.released
+    return None
+
+def mark_released(until):
+    '''Records that the posts due up to ``until`` were released.'''
+    if not ScheduleRun.objects.update(released=until):
+        ScheduleRun(released=until).save()
+
+def release(posts, render=True, host='localhost'):
+    '''
+    Refreshes the caches for posts that just became visible and returns the
+    (url, status, seconds, bytes) of each page rendered.
+
+    :param posts: Posts whose pub_date just passed.
+    :param render: Render the affected pages.
+    :param host: Host name the pages are requested with.
+
+    '''
+    posts = list(posts)
+    if not posts:
+        return []
+    namespace('blog').bump()
+    if not render:
+        return []
+    return warm(affected_urls(posts), host)
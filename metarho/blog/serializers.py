@@ -0,0 +1,138 @@
+# file blog/serializers.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.http import HttpResponseBadRequest
+from django.core.serializers.json import DjangoJSONEncoder
+
+from metarho import user_name
+from metarho.blog.models import post_permalink
+from metarho.decorators import FORMAT_MAP
+
+# Fields a post can be serialized with and the column each one reads.
+# 'url' is the permalink stored when the post is saved, computed from
+# URL_COLUMNS for posts saved without one, 'author' is the display name of
+# user_name() built from AUTHOR_COLUMNS.
+POST_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'slug': 'slug',
+    'author': None,
+    'teaser': 'teaser',
+    'content': 'content',
+    'pub_date': 'pub_date',
+    'date_modified': 'date_modified',
+    'url': None,
+}
+
+LIST_FIELDS = ('id', 'title', 'slug', 'author', 'teaser', 'pub_date', 'url')
+AUTHOR_COLUMNS = ('author__username', 'author__first_name', 'author__last_name')
+URL_COLUMNS = ('permalink', 'pub_date', 'slug')
+
+DETAIL_FIELDS = ('id', 'title', 'slug', 'author', 'teaser', 'content', 'pub_date', 'date_modified', 'url')
+
+def requested_fields(request, default):
+    '''
+    Returns the fields selected with the ``fields`` querystring parameter,
+    ie ``?fields=title,url``, or ``default`` when there is none.
+
+    :param request: HttpRequest to read the selection from.
+    :param default: Tuple of fields returned without a selection.
+
+    '''
+    selection = request.GET.get('fields', None)
+    if not selection:
+        return default
+    fields = [f.strip() for f in selection.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in POST_FIELDS]
+    if unknown:
+        raise ValueError('Unknown fields: %s' % ', '.join(unknown))
+    return fields
+
+def post_rows(posts, fields):
+    '''
+    Yields a dictionary of ``fields`` for each post.  Rows are read with
+    values() so no model instances are built.
+
+    :param posts: QuerySet of posts.
+    :param fields: List of names from POST_FIELDS.
+
+    '''
+    columns = [POST_FIELDS[f] for f in fields if POST_FIELDS[f]]
+    if 'author' in fields:
+        columns.extend(AUTHOR_COLUMNS)
+    if 'url' in fields:
+        columns.extend(URL_COLUMNS)
+    for row in posts.values(*set(columns)).iterator():
+        if 'author' in fields:
+            username, first_name, last_name = [row[c] for c in AUTHOR_COLUMNS]
+            row['author'] = user_name(User(username=username, first_name=first_name, last_name=last_name))
+        if 'url' in fields:
+            row['url'] = row['permalink'] or post_permalink(row['pub_date'], row['slug'])
+        yield dict([(f, row[POST_FIELDS[f] or f]) for f in fields])
+
+def stream_json(rows, many=True):
+    '''
+    Encodes rows one at a time.  Lists are written as a JSON array, without
+    ``many`` the first row is written as an object.
+
+    '''
+    encoder = DjangoJSONEncoder()
+    if not many:
+        for row in rows:
+            yield encoder.encode(row)
+            return
+        yield 'null'
+        return
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + encoder.encode(row)
+        separator = ','
+    yield ']'
+
+def json_response(request, posts, default=LIST_FIELDS, many=True):
+    '''
+    Returns a response streaming posts as JSON with the fields the request
+    selects.  Lists are paged like the HTML lists, by the ``page``
+    parameter, and link to the next page with a Link header.
+
+    :param request: HttpRequest being answered.
+    :param posts: QuerySet of posts to serialize.
+    :param default: Fields serialized without a selection.
+    :param many: Serialize a list rather than a single post.
+
+    '''
+    try:
+        fields = requested_fields(request, default)
+    except ValueError, e:
+        return HttpResponseBadRequest(str(e), mimetype='text/plain')
+    following = None
+    if many:
+        per_page = getattr(settings, 'PAGINATION_DEFAULT_PAGINATION', 20)
+        page = max(getattr(request, 'page', 1), 1) # Set by PaginationMiddleware.
+        start = (page - 1) * per_page
+        if posts.values_list('pk', flat=True)[start + per_page:start + per_page + 1]:
+            query = request.GET.copy()
+            query['page'] = page + 1
+            following = '%s?%s' % (request.path, query.urlencode())
+        posts = posts[start:start + per_page]
+    response = HttpResponse(stream_json(post_rows(posts, fields), many), mimetype=FORMAT_MAP['json'])
+    if following:
+        response['Link'] = '<%s>; rel="next"' % following
+    return response
@@ -0,0 +1,227 @@
+# file blog/sitemaps.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The sitemaps of the blog, see http://www.sitemaps.org/protocol.html
+#
+# Posts are split into sitemaps by ranges of SITEMAP_SIZE primary keys, so a
+# sitemap never holds more urls than the protocol allows and a post stays in
+# the same sitemap for good.  New posts only change the newest sitemap, the
+# others keep their version and are served from the cache.  The index, date
+# archives, tags and topics are listed in the pages sitemaps.
+
+from datetime import datetime
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.urlresolvers import reverse
+from django.db.models import Count
+from django.db.models import Max
+from django.utils.html import escape
+
+from metarho import PUBLISHED_STATUS
+from metarho.blog.models import Post
+from metarho.blog.models import post_permalink
+from metarho.blog.pages import day_url
+from metarho.blog.pages import month_url
+from metarho.blog.pages import year_url
+from metarho.ontology.models import Tag
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.tree import topic_tree
+
+# Most urls a sitemap may hold.
+SITEMAP_SIZE = 50000
+
+# Rows read by each query while a sitemap is streamed.
+BATCH_SIZE = 1000
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+def lastmod(date):
+    '''Returns a date in the W3C format of <lastmod>.'''
+    return date.strftime('%Y-%m-%d')
+
+def _later(date, other):
+    if date is None or other > date:
+        return other
+    return date
+
+def _range(number):
+    return Post.objects.published().filter(pk__gte=number * SITEMAP_SIZE,
+                                           pk__lt=(number + 1) * SITEMAP_SIZE).order_by()
+
+def post_version(number):
+    '''
+    Returns the (count, latest date_modified) of the published posts of a
+    post sitemap, the count is 0 when it has none.
+
+    '''
+    found = _range(number).aggregate(count=Count('pk'), latest=Max('date_modified'))
+    return found['count'], found['latest']
+
+def post_sitemaps():
+    '''
+    Returns the (number, latest date_modified) of every post sitemap with
+    published posts, with one aggregate query per range of primary keys.
+
+    '''
+    top = Post.objects.published().order_by().aggregate(top=Max('pk'))['top']
+    if top is None:
+        return []
+    sitemaps = []
+    for number in range(top // SITEMAP_SIZE + 1):
+        count, latest = post_version(number)
+        if count:
+            sitemaps.append((number, latest))
+    return sitemaps
+
+def post_entries(number):
+    '''
+    Yields the (url, date_modified) of the published posts of a post
+    sitemap, read BATCH_SIZE rows at a time in primary key order.
+
+    '''
+    posts = _range(number).order_by('pk')
+    last = None
+    while True:
+        batch = posts
+        if last is not None:
+            batch = batch.filter(pk__gt=last)
+        rows = list(batch.values_list('pk', 'permalink', 'pub_date', 'slug', 'date_modified')[:BATCH_SIZE])
+        for last, permalink, pub_date, slug, modified in rows:
+            yield permalink or post_permalink(pub_date, slug), modified
+        if len(rows) < BATCH_SIZE:
+            return
+
+def page_entries():
+    '''
+    Returns the (url, date_modified) of the index, the date archives and the
+    tags and topics with published posts.  The date of a list is the newest
+    date_modified of its posts.  Each kind of list is read with one grouped
+    query, years and months are added up from the days.
+
+    '''
+    days = _latest_by_day()
+    if not days:
+        return []
+    years, months = {}, {}
+    for date, modified in days.items():
+        years[date.year] = _later(years.get(date.year), modified)
+        months[(date.year, date.month)] = _later(months.get((date.year, date.month)), modified)
+    latest = max(years.values())
+
+    entries = [(reverse('blog:index'), latest), (reverse('blog:archive-list'), latest)]
+    for date in sorted(days, reverse=True):
+        if date.year in years:
+            entries.append((year_url(date), years.pop(date.year)))
+        if (date.year, date.month) in months:
+            entries.append((month_url(date), months.pop((date.year, date.month))))
+        entries.append((day_url(date), days[date]))
+
+    tags = _latest_by(TaggedItem, 'tag')
+    slugs = Tag.objects.filter(pk__in=tags.keys()).values_list('pk', 'slug')
+    for pk, slug in sorted(slugs, key=lambda t: t[1]):
+        entries.append((reverse('blog:tag-list', args=[slug]), tags[pk]))
+    topics = _latest_by(TopicCatalog, 'topic')
+    for topic in topic_tree().walk():
+        if topic.pk in topics:
+            entries.append((reverse('blog:post-topic', args=[topic.path]), topics[topic.pk]))
+    return entries
+
+def page_chunks(entries):
+    '''Splits page entries into the pages sitemaps, SITEMAP_SIZE urls each.'''
+    return [entries[i:i + SITEMAP_SIZE] for i in range(0, len(entries), SITEMAP_SIZE)]
+
+def index_entries():
+    '''
+    Returns the (url, date_modified) of every post and pages sitemap, the
+    entries of the sitemap index.
+
+    '''
+    entries = [(reverse('blog:sitemap-posts', args=[number]), latest)
+               for number, latest in post_sitemaps()]
+    for number, chunk in enumerate(page_chunks(page_entries())):
+        entries.append((reverse('blog:sitemap-pages', args=[number]), max([m for u, m in chunk])))
+    return entries
+
+def _grouped(group, join='', params=()):
+    '''
+    Returns the (group, newest date_modified) rows of the published posts
+    grouped by the SQL expression ``group``, with one query.  ``join`` and
+    its ``params`` link the posts to other tables.  Generic relations and
+    date truncation cannot be expressed with values() so it is SQL.
+
+    '''
+    posts = Post.objects.published()
+    connection = posts.query.connection # A replica when the request is routed.
+    qn = connection.ops.quote_name
+    post = qn(Post._meta.db_table)
+    sql = ('SELECT %(group)s, MAX(%(post)s.%(modified)s) FROM %(post)s %(join)s'
+           'WHERE %(post)s.%(status)s = %%s AND %(post)s.%(pub_date)s <= %%s GROUP BY %(group)s' % {
+           'group': group, 'post': post, 'join': join,
+           'modified': qn(Post._meta.get_field('date_modified').column),
+           'status': qn(Post._meta.get_field('status').column),
+           'pub_date': qn(Post._meta.get_field('pub_date').column)})
+    cursor = connection.cursor()
+    cursor.execute(sql, list(params) + [PUBLISHED_STATUS, connection.ops.value_to_db_datetime(datetime.now())])
+    modified = Post._meta.get_field('date_modified')
+    return [(value, connection.ops.convert_values(latest, modified)) for value, latest in cursor.fetchall()]
+
+def _latest_by_day():
+    '''Returns the newest date_modified of the published posts of each day, keyed by date.'''
+    connection = Post.objects.published().query.connection
+    pub_date = Post._meta.get_field('pub_date')
+    day = connection.ops.date_trunc_sql('day', '%s.%s' % (connection.ops.quote_name(Post._meta.db_table),
+                                        connection.ops.quote_name(pub_date.column)))
+    return dict([(connection.ops.convert_values(value, pub_date).date(), latest)
+                 for value, latest in _grouped(day)])
+
+def _latest_by(link_model, field):
+    '''
+    Returns the newest date_modified of the published posts linked to each
+    object of ``field``, keyed by its primary key, with one grouped query.
+
+    '''
+    connection = Post.objects.published().query.connection
+    qn = connection.ops.quote_name
+    post, link = qn(Post._meta.db_table), qn(link_model._meta.db_table)
+    column = '%s.%s' % (link, qn(link_model._meta.get_field(field).column))
+    join = ('INNER JOIN %(link)s ON %(link)s.%(object_id)s = %(post)s.%(pk)s '
+            'AND %(link)s.%(content_type)s = %%s ' % {
+            'link': link, 'post': post, 'pk': qn(Post._meta.pk.column),
+            'object_id': qn(link_model._meta.get_field('object_id').column),
+            'content_type': qn(link_model._meta.get_field('content_type').column)})
+    return dict(_grouped(column, join, [ContentType.objects.get_for_model(Post).pk]))
+
+def urlset(entries, base):
+    '''
+    Yields the XML of a sitemap in pieces.
+
+    :param entries: Iterable of (url, date_modified) tuples.
+    :param base: Scheme and host the urls are made absolute with.
+
+    '''
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="%s">\n' % SITEMAP_NS
+    for url, modified in entries:
+        yield '<url><loc>%s%s</loc><lastmod>%s</lastmod></url>\n' % (base, escape(url), lastmod(modified))
+    yield '</urlset>\n'
+
+def sitemapindex(entries, base):
+    '''Returns the XML of a sitemap index of (url, date_modified) tuples.'''
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="%s">\n' % SITEMAP_NS]
+    for url, modified in entries:
+        parts.append('<sitemap><loc>%s%s</loc><lastmod>%s</lastmod></sitemap>\n' % (base, escape(url), lastmod(modified)))
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts)
@@ -17,12 +17,24 @@
 # Contains various tags to use related to the blog models and features.
 from django import template
 
+from metarho import user_name
+
 from metarho.blog.models import Post
+from metarho.blog.models import PostCard
+from metarho.blog.models import authors
+from metarho.caching.fragments import cached_inclusion_tag
 
 register = template.Library()
 
-@register.inclusion_tag('blog/snippets/month_archive_block.xhtml')
+@cached_inclusion_tag(register, 'blog/snippets/month_archive_block.xhtml', ('blog',))
 def archive_list():
     '''Produces a list of months with published posts in them.'''
     dates = Post.objects.published().order_by('pub_date').dates('pub_date', 'month')
-    return {'dates': dates}
\ No newline at end of file
+    return {'dates': dates}
+
+@register.filter
+def author(post):
+    '''Returns the author name of a post from the lookup cache, or the name kept on a PostCard.'''
+    if isinstance(post, PostCard):
+        return post.author_name
+    return user_name(authors.get(post.author_id))
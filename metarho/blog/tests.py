@@ -17,18 +17,68 @@
 from datetime import datetime
 from datetime import date
 from datetime import timedelta
+import re
+from gzip import GzipFile
+from StringIO import StringIO
 
 from django.test import TestCase
+from django.test import TransactionTestCase
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 from django.core.urlresolvers import reverse
 from django.test.client import Client
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.conf import settings
+from django.utils import simplejson
+from django.template import Context
+from django.template import Template
 
+from metarho import PUBLISHED_STATUS
+from metarho import UNPUBLISHED_STATUS
 from metarho.blog.models import Post
+from metarho.blog.models import PostMeta
+from metarho.blog.models import PostCard
+from metarho.blog.models import post_permalink
+from metarho.blog.models import authors
 from metarho.blog.importer import WordPressExportParser
+from metarho.blog import bulk
+from metarho.blog import schedule
+from metarho.blog import sitemaps
+from metarho.blog import views
+from metarho.blog import cards
+from metarho.blog.serializers import post_rows
+from metarho.blog.pages import public_urls
+from metarho.blog.pages import day_url
+from metarho.blog.pages import month_url
+from metarho.caching.warm import warm
+from metarho.caching import warm as warming
+from metarho.caching.generations import shared_cache
+from metarho.blog.exporter import WXRExporter
+from metarho.blog.exporter import JSONLinesExporter
+from metarho.blog.feeds import PostsFeed
+from metarho.blog.feeds import PostsFeedAtom
+from metarho.blog.feeds import feed_render
+from metarho.blog.feeds import FEED_CURRENT_SIZE
 from metarho.ontology.models import Tag
 from metarho.ontology.models import Topic
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.models import tag_by_slug
+from metarho.ontology.catalog import resolve_catalog
+from metarho.ontology.catalog import topic_counts
+from metarho.ontology import bulk as ontology_bulk
+from metarho.jobs.models import Job
+from metarho.jobs.models import QUEUED_STATUS
+from metarho.jobs import worker
+from metarho.benchmark import runner
+from metarho.benchmark.data import SyntheticBlog
+from metarho.benchmark.wxr import SyntheticWXR
+from metarho.benchmark import imports
+from metarho.instrumentation import recorder
+from metarho.caching import lru
+from metarho import replicas
 
 # CUSTOM MANAGER TESTS
 
@@ -126,6 +176,33 @@ class PostTest(TestCase):
         post2.save()
         expected = 'test-title-1-2'
         self.failUnlessEqual(post2.slug, expected, 'Post2 slug was %s but expected %s' % (post2.slug, expected))
+
+    def test_permalink(self):
+        '''The permalink is stored on save and follows the pub_date and slug.'''
+        post = Post.objects.get(slug='its-all-greek-to-you')
+        self.failUnlessEqual('/2009/apr/8/its-all-greek-to-you/', post.get_absolute_url(),
+                             'Unexpected url %s' % post.get_absolute_url())
+        self.failUnlessEqual(None, Post.objects.get(pk=2).get_absolute_url(), 'Posts without a slug have no url.')
+
+        post.slug = 'greek'
+        post.pub_date = datetime(2009, 5, 1, 12, 0)
+        post.save()
+        expected = '/2009/may/1/greek/'
+        stored = Post.objects.filter(pk=post.pk).values_list('permalink', flat=True)[0]
+        self.failUnlessEqual(expected, stored, 'Stored %s but expected %s' % (stored, expected))
+
+        Post.objects.filter(pk=post.pk).update(permalink=None)
+        self.failUnlessEqual(1, bulk.refresh_permalinks([post.pk]), 'Expected 1 permalink refreshed.')
+        self.failUnlessEqual(expected, Post.objects.get(pk=post.pk).permalink, 'The permalink was not refreshed.')
+
+        # Rows saved without a permalink still get a url.
+        Post.objects.filter(pk=post.pk).update(permalink=None)
+        row = list(post_rows(Post.objects.filter(pk=post.pk), ['url']))[0]
+        self.failUnlessEqual(expected, row['url'], 'Serialized %s but expected %s' % (row['url'], expected))
+        self.failUnless(expected in public_urls(), 'The post is not a public url.')
+        entries = dict(sitemaps.post_entries(post.pk // sitemaps.SITEMAP_SIZE))
+        self.failUnless(expected in entries, 'The post is not in its sitemap.')
+        self.failIf(None in entries, 'A sitemap entry has no url.')
         
 class WordPressExportParserTest(TestCase):
     '''Tests the import scripts as it relates to interation with blog app.'''
@@ -178,7 +255,7 @@ class WordPressExportParserTest(TestCase):
         
         # Test PostMeta being created correctly.
         postmeta = testpost.postmeta_set.all()
-        expected = 13
+        expected = 14 # 13 from the export plus the content hash.
         actual = postmeta.count()
         self.failUnlessEqual(expected, actual, 'Expected %s and returned %s Post Meta attributes.' % (expected, actual))
     
@@ -192,6 +269,63 @@ class WordPressExportParserTest(TestCase):
         topiccount = testpost.topics.all().count()
         expected = 1
         self.failUnlessEqual(expected, topiccount, 'Expected %s and returned %s topics.' % (expected, topiccount))
+
+    def test_reimport(self):
+        '''Importing again only updates the posts that changed.'''
+        self.wp.parse()
+        counts = (Post.objects.count(), PostMeta.objects.count(), Tag.objects.count(), Topic.objects.count(), TaggedItem.objects.count())
+
+        again = WordPressExportParser('blog/fixtures/wordpress.test.xml', self.owner.username)
+        again.parse()
+        self.failUnlessEqual(4, again.stats['unchanged'], 'Expected 4 unchanged posts but found %s' % again.stats)
+        recounts = (Post.objects.count(), PostMeta.objects.count(), Tag.objects.count(), Topic.objects.count(), TaggedItem.objects.count())
+        self.failUnlessEqual(counts, recounts, 'Expected %s objects after a re-import but found %s' % (counts, recounts))
+
+        export = open('blog/fixtures/wordpress.test.xml').read()
+        export = export.replace('<title>Here we go</title>', '<title>Here we go again</title>')
+        changed = WordPressExportParser(StringIO(export), self.owner.username)
+        changed.parse()
+        self.failUnlessEqual({'created': 0, 'updated': 1, 'unchanged': 3, 'failed': 0}, changed.stats, 'Expected 1 updated post but found %s' % changed.stats)
+        title = Post.objects.get(slug='here-we-go').title
+        self.failUnlessEqual('Here we go again', title, 'Expected the new title but found %s' % title)
+        recounts = (Post.objects.count(), PostMeta.objects.count(), Tag.objects.count(), Topic.objects.count(), TaggedItem.objects.count())
+        self.failUnlessEqual(counts, recounts, 'Expected %s objects after an update but found %s' % (counts, recounts))
+
+    def test_import_tag_text(self):
+        '''Posts are tagged with existing tags matched on their text.'''
+        tag = Tag(text='doubt', slug='doubting')
+        tag.save()
+        self.wp.parse()
+        tags = list(Post.objects.get(slug='here-we-go').tags.values_list('tag', flat=True))
+        self.failUnlessEqual([tag.pk], tags, 'Expected the existing tag but found %s' % tags)
+
+class ImportTransactionTest(TransactionTestCase):
+    '''Tests that a post failing to import is left as it was.'''
+
+    fixtures = ['loremauth.json',]
+
+    def test_failed_update(self):
+        '''A failed update keeps the meta the next import matches the post on.'''
+        owner = User.objects.get(pk=1)
+        WordPressExportParser('blog/fixtures/wordpress.test.xml', owner.username).parse()
+        post = Post.objects.get(slug='here-we-go')
+        meta = post.postmeta_set.count()
+
+        export = open('blog/fixtures/wordpress.test.xml').read()
+        export = export.replace('<title>Here we go</title>', '<title>Here we go again</title>')
+        export = export.replace('domain="category" nicename="fluff"', 'domain="category" nicename="missing"')
+        broken = WordPressExportParser(StringIO(export), owner.username)
+        broken.parse()
+        self.failUnlessEqual(1, broken.stats['failed'], 'Expected 1 failed post but found %s' % broken.stats)
+        post = Post.objects.get(pk=post.pk)
+        self.failUnlessEqual('Here we go', post.title, 'The failed update was saved.')
+        self.failUnlessEqual(meta, post.postmeta_set.count(), 'The meta of the post was lost.')
+        self.failUnlessEqual(1, post.tags.count(), 'The tags of the post were lost.')
+
+        again = WordPressExportParser('blog/fixtures/wordpress.test.xml', owner.username)
+        again.parse()
+        self.failUnlessEqual(4, again.stats['unchanged'], 'Expected 4 unchanged posts but found %s' % again.stats)
+        self.failUnlessEqual(4, Post.objects.count(), 'The post was imported twice.')
         
 class ViewTest(TestCase):
     '''
@@ -207,6 +341,16 @@ class ViewTest(TestCase):
     
     def setUp(self):
         self.client = Client()
+        # Responses are checked for their context, which cached ones lack.
+        self.timeout = settings.CACHE_VARIANTS_TIMEOUT
+        settings.CACHE_VARIANTS_TIMEOUT = 0
+        # A sampled request would replace the recorder of query counting tests.
+        self.rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        settings.INSTRUMENTATION_SAMPLE_RATE = 0
+
+    def tearDown(self):
+        settings.CACHE_VARIANTS_TIMEOUT = self.timeout
+        settings.INSTRUMENTATION_SAMPLE_RATE = self.rate
     
     def test_post_detail(self):
         '''Tests individual entry return.'''
@@ -226,8 +370,11 @@ class ViewTest(TestCase):
         '''
         expected = 301
         url = '?p=4'
-        code = self.client.get(url).status_code
+        response = self.client.get(url)
+        code = response.status_code
         self.failUnlessEqual(code, expected, 'Expected %s but returned %s for %s' % (expected, code, url))
+        location = response['Location']
+        self.failUnless(location.endswith('/2010/mar/23/pellentesque-habitant-morbi/'), 'Unexpected redirect to %s' % location)
         
     def test_post_all(self):
         '''Tests the default return of posts.'''
@@ -311,4 +458,772 @@ class ViewTest(TestCase):
         expected = 200
         response = self.client.get(url)
         code = response.status_code
-        self.failUnlessEqual(expected, code, 'Expected %s but returned %s for %s' % (expected, code, url))
\ No newline at end of file
+        self.failUnlessEqual(expected, code, 'Expected %s but returned %s for %s' % (expected, code, url))
+
+    def test_conditional_get(self):
+        '''Unchanged posts and archives answer revalidation with 304.'''
+        post = Post.objects.published()[0]
+        attrs = [post.pub_date.year, date.strftime(post.pub_date, '%b'), post.pub_date.day, post.slug]
+        for url in (reverse('blog:post-detail', args=attrs), reverse('blog:archive-list')):
+            response = self.client.get(url)
+            etag = response['ETag']
+            self.failUnless(response.has_header('Last-Modified'), 'Missing Last-Modified for %s' % url)
+            code = self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+            self.failUnlessEqual(304, code, 'Expected 304 but returned %s for %s' % (code, url))
+            code = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code
+            self.failUnlessEqual(304, code, 'Expected 304 but returned %s for %s' % (code, url))
+
+            post.save()
+            code = self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code
+            self.failUnlessEqual(200, code, 'Expected 200 after an edit but returned %s for %s' % (code, url))
+
+    def test_compressed_variants(self):
+        '''Cached responses are served gzipped to clients accepting it.'''
+        settings.CACHE_VARIANTS_TIMEOUT = 60
+        url = reverse('blog:archive-list')
+        identity = self.client.get(url).content
+        for i in range(2):
+            rec = recorder.start()
+            try:
+                response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+                content = response.content
+            finally:
+                recorder.stop()
+            self.failUnlessEqual('gzip', response['Content-Encoding'], 'Expected a gzip variant for %s' % url)
+            self.failUnless('Accept-Encoding' in response['Vary'], 'Response does not vary on Accept-Encoding.')
+            self.failUnlessEqual(identity, GzipFile(fileobj=StringIO(content)).read(), 'The gzip variant differs from the page.')
+            # Only the validator runs for a cached version.
+            self.failUnlessEqual(1, rec.queries, 'Expected 1 query for a cached page but ran %s' % rec.queries)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.failIf(response.has_header('Content-Encoding'), 'Sent an encoding the client refused.')
+
+    def test_negotiation(self):
+        '''Post lists and details are served as JSON when asked for.'''
+        url = reverse('blog:index')
+        browser = 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+        response = self.client.get(url, HTTP_ACCEPT=browser)
+        self.failUnless(response['Content-Type'].startswith('text/html'), 'Expected HTML but returned %s' % response['Content-Type'])
+        self.failUnless('Accept' in response['Vary'], 'Response does not vary on Accept.')
+
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.failUnlessEqual('application/json', response['Content-Type'], 'Expected JSON but returned %s' % response['Content-Type'])
+        posts = simplejson.loads(response.content)
+        expected = Post.objects.published().count()
+        self.failUnlessEqual(expected, len(posts), 'Expected %s posts but returned %s' % (expected, len(posts)))
+
+        response = self.client.get(url, {'format': 'json', 'fields': 'title,url'})
+        keys = sorted(simplejson.loads(response.content)[0].keys())
+        self.failUnlessEqual(['title', 'url'], keys, 'Expected only the selected fields but returned %s' % keys)
+        code = self.client.get(url, {'format': 'json', 'fields': 'password'}).status_code
+        self.failUnlessEqual(400, code, 'Expected 400 for an unknown field but returned %s' % code)
+
+        post = Post.objects.published()[0]
+        attrs = [post.pub_date.year, date.strftime(post.pub_date, '%b'), post.pub_date.day, post.slug]
+        response = self.client.get(reverse('blog:post-detail', args=attrs), {'format': 'json'})
+        detail = simplejson.loads(response.content)
+        self.failUnlessEqual(post.content, detail['content'], 'Returned the wrong post content.')
+        self.failUnlessEqual(post.get_absolute_url(), detail['url'], 'Returned the wrong url %s' % detail['url'])
+
+    def test_json_pages(self):
+        '''JSON lists are paged and name authors like the HTML pages.'''
+        url = reverse('blog:index')
+        per_page = getattr(settings, 'PAGINATION_DEFAULT_PAGINATION', 20)
+        settings.PAGINATION_DEFAULT_PAGINATION = 1
+        try:
+            response = self.client.get(url, {'format': 'json', 'fields': 'id'})
+            self.failUnlessEqual(1, len(simplejson.loads(response.content)), 'Expected a single post per page.')
+            self.failUnless('page=2' in response['Link'], 'Expected a link to the next page but found %s' % response['Link'])
+            response = self.client.get(url, {'format': 'json', 'fields': 'id', 'page': 2})
+            self.failUnlessEqual(1, len(simplejson.loads(response.content)), 'Expected a single post on page 2.')
+            self.failIf(response.has_header('Link'), 'The last page links to another.')
+        finally:
+            settings.PAGINATION_DEFAULT_PAGINATION = per_page
+
+        post = Post.objects.published()[0]
+        post.author.first_name, post.author.last_name = 'Gaius', 'Julius'
+        post.author.save()
+        row = list(post_rows(Post.objects.filter(pk=post.pk), ['author']))[0]
+        self.failUnlessEqual({'author': 'Gaius Julius'}, row, 'Expected the display name but found %s' % row)
+
+class CatalogResolverTest(TestCase):
+    '''Tests resolving tagged content through the catalog resolver.'''
+
+    fixtures = ['loremauth.json', 'loremblog.json']
+
+    def setUp(self):
+        self.tag = Tag(text='Resolver', slug='resolver')
+        self.tag.save()
+        for post in Post.objects.all():
+            TaggedItem(content_object=post, tag=self.tag).save()
+
+    def test_resolve_catalog(self):
+        '''Only published posts are returned, newest first.'''
+        page = resolve_catalog(self.tag.taggeditem_set.all())
+        expected = list(Post.objects.published().order_by('-pub_date'))
+        actual = page.object_list
+        self.failUnlessEqual(expected, actual, 'Expected %s but resolved %s' % (expected, actual))
+
+    def test_resolve_catalog_pages(self):
+        '''Pages split the date ordered list.'''
+        page = resolve_catalog(self.tag.taggeditem_set.all(), page=2, per_page=1)
+        expected = [Post.objects.published().order_by('-pub_date')[1]]
+        self.failUnlessEqual(expected, page.object_list, 'Expected %s but resolved %s' % (expected, page.object_list))
+        self.failUnlessEqual(2, page.paginator.count, 'Expected 2 items but counted %s' % page.paginator.count)
+
+    def test_resolve_undated(self):
+        '''Objects of models without get_latest_by follow the dated ones.'''
+        other = Tag(text='Undated', slug='undated')
+        other.save()
+        TaggedItem(content_object=other, tag=self.tag).save()
+        expected = list(Post.objects.published().order_by('-pub_date')) + [other]
+        actual = resolve_catalog(self.tag.taggeditem_set.all()).object_list
+        self.failUnlessEqual(expected, actual, 'Expected %s but resolved %s' % (expected, actual))
+
+    def test_topic_counts(self):
+        '''Published posts are counted once per topic and subtree.'''
+        first, second = Post.objects.published().order_by('pk')[:2]
+        parent = Topic(text='Parent', slug='parent')
+        parent.save()
+        child = Topic(text='Child', slug='child', parent=parent)
+        child.save()
+        TopicCatalog(content_object=first, topic=parent).save()
+        TopicCatalog(content_object=first, topic=child).save()
+        TopicCatalog(content_object=second, topic=child).save()
+
+        direct = topic_counts(Post, descendants=False)
+        self.failUnlessEqual({parent.pk: 1, child.pk: 2}, direct, 'Unexpected direct counts %s' % direct)
+        rec = recorder.start()
+        try:
+            subtree = topic_counts(Post)
+        finally:
+            recorder.stop()
+        self.failUnlessEqual({parent.pk: 2, child.pk: 2}, subtree, 'Unexpected subtree counts %s' % subtree)
+        self.failUnlessEqual(0, rec.queries, 'Expected cached counts but ran %s queries' % rec.queries)
+
+        second.status = UNPUBLISHED_STATUS
+        second.save()
+        subtree = topic_counts(Post)
+        self.failUnlessEqual({parent.pk: 1, child.pk: 1}, subtree, 'Counts were not updated after unpublishing.')
+
+class LookupTest(TestCase):
+    '''Tests the two level lookup cache.'''
+
+    fixtures = ['loremauth.json', 'loremblog.json']
+
+    def test_lru(self):
+        '''The least recently used entry is evicted first.'''
+        recent = lru.LRUCache(max_size=2, timeout=30)
+        recent.set('a', 1)
+        recent.set('b', 2)
+        recent.get('a')
+        recent.set('c', 3)
+        self.failUnlessEqual(None, recent.get('b'), 'Expected b to be evicted.')
+        self.failUnlessEqual(1, recent.get('a'), 'Expected a to be kept.')
+        self.failUnlessEqual(1, recent.evictions, 'Expected 1 eviction but counted %s' % recent.evictions)
+        expired = lru.LRUCache(timeout=-1)
+        expired.set('a', 1)
+        self.failUnlessEqual(None, expired.get('a'), 'Expected a to expire.')
+
+    def test_lookup(self):
+        '''Repeated lookups skip the database until the model changes.'''
+        tag = Tag(text='Lookup', slug='lookup')
+        tag.save()
+        self.failUnlessEqual(tag.pk, tag_by_slug.get(tag.slug).pk, 'Looked up the wrong tag.')
+        self.failUnlessEqual(None, tag_by_slug.get('no-such-tag'), 'Expected no tag.')
+        rec = recorder.start()
+        try:
+            tag_by_slug.get(tag.slug)
+            lru.local.clear() # Answered from the cache backend instead.
+            tag_by_slug.get(tag.slug)
+            tag_by_slug.get('no-such-tag')
+        finally:
+            recorder.stop()
+        self.failUnlessEqual(0, rec.queries, 'Expected no queries but ran %s' % rec.queries)
+
+        tag.text = 'Renamed'
+        tag.save()
+        text = tag_by_slug.get(tag.slug).text
+        self.failUnlessEqual('Renamed', text, 'Expected the saved tag but found %s' % text)
+
+    def test_lookup_fields(self):
+        '''Authors are cached without their password.'''
+        user = User.objects.get(pk=1)
+        author = authors.get(user.pk)
+        self.failUnlessEqual(user.username, author.username, 'Looked up the wrong author.')
+        self.failUnlessEqual('', author.password, 'The password hash was cached.')
+
+    def test_fragment(self):
+        '''Sidebar blocks are rendered again only after their content changes.'''
+        block = Template('{% load blog_tags %}{% archive_list %}')
+        expected = block.render(Context())
+        rec = recorder.start()
+        try:
+            html = block.render(Context())
+        finally:
+            recorder.stop()
+        self.failUnlessEqual(expected, html, 'The cached block differs from the rendered one.')
+        self.failUnlessEqual(0, rec.queries, 'Expected no queries but ran %s' % rec.queries)
+
+        post = Post.objects.published()[0]
+        post.pub_date = datetime(2001, 1, 5)
+        post.save()
+        html = block.render(Context())
+        self.failUnless('January 2001' in html, 'The block was not rendered again after a post changed.')
+
+class FeedTest(TestCase):
+    '''Tests streaming and archived feeds.'''
+
+    def setUp(self):
+        SyntheticBlog(posts=40, tags=5, topic_depth=2, topic_breadth=2).generate()
+
+    def test_stream(self):
+        '''Streamed feeds match the framework's document in bounded queries.'''
+        path = reverse('blog:index')
+        for feed_class in (PostsFeed, PostsFeedAtom):
+            feed = feed_class('myslug', runner._feed_request(path))
+            feed.items = Post.objects.published()
+            expected = feed.get_feed('').writeString('utf-8')
+
+            feed.chunk_size = 3
+            rec = recorder.start()
+            try:
+                content = feed_render(feed).content
+            finally:
+                recorder.stop()
+            self.failUnlessEqual(expected, content, 'Streamed %s differs from the framework feed.' % feed_class.__name__)
+            chunks = (feed.items.count() + feed.chunk_size) / feed.chunk_size
+            self.failUnless(rec.queries <= 5 + 3 * chunks, 'Expected at most %s queries but ran %s' % (5 + 3 * chunks, rec.queries))
+
+    def test_archives(self):
+        '''The current feed links to closed month archives and they link back.'''
+        link = re.compile(r'<link href="http://[^/"]+([^"]+)" rel="([a-z-]+)"')
+        content = self.client.get(reverse('blog:index'), {'format': 'atom'}).content
+        links = dict([(rel, href) for href, rel in link.findall(content)])
+        entries = content.count('<entry>')
+        self.failUnlessEqual(FEED_CURRENT_SIZE, entries, 'Expected %s current entries but returned %s' % (FEED_CURRENT_SIZE, entries))
+        self.failUnless('prev-archive' in links, 'The current feed has no prev-archive link.')
+
+        url = links['prev-archive'].replace('&amp;', '&')
+        response = self.client.get(url)
+        content = response.content
+        self.failUnless('<fh:archive>' in content, 'Expected an archive document at %s' % url)
+        self.failUnless('max-age=3600' in response['Cache-Control'], 'Archive %s is not cached for an hour.' % url)
+        links = dict([(rel, href) for href, rel in link.findall(content)])
+        self.failIf('next-archive' in links, 'The newest archive has a next-archive link.')
+        previous = links['prev-archive']
+        response = self.client.get(previous)
+        links = dict([(rel, href) for href, rel in link.findall(response.content)])
+        self.failUnlessEqual(url, links['next-archive'], 'Expected %s as next-archive but found %s' % (url, links.get('next-archive')))
+
+    def test_archive_version(self):
+        '''A month feed gets a new ETag when its month closes.'''
+        newest = Post.objects.published().order_by('-pub_date')[0].pub_date
+        url = reverse('blog:list-month', args=[newest.strftime('%Y'), newest.strftime('%b')])
+        month = views._month_start(newest)
+        clock = views._open_month
+        try:
+            views._open_month = lambda: month
+            opened = self.client.get(url, {'format': 'atom'})
+            views._open_month = lambda: views._next_month(month)
+            closed = self.client.get(url, {'format': 'atom'}, HTTP_IF_NONE_MATCH=opened['ETag'])
+        finally:
+            views._open_month = clock
+        self.failUnlessEqual(200, closed.status_code, 'The closed month was answered with %s' % closed.status_code)
+        self.failIfEqual(opened['ETag'], closed['ETag'], 'The ETag did not change when the month closed.')
+        self.failIf('<fh:archive>' in opened.content, 'The open month is an archive document.')
+        self.failUnless('<fh:archive>' in closed.content, 'The closed month is not an archive document.')
+
+class BulkTest(TestCase):
+    '''Tests changing many posts at once.'''
+
+    def setUp(self):
+        SyntheticBlog(posts=30, tags=5, topic_depth=1, topic_breadth=2).generate()
+
+    def test_publish(self):
+        '''Posts are published and redated with a fixed number of queries.'''
+        posts = Post.objects.order_by('pk')[:20]
+        ids = [post.pk for post in posts]
+        Post.objects.filter(pk__in=ids).update(status=UNPUBLISHED_STATUS, slug=None, title='Same Title')
+        rec = recorder.start()
+        try:
+            bulk.publish(Post.objects.filter(pk__in=ids))
+        finally:
+            recorder.stop()
+        # 10 to publish and 6 to rebuild the PostCards.
+        self.failUnless(rec.queries <= 16, 'Expected at most 16 queries but ran %s' % rec.queries)
+        published = Post.objects.published().filter(pk__in=ids).count()
+        self.failUnlessEqual(20, published, 'Expected 20 published posts but found %s' % published)
+
+        bulk.redate(ids, datetime(2001, 2, 3, 12, 0))
+        for slug, permalink in Post.objects.filter(pk__in=ids).values_list('slug', 'permalink'):
+            self.failUnlessEqual('/2001/feb/3/%s/' % slug, permalink, 'Stale permalink %s' % permalink)
+        slugs = list(Post.objects.filter(pk__in=ids).values_list('slug', flat=True))
+        self.failUnlessEqual(20, len(set(slugs)), 'Slugs are not unique for the day: %s' % slugs)
+        self.failUnless('same-title' in slugs and 'same-title-2' in slugs, 'Unexpected slugs %s' % slugs)
+        for post in Post.objects.filter(pk__in=ids):
+            post.clean() # Raises ValidationError for duplicate slugs.
+
+        bulk.unpublish(ids)
+        published = Post.objects.published().filter(pk__in=ids).count()
+        self.failUnlessEqual(0, published, 'Expected no published posts but found %s' % published)
+
+    def test_tags(self):
+        '''Links are added once and removed with set based statements.'''
+        posts = Post.objects.order_by('pk')[:10]
+        tag = Tag(text='Bulk', slug='bulk')
+        tag.save()
+        topic = Topic.objects.all()[0]
+        self.failUnlessEqual(10, bulk.add_tags(posts, [tag]), 'Expected 10 new links.')
+        self.failUnlessEqual(0, bulk.add_tags(posts, [tag]), 'Links were added twice.')
+        bulk.add_topics(posts, [topic])
+        linked = TopicCatalog.objects.filter(topic=topic, object_id__in=[p.pk for p in posts]).count()
+        self.failUnlessEqual(10, linked, 'Expected 10 posts under %s but found %s' % (topic, linked))
+        self.failUnlessEqual(10, bulk.remove_tags(posts, [tag]), 'Expected 10 links removed.')
+        self.failUnlessEqual(0, tag.taggeditem_set.count(), 'Tag links remain.')
+        self.failUnlessEqual(10, bulk.remove_topics(posts, [topic]), 'Expected 10 topic links removed.')
+
+    def test_admin_actions(self):
+        '''The admin asks for tags before tagging the selection.'''
+        user = User.objects.create_user('editor', 'editor@example.com', 'secret')
+        user.is_staff = user.is_superuser = True
+        user.save()
+        self.client.login(username='editor', password='secret')
+        tag = Tag(text='Admin', slug='admin')
+        tag.save()
+        ids = [str(pk) for pk in Post.objects.order_by('pk').values_list('pk', flat=True)[:3]]
+        url = reverse('admin:blog_post_changelist')
+        response = self.client.post(url, {'action': 'add_tags', '_selected_action': ids})
+        self.failUnless('name="tags"' in response.content, 'Expected the tags form.')
+        response = self.client.post(url, {'action': 'add_tags', '_selected_action': ids,
+                                          'tags': [tag.pk], 'apply': 'Apply'})
+        self.failUnlessEqual(302, response.status_code, 'Expected a redirect but returned %s' % response.status_code)
+        self.failUnlessEqual(3, tag.taggeditem_set.count(), 'Expected 3 tagged posts.')
+
+class PostCardTest(TestCase):
+    '''Tests the denormalized rows post lists are read from.'''
+
+    fixtures = ['loremauth.json', 'loremblog.json']
+
+    def setUp(self):
+        self.post = Post.objects.published().order_by('-pub_date')[0]
+
+    def _card(self):
+        return PostCard.objects.get(pk=self.post.pk)
+
+    def test_queued_rebuild(self):
+        '''Merges linking many posts leave their cards to one queued job.'''
+        first, second, third = [Tag(text=text) for text in ('First', 'Second', 'Third')]
+        for tag in (first, second, third):
+            tag.save()
+            self.post.tags.create(tag=tag)
+        saved = cards.QUEUE_OVER
+        cards.QUEUE_OVER = 0
+        try:
+            ontology_bulk.merge_tags(first, [second])
+            ontology_bulk.merge_tags(first, [third])
+        finally:
+            cards.QUEUE_OVER = saved
+        queued = Job.objects.filter(name='blog.rebuildcards', status=QUEUED_STATUS).count()
+        self.failUnlessEqual(1, queued, 'Expected one queued rebuild but found %s' % queued)
+        self.failUnless({'slug': 'second', 'text': 'Second'} in self._card().tag_list(), 'The card was rebuilt in the merge.')
+        worker.work('test', once=True)
+        self.failUnlessEqual([{'slug': 'first', 'text': 'First'}], self._card().tag_list(),
+                             'Unexpected tags %s after the queued rebuild.' % self._card().tag_list())
+
+    def test_card(self):
+        '''Cards follow changes to posts, tags, topics and authors.'''
+        self.failUnlessEqual(Post.objects.count(), PostCard.objects.count(), 'Every post needs a card.')
+        card = self._card()
+        self.failUnlessEqual(self.post.title, card.title, 'Unexpected card title %s' % card.title)
+        self.failUnlessEqual(reverse('blog:post-detail', args=[self.post.pub_date.year,
+                self.post.pub_date.strftime('%b').lower(), self.post.pub_date.day, self.post.slug]),
+                card.permalink, 'Unexpected permalink %s' % card.permalink)
+
+        tag = Tag(text='Card Tag')
+        tag.save()
+        self.post.tags.create(tag=tag)
+        self.failUnless({'slug': 'card-tag', 'text': 'Card Tag'} in self._card().tag_list(), 'The tag was not added.')
+        tag.text = 'Renamed'
+        tag.save()
+        self.failUnless({'slug': 'card-tag', 'text': 'Renamed'} in self._card().tag_list(), 'The tag was not renamed.')
+        self.failUnless(PostCard.objects.filter(tag_slugs__contains=' card-tag '), 'Cards are not found by tag.')
+        content = self.client.get(reverse('blog:tag-list', args=['card-tag'])).content
+        self.failUnless(self.post.title in content, 'The tag page does not list the post.')
+        self.failUnlessEqual(1, content.count('class="post-brief"'), 'The tag page lists untagged posts.')
+
+        parent = Topic(text='Parent')
+        parent.save()
+        child = Topic(text='Child', parent=parent)
+        child.save()
+        bulk.add_topics([self.post], [child])
+        names = [t['name'] for t in self._card().topic_list()]
+        self.failUnless('Parent - Child' in names, 'The topic was not added, topics are %s' % names)
+        parent.text = 'Renamed'
+        parent.save()
+        names = [t['name'] for t in self._card().topic_list()]
+        self.failUnless('Renamed - Child' in names, 'The parent topic was not renamed, topics are %s' % names)
+
+        author = self.post.author
+        author.username = 'renamed'
+        author.save()
+        self.failUnlessEqual('renamed', self._card().author_name, 'The author was not renamed.')
+
+        bulk.unpublish([self.post])
+        self.failIf(PostCard.objects.published().filter(pk=self.post.pk), 'The card is still published.')
+        self.post.delete()
+        self.failIf(PostCard.objects.filter(pk=self.post.pk), 'The card of a deleted post remains.')
+
+    def test_list(self):
+        '''Lists read the cards only.'''
+        settings.INSTRUMENTATION_SAMPLE_RATE, rate = 0, settings.INSTRUMENTATION_SAMPLE_RATE
+        settings.CACHE_VARIANTS_TIMEOUT, timeout = 0, settings.CACHE_VARIANTS_TIMEOUT
+        try:
+            Client().get(reverse('blog:index')) # Fills the lookup and fragment caches.
+            rec = recorder.start()
+            try:
+                response = Client().get(reverse('blog:index'))
+            finally:
+                recorder.stop()
+        finally:
+            settings.INSTRUMENTATION_SAMPLE_RATE, settings.CACHE_VARIANTS_TIMEOUT = rate, timeout
+        self.failUnless(self.post.title.encode('utf-8') in response.content, 'The newest post is not listed.')
+        self.failUnless(rec.queries <= 4, 'Expected at most 4 queries but ran %s: %s' % (
+                        rec.queries, [sql for elapsed, sql in rec.slowest]))
+
+class SitemapTest(TestCase):
+    '''Tests the sitemap index and its chunks.'''
+
+    fixtures = ['loremauth.json', 'loremblog.json']
+
+    def setUp(self):
+        self.saved = settings.CACHE_VARIANTS_TIMEOUT, settings.INSTRUMENTATION_SAMPLE_RATE, sitemaps.SITEMAP_SIZE
+        settings.CACHE_VARIANTS_TIMEOUT, settings.INSTRUMENTATION_SAMPLE_RATE = 60, 0
+        sitemaps.SITEMAP_SIZE = 3
+
+    def tearDown(self):
+        settings.CACHE_VARIANTS_TIMEOUT, settings.INSTRUMENTATION_SAMPLE_RATE, sitemaps.SITEMAP_SIZE = self.saved
+
+    def _locs(self, url):
+        response = self.client.get(url)
+        self.failUnlessEqual(200, response.status_code, 'Expected 200 but returned %s for %s' % (response.status_code, url))
+        return [(loc.replace('http://testserver', ''), mod) for loc, mod in
+                re.findall(r'<loc>([^<]+)</loc><lastmod>([^<]+)</lastmod>', response.content)]
+
+    def test_sitemaps(self):
+        '''Every published post is listed once and edits only change its own sitemap.'''
+        chunks = [url for url, mod in self._locs(reverse('blog:sitemap'))]
+        self.failUnless(reverse('blog:sitemap-pages', args=[0]) in chunks, 'The pages sitemap is not listed.')
+        listed = {}
+        for url in chunks:
+            entries = self._locs(url)
+            self.failUnless(len(entries) <= 3, 'Sitemap %s holds %s urls' % (url, len(entries)))
+            for loc, mod in entries:
+                listed.setdefault(loc, []).append(mod)
+        posts = Post.objects.published()
+        for post in posts:
+            detail = reverse('blog:post-detail', args=[post.pub_date.year,
+                             post.pub_date.strftime('%b').lower(), post.pub_date.day, post.slug])
+            self.failUnlessEqual([post.date_modified.strftime('%Y-%m-%d')], listed.get(detail),
+                                 'Post %s is not listed once with its date_modified.' % detail)
+        self.failUnlessEqual(posts.count() + len(sitemaps.page_entries()), len(listed),
+                             'Expected only the published posts and pages.')
+
+        post = posts.order_by('-pk')[0]
+        post.save()
+        edited = reverse('blog:sitemap-posts', args=[post.pk // 3])
+        for url in chunks:
+            if url.startswith(reverse('blog:sitemap-posts', args=[0])[:-5]):
+                rec = recorder.start()
+                try:
+                    self.client.get(url)
+                finally:
+                    recorder.stop()
+                if url != edited:
+                    self.failUnlessEqual(1, rec.queries, 'Expected %s from the cache but ran %s queries' % (url, rec.queries))
+                else:
+                    self.failUnless(rec.queries > 1, 'Expected %s to be rendered again.' % url)
+        self.failUnlessEqual(404, self.client.get(reverse('blog:sitemap-pages', args=[99])).status_code,
+                             'Expected 404 past the last sitemap.')
+
+    def test_page_entries(self):
+        '''Date archives are dated by their newest post with grouped queries.'''
+        expected = {}
+        for post in Post.objects.published():
+            for url in (day_url(post.pub_date), month_url(post.pub_date)):
+                expected[url] = max(expected.get(url, post.date_modified), post.date_modified)
+        rec = recorder.start()
+        try:
+            entries = dict(sitemaps.page_entries())
+        finally:
+            recorder.stop()
+        for url, modified in expected.items():
+            self.failUnlessEqual(modified, entries.get(url), 'Expected %s dated %s but found %s' % (url, modified, entries.get(url)))
+        self.failUnless(rec.queries <= 5, 'Expected at most 5 queries but ran %s' % rec.queries)
+
+    def test_index_version(self):
+        '''The sitemap index only changes with the sitemaps it lists.'''
+        etag = self.client.get(reverse('blog:sitemap'))['ETag']
+        unpublished = Post.objects.exclude(pk__in=Post.objects.published().values('pk'))[0]
+        unpublished.save()
+        self.failUnlessEqual(etag, self.client.get(reverse('blog:sitemap'))['ETag'], 'An unpublished post changed the index.')
+        post = Post.objects.published()[0]
+        post.save()
+        self.failIfEqual(etag, self.client.get(reverse('blog:sitemap'))['ETag'], 'An edited post did not change the index.')
+
+class ScheduleTest(TestCase):
+    '''Tests releasing posts whose pub_date passes.'''
+
+    fixtures = ['loremauth.json', 'loremblog.json']
+
+    def setUp(self):
+        self.rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        settings.INSTRUMENTATION_SAMPLE_RATE = 0
+
+    def tearDown(self):
+        settings.INSTRUMENTATION_SAMPLE_RATE = self.rate
+
+    def test_release(self):
+        '''Due posts refresh the cached fragments and their pages are rendered.'''
+        now = datetime.now()
+        post = Post(title='Scheduled', content='Soon', status=PUBLISHED_STATUS,
+                    author=User.objects.all()[0], pub_date=now + timedelta(days=40))
+        post.save()
+        tag = Tag(text='Scheduled')
+        tag.save()
+        post.tags.create(tag=tag)
+        upcoming = schedule.upcoming(now)
+        self.failUnlessEqual(post.pub_date, upcoming, 'Expected the next pub_date %s but was %s' % (post.pub_date, upcoming))
+
+        archive = Template('{% load blog_tags %}{% archive_list %}')
+        month = reverse('blog:list-month', args=[now.year, now.strftime('%b')])
+        self.failIf(month in archive.render(Context()), 'The open month is listed before any post is due.')
+        # Time passes, nothing is saved.
+        Post.objects.filter(pk=post.pk).update(pub_date=now, permalink=post_permalink(now, post.slug))
+        post = Post.objects.get(pk=post.pk)
+        self.failIf(month in archive.render(Context()), 'Expected the stale cached fragment.')
+
+        due = list(schedule.due(now - timedelta(minutes=1), datetime.now()))
+        self.failUnlessEqual([post], due, 'Unexpected due posts %s' % due)
+        rendered = dict([(url, status) for url, status, seconds, size in schedule.release(due)])
+        self.failUnless(month in archive.render(Context()), 'The fragment was not refreshed.')
+        detail = reverse('blog:post-detail', args=[now.year, now.strftime('%b').lower(), now.day, post.slug])
+        self.failUnlessEqual(200, rendered.get(detail), 'Expected the post to be rendered, got %s' % rendered)
+        self.failUnless(reverse('blog:tag-list', args=[tag.slug]) in rendered, 'The tag page was not rendered.')
+
+    def test_released(self):
+        '''The time of the last release is kept in the database.'''
+        self.failUnlessEqual(None, schedule.last_released(), 'Nothing was released yet.')
+        first = datetime(2010, 5, 1, 12, 0)
+        schedule.mark_released(first)
+        schedule.mark_released(first + timedelta(minutes=5))
+        released = schedule.last_released()
+        self.failUnlessEqual(first + timedelta(minutes=5), released, 'Expected the last release but found %s' % released)
+
+    def test_shared_cache(self):
+        '''Releasing needs a cache backend shared with the web processes.'''
+        backend = settings.CACHE_BACKEND
+        try:
+            settings.CACHE_BACKEND = 'locmem://'
+            self.failIf(shared_cache(), 'locmem:// is private to each process.')
+            settings.CACHE_BACKEND = 'memcached://127.0.0.1:11211/'
+            self.failUnless(shared_cache(), 'memcached:// is shared.')
+        finally:
+            settings.CACHE_BACKEND = backend
+
+    def test_warm(self):
+        '''Every public page is listed and rendered into the cache.'''
+        urls = list(public_urls())
+        self.failUnlessEqual(len(urls), len(set(urls)), 'Urls are listed more than once.')
+        for post in Post.objects.published():
+            detail = reverse('blog:post-detail', args=[post.pub_date.year,
+                             post.pub_date.strftime('%b').lower(), post.pub_date.day, post.slug])
+            self.failUnless(detail in urls, 'Post %s is not listed.' % detail)
+        unpublished = Post.objects.exclude(pk__in=Post.objects.published().values('pk'))
+        for post in unpublished.filter(slug__isnull=False, pub_date__isnull=False):
+            self.failIf(reverse('blog:post-detail', args=[post.pub_date.year,
+                        post.pub_date.strftime('%b').lower(), post.pub_date.day, post.slug]) in urls,
+                        'Unpublished post %s is listed.' % post.slug)
+        empty = Topic(text='Empty')
+        empty.save()
+        self.failIf(reverse('blog:post-topic', args=[empty.path]) in public_urls(), 'Topics without posts are listed.')
+
+        pages = [url for url in urls if '?' not in url][:5]
+        reported = []
+        results = warm(pages, report=reported.append)
+        self.failUnlessEqual(results, reported, 'Every rendered url is reported.')
+        statuses = [status for url, status, seconds, size in results]
+        self.failUnlessEqual([200] * len(pages), statuses, 'Unexpected statuses %s' % results)
+        rec = recorder.start()
+        try:
+            warm(pages)
+        finally:
+            recorder.stop()
+        # Cached pages only run their validators.
+        self.failUnless(rec.queries <= 3 * len(pages), 'Expected cached pages but ran %s queries' % rec.queries)
+
+        # A render that raises fails its url without stopping the workers.
+        render = warming.render
+        def broken(url, *args):
+            if url == pages[0]:
+                raise ValueError(url)
+            return render(url, *args)
+        warming.render = broken
+        try:
+            results = warm(pages, concurrency=2)
+        finally:
+            warming.render = render
+        statuses = dict([(url, status) for url, status, seconds, size in results])
+        self.failUnlessEqual(len(pages), len(statuses), 'Unexpected results %s' % results)
+        self.failUnlessEqual(0, statuses[pages[0]], 'The failed url has status %s' % statuses[pages[0]])
+
+class ReplicaTest(TestCase):
+    '''Tests reading public pages from a second SQLite database standing in for a replica.'''
+
+    fixtures = ['loremauth.json', 'loremblog.json']
+
+    def setUp(self):
+        self.saved = dict([(name, getattr(settings, name)) for name in
+                           ('CACHE_VARIANTS_TIMEOUT', 'INSTRUMENTATION_SAMPLE_RATE', 'REPLICA_CHECK_INTERVAL')])
+        settings.CACHE_VARIANTS_TIMEOUT = settings.INSTRUMENTATION_SAMPLE_RATE = settings.REPLICA_CHECK_INTERVAL = 0
+        self.now = datetime.now()
+        Post.objects.update(date_modified=self.now - timedelta(minutes=10))
+
+        self.replica = replicas.Replica({'DATABASE_ENGINE': 'sqlite3', 'DATABASE_NAME': ':memory:'})
+        cursor = self.replica.connection.cursor()
+        for model in (Post, PostCard, Tag, TaggedItem, Topic, TopicCatalog):
+            for sql in self.replica.connection.creation.sql_create_model(model, no_style(), set())[0]:
+                cursor.execute(sql)
+            fields = model._meta.local_fields
+            rows = list(model._default_manager.values_list(*[f.attname for f in fields]))
+            if rows:
+                cursor.executemany('INSERT INTO %s (%s) VALUES (%s)' % (model._meta.db_table,
+                                   ', '.join([f.column for f in fields]), ', '.join(['%s'] * len(fields))), rows)
+        self.replicas, replicas._replicas = replicas._replicas, [self.replica]
+        cache.delete(replicas.WRITTEN_KEY)
+
+        # A change only the primary has.
+        self.post = Post.objects.published().order_by('-pub_date')[0]
+        Post.objects.filter(pk=self.post.pk).update(title='Only On The Primary')
+        PostCard.objects.filter(pk=self.post.pk).update(title='Only On The Primary')
+
+    def tearDown(self):
+        replicas._replicas = self.replicas
+        for name, value in self.saved.items():
+            setattr(settings, name, value)
+
+    def _primary(self, client=None):
+        response = (client or Client()).get(reverse('blog:index'))
+        self.failUnlessEqual(200, response.status_code, 'Expected 200 but returned %s' % response.status_code)
+        return 'Only On The Primary' in response.content
+
+    def test_route(self):
+        '''Public pages read the replica, writes, writers and lagging replicas read the primary.'''
+        self.failUnless(Post.objects.published().filter(title='Only On The Primary'),
+                        'Queries outside a request must read the primary.')
+        self.failIf(self._primary(), 'Expected the index to be read from the replica.')
+
+        client = Client()
+        client.post(reverse('blog:index'), {})
+        self.failUnless(replicas.STICKY_COOKIE in client.cookies, 'A write must set the sticky cookie.')
+        self.failUnless(self._primary(client), 'Expected a writer to read the primary.')
+
+        replicas.written()
+        self.failUnless(self._primary(), 'Expected the primary right after a write.')
+        cache.delete(replicas.WRITTEN_KEY)
+        self.failIf(self._primary(), 'Expected the replica once writes are older than the lag.')
+
+        Post.objects.filter(pk=self.post.pk).update(date_modified=self.now - timedelta(minutes=5))
+        self.failUnless(self.replica.lag() >= 290, 'Expected a lag of 5 minutes but was %s' % self.replica.lag())
+        self.failUnless(self._primary(), 'Expected the primary while the replica lags.')
+
+    def test_tracked_writes(self):
+        '''Only writes to content keep reads on the primary.'''
+        user = User.objects.get(pk=1)
+        user.last_login = datetime.now()
+        user.save()
+        self.failIf(cache.get(replicas.WRITTEN_KEY), 'A login must not move reads to the primary.')
+        self.post.save()
+        self.failUnless(cache.get(replicas.WRITTEN_KEY), 'Saving a post must move reads to the primary.')
+
+class ExporterTest(TestCase):
+    '''Tests exporting the blog.'''
+
+    fixtures = ['loremauth.json',]
+
+    def setUp(self):
+        # Child topics repeat their slugs under every parent.
+        SyntheticBlog(posts=12, tags=5, topic_depth=2, topic_breadth=2).generate()
+
+    def test_wxr_round_trip(self):
+        '''An export in small chunks imports back into an empty blog.'''
+        out = StringIO()
+        count = WXRExporter(out, chunk_size=5).export()
+        self.failUnlessEqual(12, count, 'Expected 12 exported posts but wrote %s' % count)
+        tagged = TaggedItem.objects.count()
+        categorized = TopicCatalog.objects.count()
+        catalog = sorted([(Post.objects.get(pk=pk).title, path) for pk, path in
+                          TopicCatalog.objects.values_list('object_id', 'topic__path')])
+        paths = sorted(Topic.objects.values_list('path', flat=True))
+
+        Post.objects.all().delete()
+        Tag.objects.all().delete()
+        Topic.objects.all().delete()
+        WordPressExportParser(StringIO(out.getvalue()), User.objects.get(pk=1).username).parse()
+        self.failUnlessEqual(12, Post.objects.count(), 'Expected 12 imported posts but found %s' % Post.objects.count())
+        imported = sorted(Topic.objects.values_list('path', flat=True))
+        self.failUnlessEqual(paths, imported, 'Expected the topics %s but imported %s' % (paths, imported))
+        self.failUnlessEqual(tagged, TaggedItem.objects.count(), 'Expected %s tagged items but found %s' % (tagged, TaggedItem.objects.count()))
+        self.failUnlessEqual(categorized, TopicCatalog.objects.count(), 'Expected %s cataloged items but found %s' % (categorized, TopicCatalog.objects.count()))
+        recatalog = sorted([(Post.objects.get(pk=pk).title, path) for pk, path in
+                            TopicCatalog.objects.values_list('object_id', 'topic__path')])
+        self.failUnlessEqual(catalog, recatalog, 'Posts were filed under other topics.')
+
+    def test_ndjson_since(self):
+        '''Incremental exports only contain posts modified since the date.'''
+        post = Post.objects.all()[0]
+        Post.objects.update(date_modified=datetime(2001, 1, 1))
+        Post.objects.filter(pk=post.pk).update(date_modified=datetime(2010, 1, 1))
+        out = StringIO()
+        JSONLinesExporter(out, since=datetime(2005, 1, 1), chunk_size=5).export()
+        lines = out.getvalue().splitlines()
+        self.failUnlessEqual(1, len(lines), 'Expected 1 exported post but wrote %s' % len(lines))
+        record = simplejson.loads(lines[0])
+        self.failUnlessEqual(post.slug, record['slug'], 'Exported %s instead of %s' % (record['slug'], post.slug))
+        self.failUnlessEqual(post.tags.count(), len(record['tags']), 'Exported the wrong tags %s' % record['tags'])
+
+class BenchmarkTest(TestCase):
+    '''Tests the benchmark data generator and runner.'''
+
+    def setUp(self):
+        self.data = SyntheticBlog(posts=10, tags=5, topic_depth=2, topic_breadth=2)
+        self.data.generate()
+
+    def test_generate(self):
+        '''The generator creates the requested objects.'''
+        self.failUnlessEqual(10, Post.objects.count(), 'Expected 10 posts but found %s' % Post.objects.count())
+        self.failUnlessEqual(6, Topic.objects.count(), 'Expected 6 topics but found %s' % Topic.objects.count())
+
+    def test_run(self):
+        '''Every endpoint responds and the comparison flags extra queries.'''
+        results = runner.run(repeat=1)
+        for name, result in results.items():
+            self.failUnlessEqual(200, result['status'], 'Expected 200 but returned %s for %s' % (result['status'], name))
+        baseline = dict([(name, dict(result, queries=result['queries'] - 1)) for name, result in results.items()])
+        regressions = runner.compare(results, baseline)
+        self.failUnlessEqual(len(results), len(regressions), 'Expected a regression for each endpoint: %s' % regressions)
+
+class ImportBenchmarkTest(TestCase):
+    '''Tests the generated WXR files and the import benchmark.'''
+
+    fixtures = ['loremauth.json',]
+
+    def test_run_parser(self):
+        '''A generated export imports completely and each phase is measured.'''
+        out = StringIO()
+        SyntheticWXR(posts=5, tags=4, category_depth=2, category_breadth=2).write(out)
+        results = imports.run_parser(StringIO(out.getvalue()), User.objects.get(pk=1).username)
+        self.failUnlessEqual(5, Post.objects.count(), 'Expected 5 posts but imported %s' % Post.objects.count())
+        self.failUnlessEqual(6, Topic.objects.count(), 'Expected 6 topics but imported %s' % Topic.objects.count())
+        self.failUnlessEqual(5, results['posts']['items'], 'Expected 5 items but measured %s' % results['posts']['items'])
+        self.failUnless(results['posts']['queries'] > 0, 'No queries counted for the posts phase.')
@@ -16,12 +16,18 @@
 
 from django.conf.urls.defaults import *
 
+from metarho.ontology.views import topic
+
 urlpatterns = patterns('metarho.blog.views',
     url(r'^(?P<year>\d{4})/(?P<month>\w{3})/(?P<day>\d{1,2})/(?P<slug>[0-9A-Za-z-]+)/$', 'post_detail', name='post-detail'),  
     url(r'^(?P<year>\d{4})/(?P<month>\w{3})/(?P<day>\d{1,2})/$', 'post_day', name='list-day'),  
     url(r'^(?P<year>\d{4})/(?P<month>\w{3})/$', 'post_month', name='list-month'),  
     url(r'^(?P<year>\d{4})/$', 'post_year', name='list-year'),
     url(r'^archive/$', 'archive_list', name='archive-list'),
+    url(r'^sitemap\.xml$', 'sitemap_index', name='sitemap'),
+    url(r'^sitemap-posts-(?P<number>\d+)\.xml$', 'sitemap_posts', name='sitemap-posts'),
+    url(r'^sitemap-pages-(?P<number>\d+)\.xml$', 'sitemap_pages', name='sitemap-pages'),
     url(r'^tag/(?P<slug>[0-9A-Za-z-]+)/', 'tag_list', name='tag-list'),
+    url(r'^topic/(?P<path>[0-9A-Za-z/-]+)$', topic, name='post-topic'),
     url(r'^/?$', 'post_all', name='index'),
 )
\ No newline at end of file
@@ -18,33 +18,217 @@ import datetime
 import time
 
 from django.http import Http404
+from django.http import HttpResponse
+from django.db.models import Count
+from django.db.models import Max
+from django.db.models import Min
+from django.utils.cache import patch_cache_control
+from django.utils.hashcompat import md5_constructor
 from django.core.urlresolvers import reverse
-from django.shortcuts import get_object_or_404
+from django.contrib.contenttypes.models import ContentType
 
 from metarho.blog.decorators import wp_post_redirect
-from metarho.decorators import format_req
+from metarho.blog.decorators import conditional
+from metarho.decorators import negotiate
+from metarho.decorators import request_format
 from metarho import render_with_context
 from metarho.blog.models import Post
-from metarho.blog.feeds import PostsFeedAtom
+from metarho.blog.models import PostCard
+from metarho.blog.feeds import feed_class
 from metarho.blog.feeds import feed_render
-from metarho.ontology.models import Tag
+from metarho.blog.feeds import FEED_CURRENT_SIZE
+from metarho.blog.serializers import json_response
+from metarho.blog.serializers import DETAIL_FIELDS
+from metarho.blog import sitemaps
+from metarho.caching.generations import versions
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import tag_by_slug
+
+# Conditional GET validators.
+def _archive_date(year, month=None, day=None):
+    """Returns the date an archive url points to."""
+    parts = [p for p in (year, month, day) if p]
+    tt = time.strptime('-'.join(parts), '-'.join(['%Y', '%b', '%d'][:len(parts)]))
+    return datetime.date(*tt[:3])
+
+def _archive_filter(posts, year=None, month=None, day=None):
+    """Filters posts or their cards to an archive bucket, all of them by default."""
+    if year:
+        date = _archive_date(year, month, day)
+        posts = posts.filter(pub_date__year=date.year)
+        if month:
+            posts = posts.filter(pub_date__month=date.month)
+        if day:
+            posts = posts.filter(pub_date__day=date.day)
+    return posts
+
+def _archive_posts(year=None, month=None, day=None):
+    """Returns the published posts of an archive bucket, all posts by default."""
+    return _archive_filter(Post.objects.published(), year, month, day)
+
+def _archive_cards(year=None, month=None, day=None):
+    """Returns the PostCards of the published posts of an archive bucket."""
+    return _archive_filter(PostCard.objects.published(), year, month, day)
+
+def _tag_cards(tag):
+    """
+    Returns the PostCards of the published posts with a tag, selected
+    through the indexed TaggedItem rows of the tag.
+
+    """
+    linked = TaggedItem.objects.filter(tag=tag, content_type=ContentType.objects.get_for_model(Post))
+    return PostCard.objects.published().filter(post__in=linked.values('object_id'))
+
+def _bucket_version(cards):
+    """
+    Returns the version and last modification of a list of posts from one
+    aggregate query over their cards.  Cards are rebuilt whenever a post or
+    its tags and topics change.  The count is part of the version so removed
+    and unpublished posts change it too.
+
+    """
+    bucket = cards.order_by().aggregate(latest=Max('date_built'), count=Count('post'))
+    return '%s-%s' % (bucket['count'], bucket['latest']), bucket['latest']
+
+def archive_validator(request, year=None, month=None, day=None):
+    """
+    Validator for post lists and feeds of an archive bucket.  The paging
+    links of the current and month feeds follow the clock and the
+    neighbouring months, so their version also holds the open month and the
+    archives they link to.  They have no Last-Modified, a closing month or
+    a backdated post changes them without touching their own posts.
+
+    """
+    version, latest = _bucket_version(_archive_cards(year, month, day))
+    if day or (year and not month) or request_format(request, ARCHIVE_FORMATS) not in FEED_FORMATS:
+        return version, latest
+    open_month = _open_month()
+    if year:
+        start = _month_start(_archive_date(year, month))
+        months = _archive_months(open_month, before=start, after=_next_month(start))
+    else:
+        months = _archive_months(open_month, before=open_month)
+    paging = [m and m.strftime('%Y%m') or '' for m in (open_month,) + months]
+    return '%s-%s' % (version, '-'.join(paging)), None
+
+def tag_validator(request, slug):
+    """Validator for the post list of a tag."""
+    tag = tag_by_slug.get(slug)
+    if tag is None:
+        return None
+    return _bucket_version(_tag_cards(tag))
+
+def _detail_posts(year, month, day, slug):
+    """Returns the published posts matching a post detail url."""
+    date = _archive_date(year, month, day)
+    return Post.objects.published().filter(slug=slug, pub_date__year=date.year,
+                pub_date__month=date.month, pub_date__day=date.day)
+
+def post_validator(request, year, month, day, slug):
+    """Validator for a single post."""
+    found = _detail_posts(year, month, day, slug).values_list('pk', 'date_modified')[:1]
+    if not found:
+        return None
+    pk, modified = found[0]
+    return '%s-%s' % (pk, modified), modified
+
+# Feed paging, see RFC 5005.  Closed calendar months are archive documents,
+# the index feed holds the open month.  Archives still change when the next
+# month closes, a post is edited or one is backdated into them, so they are
+# only cached for an hour and revalidated with their ETag after, see
+# archive_validator.
+ARCHIVE_MAX_AGE = 60 * 60
+
+# Formats of the archive views, as negotiated, and the paged ones.
+ARCHIVE_FORMATS = ['html', 'atom', 'json', 'rss']
+FEED_FORMATS = ('atom', 'rss')
+
+def _month_start(date):
+    """Returns the first moment of the month of a date."""
+    return datetime.datetime(date.year, date.month, 1)
+
+def _open_month():
+    """Returns the first moment of the current month."""
+    return _month_start(datetime.datetime.now())
+
+def _next_month(date):
+    """Returns the first moment of the month after a date."""
+    if date.month == 12:
+        return datetime.datetime(date.year + 1, 1, 1)
+    return datetime.datetime(date.year, date.month + 1, 1)
+
+def _feed_history(request, before=None, after=None):
+    """
+    Returns the paging links of a feed: the current feed, the newest archive
+    with posts before ``before`` and the oldest closed archive with posts
+    from ``after``.
+
+    """
+    fmt = '?format=%s' % request.format
+    history = {'current': reverse('blog:index') + fmt}
+    prev, following = _archive_months(_open_month(), before, after)
+    if prev:
+        history['prev-archive'] = reverse('blog:list-month', args=[prev.strftime('%Y'), prev.strftime('%b')]) + fmt
+    if following:
+        history['next-archive'] = reverse('blog:list-month', args=[following.strftime('%Y'), following.strftime('%b')]) + fmt
+    return history
+
+def _archive_months(open_month, before=None, after=None):
+    """
+    Returns the (prev, next) archive months a feed links to, the newest
+    month with posts before ``before`` and the oldest closed month with
+    posts from ``after``.  Either is None when there is no such month.
+
+    """
+    posts = Post.objects.published()
+    prev = following = None
+    if before:
+        date = posts.filter(pub_date__lt=before).aggregate(date=Max('pub_date'))['date']
+        if date:
+            prev = _month_start(date)
+    if after and after < open_month:
+        date = posts.filter(pub_date__gte=after).aggregate(date=Min('pub_date'))['date']
+        if date and date < open_month:
+            following = _month_start(date)
+    return prev, following
+
+def _current_posts(open_month):
+    """
+    Returns the posts of the current feed, the open month and at least
+    FEED_CURRENT_SIZE posts.  It is a date filter rather than a slice so the
+    feed can be read in chunks.
+
+    """
+    posts = Post.objects.published()
+    nth = posts.order_by('-pub_date').values_list('pub_date', flat=True)[FEED_CURRENT_SIZE - 1:FEED_CURRENT_SIZE]
+    cutoff = open_month
+    if nth and nth[0] < cutoff:
+        cutoff = nth[0]
+    return posts.filter(pub_date__gte=cutoff)
 
 # All Posts List Methods.
 def post_all_feed(request):
-    """Returns a Feed for all posts"""
+    """Returns the current feed, older posts are in the month archives."""
 
-    feed = PostsFeedAtom('myslug', request)
-    feed.items = Post.objects.published().order_by('-pub_date')
+    feed = feed_class(request)('myslug', request)
+    open_month = _open_month()
+    feed.items = _current_posts(open_month)
+    feed.history = _feed_history(request, before=open_month)
 
     return feed_render(feed)
 
+def post_all_json(request):
+    """Returns all posts as JSON."""
+    return json_response(request, Post.objects.published())
+
 @wp_post_redirect
-@format_req('rss', post_all_feed)
+@conditional(archive_validator, cache=True)
+@negotiate(rss=post_all_feed, atom=post_all_feed, json=post_all_json)
 def post_all(request):
     """Returns all User Blogs"""
-    posts = Post.objects.published()
+    posts = PostCard.objects.published()
     alt_links = [
-    {'type': 'application/atom+xml', 'title': 'Atom Feed', 'href': '%s?format=rss' % reverse('blog:index')}
+    {'type': 'application/atom+xml', 'title': 'Atom Feed', 'href': '%s?format=atom' % reverse('blog:index')}
     ]
     
     return render_with_context(request, 'blog/post_list.xhtml', {
@@ -56,22 +240,22 @@ def post_all(request):
 def post_year_feed(request, year):
     """Returns a Feed for particular year."""
 
-    feed = PostsFeedAtom('myslug', request)
+    feed = feed_class(request)('myslug', request)
     feed.link = reverse('blog:list-year', args=[year])
-
-    # Get the actual Items
-    tt = time.strptime('-'.join([year]), '%Y')
-    date = datetime.date(*tt[:3])
-    feed.items = Post.objects.published().filter(pub_date__year=date.year).order_by('-pub_date')
+    feed.items = _archive_posts(year).order_by('-pub_date')
 
     return feed_render(feed)
 
-@format_req('rss', post_year_feed)
+def post_year_json(request, year):
+    """Returns the posts of a year as JSON."""
+    return json_response(request, _archive_posts(year))
+
+@conditional(archive_validator, cache=True)
+@negotiate(rss=post_year_feed, atom=post_year_feed, json=post_year_json)
 def post_year(request, year):
     """Returns all posts for a particular year."""
-    tt = time.strptime('-'.join([year]), '%Y')
-    date = datetime.date(*tt[:3])
-    posts = Post.objects.published().filter(pub_date__year=date.year)
+    date = _archive_date(year)
+    posts = _archive_cards(year)
     
     return render_with_context(request, 'blog/post_list.xhtml', {
             'posts': posts,
@@ -80,23 +264,33 @@ def post_year(request, year):
 
 
 def post_month_feed(request, year, month):
-    """Returns an atom feed for the month."""
-    feed = PostsFeedAtom('myslug', request)
+    """
+    Returns the feed for the month, an archive document once the month is
+    over.
 
-    tt = time.strptime('-'.join([year, month]), '%Y-%b')
-    date = datetime.date(*tt[:3])
-    feed.items = Post.objects.published().filter(pub_date__year=date.year,
-                            pub_date__month=date.month)
+    """
+    feed = feed_class(request)('myslug', request)
+    start = _month_start(_archive_date(year, month))
+    end = _next_month(start)
+    feed.items = _archive_posts(year, month)
+    feed.history = _feed_history(request, before=start, after=end)
+    feed.archive = end <= _open_month()
 
-    return feed_render(feed)
+    response = feed_render(feed)
+    if feed.archive:
+        patch_cache_control(response, public=True, max_age=ARCHIVE_MAX_AGE)
+    return response
+
+def post_month_json(request, year, month):
+    """Returns the posts of a month as JSON."""
+    return json_response(request, _archive_posts(year, month))
 
-@format_req('rss', post_month_feed)
+@conditional(archive_validator, cache=True)
+@negotiate(rss=post_month_feed, atom=post_month_feed, json=post_month_json)
 def post_month(request, year, month):
     """Returns all posts for a particular month."""
-    tt = time.strptime('-'.join([year, month]), '%Y-%b')
-    date = datetime.date(*tt[:3])
-    posts = Post.objects.published().filter(pub_date__year=date.year, 
-                            pub_date__month=date.month)
+    date = _archive_date(year, month)
+    posts = _archive_cards(year, month)
     
     return render_with_context(request, 'blog/post_list.xhtml', {
             'posts': posts,
@@ -106,22 +300,21 @@ def post_month(request, year, month):
 def post_day_feed(request, year, month, day):
     """Produces a feed for the post daily list."""
 
-    feed = PostsFeedAtom('myslug', request)
-
-    tt = time.strptime('-'.join([year, month, day]), '%Y-%b-%d')
-    date = datetime.date(*tt[:3])
-    feed.items = Post.objects.published().filter(pub_date__year=date.year,
-                            pub_date__month=date.month, pub_date__day=date.day)
+    feed = feed_class(request)('myslug', request)
+    feed.items = _archive_posts(year, month, day)
 
     return feed_render(feed)
 
-@format_req('rss', post_day_feed)
+def post_day_json(request, year, month, day):
+    """Returns the posts of a day as JSON."""
+    return json_response(request, _archive_posts(year, month, day))
+
+@conditional(archive_validator, cache=True)
+@negotiate(rss=post_day_feed, atom=post_day_feed, json=post_day_json)
 def post_day(request, year, month, day):
     """Returns all posts for a particular day."""
-    tt = time.strptime('-'.join([year, month, day]), '%Y-%b-%d')
-    date = datetime.date(*tt[:3])
-    posts = Post.objects.published().filter(pub_date__year=date.year, 
-                            pub_date__month=date.month, pub_date__day=date.day)
+    date = _archive_date(year, month, day)
+    posts = _archive_cards(year, month, day)
     
     return render_with_context(request, 'blog/post_list.xhtml', {
             'posts': posts,
@@ -129,13 +322,19 @@ def post_day(request, year, month, day):
             })
 
 # Detail Views
+def post_detail_json(request, year, month, day, slug):
+    """Returns an individual post as JSON."""
+    posts = _detail_posts(year, month, day, slug)
+    if not posts.count():
+        raise Http404
+    return json_response(request, posts, DETAIL_FIELDS, many=False)
+
+@conditional(post_validator, cache=True)
+@negotiate(json=post_detail_json)
 def post_detail(request, year, month, day, slug):
     """Returns an individual post."""
-    tt = time.strptime('-'.join([year, month, day]), '%Y-%b-%d')
-    date = datetime.date(*tt[:3])
     try:
-        post = Post.objects.published().get(slug=slug, pub_date__year=date.year, 
-                            pub_date__month=date.month, pub_date__day=date.day)
+        post = _detail_posts(year, month, day, slug).get()
     except Post.DoesNotExist:
         raise Http404
     
@@ -144,6 +343,7 @@ def post_detail(request, year, month, day, slug):
             'title': post.title,                                     
             })
 
+@conditional(archive_validator, cache=True)
 def archive_list(request):
     """Returns a list of months by year with published posts."""
     dates = Post.objects.published().order_by('pub_date').dates('pub_date', 'month')
@@ -153,11 +353,70 @@ def archive_list(request):
             })
 
 # Views related to blogpost topics only.
+def tag_list_json(request, slug):
+    """Returns blog entries for this tag slug as JSON."""
+    tag_by_slug.get_or_404(slug)
+    return json_response(request, Post.objects.published().filter(tags__tag__slug=slug))
+
+@conditional(tag_validator, cache=True)
+@negotiate(json=tag_list_json)
 def tag_list(request, slug):
     """Returns blog entries for this tag slug."""
-    tag = get_object_or_404(Tag, slug=slug)
-    posts = Post.objects.published().filter(tags__tag__slug=slug)
+    tag = tag_by_slug.get_or_404(slug)
+    posts = _tag_cards(tag)
     return render_with_context(request, 'blog/post_list.xhtml', {
         'posts': posts,
         'title': 'Posts tagged under %s' % tag.text,
-        })
\ No newline at end of file
+        })
+
+# Sitemaps, see metarho.blog.sitemaps.  The urls are absolute so the host is
+# part of every version.
+def _site(request):
+    """Returns the scheme and host the urls of a sitemap are made absolute with."""
+    return '%s://%s' % (request.is_secure() and 'https' or 'http', request.get_host())
+
+def sitemap_index_validator(request):
+    """
+    Validator for the sitemap index, it changes with the sitemaps it lists
+    and their dates rather than with every change to the blog.  The entries
+    are kept on the request for the view.
+
+    """
+    entries = request._sitemap_entries = sitemaps.index_entries()
+    if not entries:
+        return '%s-empty' % _site(request), None
+    digest = md5_constructor(repr(entries)).hexdigest()
+    return '%s-%s' % (_site(request), digest), max([m for u, m in entries])
+
+def sitemap_validator(request, number=None):
+    """Validator for the pages sitemaps, they list tags and topics too."""
+    return '%s-%s' % (_site(request), versions('blog', 'ontology')), None
+
+def post_sitemap_validator(request, number):
+    """Validator for a post sitemap, it only changes with its own posts."""
+    count, latest = sitemaps.post_version(int(number))
+    if not count:
+        return None
+    return '%s-%s-%s' % (_site(request), count, latest), latest
+
+@conditional(sitemap_index_validator, cache=True)
+def sitemap_index(request):
+    """Returns the sitemap index listing the post and pages sitemaps."""
+    entries = getattr(request, '_sitemap_entries', None) or sitemaps.index_entries()
+    return HttpResponse(sitemaps.sitemapindex(entries, _site(request)), mimetype='application/xml')
+
+@conditional(post_sitemap_validator, cache=True)
+def sitemap_posts(request, number):
+    """Returns a post sitemap, streamed from batches of posts."""
+    if not sitemaps.post_version(int(number))[0]:
+        raise Http404
+    entries = sitemaps.post_entries(int(number))
+    return HttpResponse(sitemaps.urlset(entries, _site(request)), mimetype='application/xml')
+
+@conditional(sitemap_validator, cache=True)
+def sitemap_pages(request, number):
+    """Returns a sitemap of the index, date archives, tags and topics."""
+    chunks = sitemaps.page_chunks(sitemaps.page_entries())
+    if int(number) >= len(chunks):
+        raise Http404
+    return HttpResponse(sitemaps.urlset(chunks[int(number)], _site(request)), mimetype='application/xml')
@@ -0,0 +1,35 @@
+# file caching/__init__.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Caching
+=======
+
+Caching keyed on content versions.  Cached entries never need to be
+invalidated, a new version of the content gets a new key and the old entries
+expire.
+
+``variants`` caches responses with their compressed variants, ``lookups``
+caches single model instances in process and in the cache backend and
+``fragments`` caches rendered template tags.  ``generations`` holds the
+counters keys are versioned with, one per content namespace such as "blog".
+
+Processes only see each other's bumps and cached entries through the cache
+backend, so every web process, job worker and management command must share
+one, ie memcached.  With the default per process locmem:// backend a change
+saved by one process is not seen by the others until their entries expire.
+
+"""
@@ -0,0 +1,64 @@
+# file caching/fragments.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from metarho.caching.generations import versions
+
+class CachedInclusionNode(template.Node):
+    '''Renders an inclusion template once per generation of its namespaces.'''
+
+    def __init__(self, func, template_name, namespaces):
+        self.func = func
+        self.template_name = template_name
+        self.namespaces = namespaces
+
+    def render(self, context):
+        timeout = getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600)
+        if not timeout:
+            return render_to_string(self.template_name, self.func())
+        key = 'fragment:%s:%s' % (self.template_name, versions(*self.namespaces))
+        html = cache.get(key)
+        if html is None:
+            html = render_to_string(self.template_name, self.func())
+            cache.set(key, html, timeout)
+        return html
+
+def cached_inclusion_tag(register, template_name, namespaces):
+    '''
+    Registers a function taking no arguments as an inclusion tag whose
+    rendered HTML is cached until one of its namespaces changes.  Writes to
+    the models of a namespace bump its generation, see
+    ``metarho.caching.generations``.
+
+    :param register: Template library to register the tag with.
+    :param template_name: Template rendered with the returned dictionary.
+    :param namespaces: Names of the namespaces the output depends on.
+
+    '''
+    def dec(func):
+        def compile(parser, token):
+            bits = token.split_contents()
+            if len(bits) != 1:
+                raise template.TemplateSyntaxError('%s takes no arguments' % bits[0])
+            return CachedInclusionNode(func, template_name, namespaces)
+        compile.__doc__ = func.__doc__
+        register.tag(func.__name__, compile)
+        return func
+    return dec
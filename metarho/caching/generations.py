@@ -0,0 +1,118 @@
+# file caching/generations.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Generations are stored in the cache backend, which is how a bump made by
+# one process reaches the others.  This needs a CACHE_BACKEND shared by every
+# process, see localsettings-dist.py.  A per process backend such as
+# locmem:// keeps each process on its own counters, see shared_cache().
+
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import signals
+
+from metarho.caching.lru import local
+from metarho.replicas import written
+
+# Cache backends private to each process.
+PRIVATE_BACKENDS = ('locmem', 'simple', 'dummy')
+
+def shared_cache():
+    '''Returns whether the cache backend is shared between processes.'''
+    return settings.CACHE_BACKEND.split(':', 1)[0] not in PRIVATE_BACKENDS
+
+class Generation(object):
+    '''
+    Counter kept in the cache backend that is bumped whenever some content
+    changes.  Cache keys built with the current value change with it so
+    older entries are never read again.
+
+    The value is kept in the per process LRU as well, other processes see a
+    bump once their copy expires after LOOKUP_CACHE_LOCAL_TIMEOUT seconds.
+
+    :param name: Unique name of the counter.
+
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.key = 'generation:%s' % name
+        self.timeout = getattr(settings, 'LOOKUP_CACHE_TIMEOUT', 3600) * 24
+
+    def get(self):
+        '''Returns the current value.'''
+        value = local.get(self.key)
+        if value is None:
+            value = cache.get(self.key)
+            if value is None:
+                # Start from the time so a value evicted from the cache
+                # backend is never reused.
+                cache.add(self.key, int(time.time() * 1000), self.timeout)
+                value = cache.get(self.key, 0)
+            local.set(self.key, value)
+        return value
+
+    def bump(self, **kwargs):
+        '''Moves to a new value, usable as a signal receiver.'''
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            cache.set(self.key, int(time.time() * 1000), self.timeout)
+        local.delete(self.key)
+
+    def track(self, *models):
+        '''Bumps the counter whenever an instance of ``models`` is saved or deleted.'''
+        for model in models:
+            uid = '%s:%s.%s' % (self.key, model._meta.app_label, model._meta.object_name)
+            signals.post_save.connect(self.bump, sender=model, weak=False, dispatch_uid=uid)
+            signals.post_delete.connect(self.bump, sender=model, weak=False, dispatch_uid=uid)
+
+NAMESPACES = {}
+
+def namespace(name):
+    '''Returns the Generation of a content namespace, ie "blog".'''
+    if name not in NAMESPACES:
+        NAMESPACES[name] = Generation('namespace:%s' % name)
+    return NAMESPACES[name]
+
+def versions(*names):
+    '''Returns a string of the current generations of namespaces for cache keys.'''
+    return '.'.join(['%s%s' % (name, namespace(name).get()) for name in names])
+
+def batch(*names):
+    '''
+    Runs a change in one transaction and bumps the generations once, after
+    it is committed.  Use it for changes made without model signals, ie
+    with update() or SQL, the write is recorded for metarho.replicas too.
+
+    :param names: Namespace names or Generation instances.
+
+    '''
+    def dec(func):
+        func = transaction.commit_on_success(func)
+        def _wrapped(*args, **kwargs):
+            result = func(*args, **kwargs)
+            for name in names:
+                if isinstance(name, basestring):
+                    name = namespace(name)
+                name.bump()
+            written()
+            return result
+        return wraps(func)(_wrapped)
+    return dec
@@ -0,0 +1,104 @@
+# file caching/lookups.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.conf import settings
+from django.http import Http404
+from django.core.cache import cache
+from django.utils.encoding import smart_str
+from django.utils.hashcompat import md5_constructor
+
+from metarho.caching.lru import local
+from metarho.caching.generations import Generation
+
+LOOKUPS = []
+
+class ModelLookup(object):
+    '''
+    Two level cache of model instances looked up by the value of a field.
+
+    Lookups are answered from the in-process LRU, then from the shared Django
+    cache and only then from the database.  Values that match nothing are
+    cached as well.  Keys carry a Generation which is bumped whenever an
+    instance of the model, or of one of the ``depends`` models, is saved or
+    deleted.
+
+    Instances are shared between requests and should be treated as read only.
+
+    :param model: Model class to look up.
+    :param field: Name of the field looked up, it should be unique.
+    :param related: Relations to select with the instance.
+    :param depends: Other models whose changes invalidate the lookup.
+    :param fields: Only these fields are read and cached, the instances are
+                   built from them so nothing else, ie a password hash,
+                   reaches the cache.
+
+    '''
+
+    def __init__(self, model, field, related=(), depends=(), fields=()):
+        self.model = model
+        self.field = field
+        self.related = related
+        self.fields = fields
+        self.timeout = getattr(settings, 'LOOKUP_CACHE_TIMEOUT', 3600)
+        self.shared_hits = self.shared_misses = 0
+        self._name = '%s.%s.%s' % (model._meta.app_label, model._meta.object_name.lower(), field)
+        self.generation = Generation('lookups:%s' % self._name)
+        self.generation.track(model, *depends)
+        LOOKUPS.append(self)
+
+    def get(self, value):
+        '''Returns the instance whose field equals ``value`` or None.'''
+        key = 'lookups:%s:%s:%s' % (self._name, self.generation.get(),
+                                    md5_constructor(smart_str(value)).hexdigest())
+        entry = local.get(key)
+        if entry is None:
+            entry = cache.get(key)
+            if entry is None:
+                self.shared_misses += 1
+                qs = self.model._default_manager.all()
+                if self.related:
+                    qs = qs.select_related(*self.related)
+                try:
+                    if self.fields:
+                        row = qs.values(*self.fields).get(**{self.field: value})
+                        entry = [self.model(**dict([(str(k), v) for k, v in row.items()]))]
+                    else:
+                        entry = [qs.get(**{self.field: value})]
+                except self.model.DoesNotExist:
+                    entry = []
+                cache.set(key, entry, self.timeout)
+            else:
+                self.shared_hits += 1
+            local.set(key, entry)
+        return entry and entry[0] or None
+
+    def get_or_404(self, value):
+        '''Returns the instance whose field equals ``value`` or raises Http404.'''
+        obj = self.get(value)
+        if obj is None:
+            raise Http404('No %s matches the given query.' % self.model._meta.object_name)
+        return obj
+
+def stats():
+    '''Returns the hit, miss and eviction counters of this process.'''
+    return {
+        'local_hits': local.hits,
+        'local_misses': local.misses,
+        'evictions': local.evictions,
+        'size': len(local),
+        'shared_hits': sum([l.shared_hits for l in LOOKUPS]),
+        'shared_misses': sum([l.shared_misses for l in LOOKUPS]),
+    }
@@ -0,0 +1,82 @@
+# file caching/lru.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+import threading
+
+from django.conf import settings
+from django.utils.datastructures import SortedDict
+
+class LRUCache(object):
+    '''
+    Bounded in-process cache.  The least recently used entry is evicted once
+    ``max_size`` entries are held and entries expire ``timeout`` seconds
+    after they are set.
+
+    '''
+
+    def __init__(self, max_size=1000, timeout=30):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._data = SortedDict() # Least recently used first.
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        '''Returns the value of a key or ``default`` when missing or expired.'''
+        self._lock.acquire()
+        try:
+            entry = self._data.pop(key, None)
+            if entry is None or entry[0] < time.time():
+                self.misses += 1
+                return default
+            self._data[key] = entry # Most recently used goes last.
+            self.hits += 1
+            return entry[1]
+        finally:
+            self._lock.release()
+
+    def set(self, key, value):
+        self._lock.acquire()
+        try:
+            self._data.pop(key, None)
+            self._data[key] = (time.time() + self.timeout, value)
+            while len(self._data) > self.max_size:
+                del self._data[self._data.keyOrder[0]]
+                self.evictions += 1
+        finally:
+            self._lock.release()
+
+    def delete(self, key):
+        self._lock.acquire()
+        try:
+            self._data.pop(key, None)
+        finally:
+            self._lock.release()
+
+    def clear(self):
+        self._lock.acquire()
+        try:
+            self._data.clear()
+        finally:
+            self._lock.release()
+
+    def __len__(self):
+        return len(self._data)
+
+# Process wide first level shared by every lookup so there is a single bound.
+local = LRUCache(getattr(settings, 'LOOKUP_CACHE_SIZE', 1000),
+                 getattr(settings, 'LOOKUP_CACHE_LOCAL_TIMEOUT', 30))
@@ -0,0 +1,181 @@
+# file caching/variants.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.hashcompat import md5_constructor
+
+from metarho.decorators import accepted_types
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+IDENTITY = 'identity'
+
+def _gzip():
+    z = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return z.compress, z.flush
+
+def _brotli():
+    c = brotli.Compressor(quality=11)
+    return c.process, c.finish
+
+def _zstd():
+    c = zstandard.ZstdCompressor(level=19).compressobj()
+    return c.compress, c.flush
+
+# Content codings in order of preference with a factory returning the
+# (compress, flush) functions of a new compressor.  Codings whose module is
+# not installed are left out.
+CODINGS = [(name, factory) for name, factory, available in (
+    ('br', _brotli, brotli is not None),
+    ('zstd', _zstd, zstandard is not None),
+    ('gzip', _gzip, True),
+) if available]
+
+def choose_coding(request):
+    '''
+    Returns the content coding to answer a request with from its
+    Accept-Encoding header, IDENTITY when no supported coding is accepted.
+    Ties go to the first coding in CODINGS.
+
+    '''
+    header = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if not header:
+        return IDENTITY
+    accepted = dict(accepted_types(header))
+    best, best_quality = IDENTITY, 0.0
+    for name, factory in CODINGS:
+        quality = accepted.get(name, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+def compressor(coding):
+    '''Returns the (compress, flush) functions of a new compressor.'''
+    return dict(CODINGS)[coding]()
+
+def compress(coding, content):
+    '''Returns ``content`` encoded in a content coding.'''
+    if coding == IDENTITY:
+        return content
+    compress, flush = compressor(coding)
+    return compress(content) + flush()
+
+def _key(key, coding):
+    return 'variants:%s:%s' % (key, coding)
+
+def _response(entry, coding):
+    '''Builds a response from a cached variant.'''
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers']:
+        response[header] = value
+    _finish(response, coding)
+    response['Content-Length'] = str(len(entry['content']))
+    return response
+
+def _finish(response, coding):
+    if coding != IDENTITY:
+        response['Content-Encoding'] = coding
+    patch_vary_headers(response, ('Accept-Encoding',))
+
+def _tee(chunks, coding, key, headers, timeout):
+    '''
+    Yields the encoded response while keeping the identity and encoded bytes,
+    both are cached once the response is complete.  Bytes larger than
+    CACHE_VARIANTS_MAX_SIZE are sent without being kept, the encoded bytes
+    of a response too large to keep whole are often small enough.
+
+    '''
+    max_size = getattr(settings, 'CACHE_VARIANTS_MAX_SIZE', 1024 * 1024)
+    if coding != IDENTITY:
+        encode, flush = compressor(coding)
+    identity, encoded, size, encoded_size = [], [], 0, 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size <= max_size:
+            identity.append(chunk)
+        if coding != IDENTITY:
+            chunk = encode(chunk)
+            encoded_size += len(chunk)
+            if encoded_size <= max_size:
+                encoded.append(chunk)
+        if chunk:
+            yield chunk
+    if coding != IDENTITY:
+        chunk = flush()
+        encoded_size += len(chunk)
+        encoded.append(chunk)
+        yield chunk
+    if size <= max_size:
+        content = ''.join(identity)
+        cache.set(_key(key, IDENTITY), {'headers': headers, 'content': content}, timeout)
+    if coding != IDENTITY and encoded_size <= max_size:
+        cache.set(_key(key, coding), {'headers': headers, 'content': ''.join(encoded)}, timeout)
+
+def cached_variants(request, version, render):
+    '''
+    Returns the response for a version of some content from the cache in
+    the content coding the request accepts.
+
+    On a miss for the coding the cached identity bytes are encoded once and
+    stored.  When there are no identity bytes ``render`` is called and its
+    response is encoded as it is sent, both variants are stored once it is
+    complete.  Only complete 200 responses to GET requests are cached.
+
+    :param request: HttpRequest being answered.
+    :param version: String identifying the version of the content, ie an
+                    ETag.  The request path is added to it.
+    :param render: Callable returning the response when nothing is cached.
+
+    '''
+    timeout = getattr(settings, 'CACHE_VARIANTS_TIMEOUT', 600)
+    if request.method != 'GET' or not timeout:
+        return render()
+    key = md5_constructor('%s:%s' % (request.path, version)).hexdigest()
+    coding = choose_coding(request)
+
+    entry = cache.get(_key(key, coding))
+    if entry is not None:
+        return _response(entry, coding)
+    if coding != IDENTITY:
+        entry = cache.get(_key(key, IDENTITY))
+        if entry is not None:
+            entry = dict(entry, content=compress(coding, entry['content']))
+            cache.set(_key(key, coding), entry, timeout)
+            return _response(entry, coding)
+
+    response = render()
+    if response.status_code != 200 or response.has_header('Content-Encoding'):
+        return response
+    headers = [(header, value) for header, value in response.items()
+               if header.lower() not in ('content-length', 'content-encoding')]
+    streamed = HttpResponse(_tee(iter(response), coding, key, headers, timeout))
+    for header, value in headers:
+        streamed[header] = value
+    _finish(streamed, coding)
+    return streamed
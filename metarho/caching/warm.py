@@ -0,0 +1,144 @@
+# file caching/warm.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Renders pages through the WSGI application so their responses are cached
+# before readers ask for them.
+
+import logging
+import sys
+import time
+import urllib
+import threading
+from Queue import Queue
+from cStringIO import StringIO
+
+from django.core.handlers.wsgi import WSGIHandler
+
+from metarho.caching.variants import CODINGS
+
+log = logging.getLogger('metarho.caching.warm')
+
+def environ(url, host='localhost', **headers):
+    '''
+    Returns the WSGI environ of a GET request for a url path.
+
+    :param url: Path with an optional query string, ie "/2010/?format=rss".
+    :param host: Host name the request is sent to.
+    :param headers: Extra environ items, ie HTTP_ACCEPT_ENCODING='gzip'.
+
+    '''
+    path, query = (url.split('?', 1) + [''])[:2]
+    env = {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': urllib.unquote(path),
+        'QUERY_STRING': query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': StringIO(''),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        }
+    env.update(headers)
+    return env
+
+def render(url, handler=None, host='localhost', coding=None):
+    '''
+    Requests a url and reads the whole response, cached responses are only
+    stored once they are read to the end.  Returns (status code, seconds,
+    bytes).
+
+    :param handler: WSGI application, a new WSGIHandler by default.
+    :param coding: Accept-Encoding sent, the preferred coding of
+                   ``metarho.caching.variants`` by default.
+
+    '''
+    handler = handler or WSGIHandler()
+    status = []
+    def start_response(value, headers, exc_info=None):
+        status.append(int(value.split(' ', 1)[0]))
+    started = time.time()
+    body = handler(environ(url, host, HTTP_ACCEPT_ENCODING=coding or CODINGS[0][0]), start_response)
+    size = 0
+    try:
+        for chunk in body:
+            size += len(chunk)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return status[0], time.time() - started, size
+
+def warm(urls, host='localhost', coding=None, concurrency=1, report=None):
+    '''
+    Renders urls and returns the (url, status, seconds, bytes) of each in
+    the order they finished.  A url whose render raises is logged and
+    recorded with status 0 so the other urls are still rendered.
+
+    :param urls: Url paths, may be a generator, it is read as the renders
+                 progress.
+    :param concurrency: Number of threads rendering at once, each with its
+                        own database connection.  With one the urls are
+                        rendered in the calling thread.
+    :param report: Called with the result of each url once it is rendered.
+
+    '''
+    handler = WSGIHandler()
+    results = []
+    lock = threading.Lock()
+    def run(url):
+        started = time.time()
+        try:
+            result = (url,) + render(url, handler, host, coding)
+        except Exception:
+            log.exception('Rendering %s failed.' % url)
+            result = (url, 0, time.time() - started, 0)
+        lock.acquire()
+        try:
+            results.append(result)
+            if report is not None:
+                report(result)
+        finally:
+            lock.release()
+
+    if concurrency <= 1:
+        for url in urls:
+            run(url)
+        return results
+
+    queue = Queue(concurrency * 2)
+    def worker():
+        while True:
+            url = queue.get()
+            if url is None:
+                break
+            run(url)
+    threads = [threading.Thread(target=worker) for i in range(concurrency)]
+    for thread in threads:
+        thread.setDaemon(True)
+        thread.start()
+    for url in urls:
+        queue.put(url)
+    for thread in threads:
+        queue.put(None)
+    for thread in threads:
+        thread.join()
+    return results
@@ -14,14 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-# import mimeparse.py
+from django.utils.cache import patch_vary_headers
+from django.utils.functional import wraps
 
 MIME_TYPE = {
     'rss': ['application/rss+xml', 'text/xml'],
     'json': ['application/json', 'text/json'],
     'atom': ['application/atom+xml', 'text/xml'],
     'rdf': ['application/rdf+xml'],
-    'html': ['text/html'],
+    'html': ['text/html', 'application/xhtml+xml'],
 }
 
 FORMAT_MAP = {
@@ -33,6 +34,101 @@ FORMAT_MAP = {
     'rdf': 'application/rdf+xml',
 }
 
+def accepted_types(header):
+    '''
+    Parses an Accept header into a list of (media range, quality) tuples.
+
+    :param header: Value of the Accept header.
+
+    '''
+    ranges = []
+    for part in header.split(','):
+        params = part.split(';')
+        mime = params[0].strip().lower()
+        if not mime:
+            continue
+        quality = 1.0
+        for param in params[1:]:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((mime, quality))
+    return ranges
+
+def _quality(mime, ranges):
+    '''
+    Returns the quality a client gives a mime type, taken from the most
+    specific media range matching it.
+
+    '''
+    major = mime.split('/')[0]
+    best = (-1, 0.0)
+    for accepted, quality in ranges:
+        if accepted == mime:
+            specificity = 2
+        elif accepted == '%s/*' % major:
+            specificity = 1
+        elif accepted == '*/*':
+            specificity = 0
+        else:
+            continue
+        best = max(best, (specificity, quality))
+    return best[1]
+
+def request_format(request, formats):
+    '''
+    Returns the format out of ``formats`` a request is best answered in.
+
+    A ``format`` querystring parameter wins, otherwise the Accept header is
+    matched against the mime types of each format.  Ties and requests
+    without a usable Accept header get the first format.
+
+    :param request: HttpRequest to negotiate for.
+    :param formats: List of format names, preferred format first.
+
+    '''
+    fmt = request.GET.get('format', None)
+    if fmt in formats:
+        return fmt
+    header = request.META.get('HTTP_ACCEPT', '')
+    if not header:
+        return formats[0]
+    ranges = accepted_types(header)
+    best, best_quality = formats[0], 0.0
+    for fmt in formats:
+        mimes = MIME_TYPE.get(fmt, [FORMAT_MAP.get(fmt)])
+        quality = max([_quality(mime, ranges) for mime in mimes])
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    return best
+
+def negotiate(**handlers):
+    '''
+    Chooses the representation of a view from the ``format`` querystring
+    parameter or the Accept header.
+
+    The decorated view returns HTML, each keyword maps another format to the
+    view function returning it, ie ``@negotiate(rss=feed_fn, json=json_fn)``.
+    The chosen format is set as ``request.format`` and responses vary on
+    Accept.
+
+    '''
+    def _decorator(view_fn):
+        formats = ['html'] + sorted(handlers.keys())
+
+        @wraps(view_fn)
+        def _wraped(request, *args, **kwargs):
+            request.format = request_format(request, formats)
+            response = handlers.get(request.format, view_fn)(request, *args, **kwargs)
+            patch_vary_headers(response, ('Accept',))
+            return response
+        _wraped.formats = formats
+        return _wraped
+    return _decorator
+
 def format_req(fmt, new_fn):
     '''
     Provides compatability with URLs from things like wordpress that
@@ -42,12 +138,4 @@ def format_req(fmt, new_fn):
     :param new_fn: Bound method to return if format querystring matches format.
 
     '''
-
-    def _decorator(view_fn):
-        def _wraped(request, *args, **kwargs):
-            if request.GET.get('format', None) == fmt:
-                return new_fn(request, *args, **kwargs)
-            # Default to returning the original method
-            return view_fn(request, *args, **kwargs)
-        return _wraped
-    return _decorator
\ No newline at end of file
+    return negotiate(**{fmt: new_fn})
@@ -0,0 +1,30 @@
+# file instrumentation/__init__.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Instrumentation
+===============
+
+Per request measurement of SQL and template rendering.  Add
+``metarho.instrumentation.middleware.InstrumentationMiddleware`` to
+``MIDDLEWARE_CLASSES`` and set ``INSTRUMENTATION_SAMPLE_RATE`` to the fraction
+of requests to measure.  Sampled requests get ``X-SQL-*`` and
+``X-Render-Time`` response headers, a log line on the
+``metarho.instrumentation`` logger and are aggregated per view for the staff
+only stats page.  Streamed responses are measured until their last chunk is
+sent, after their headers, so they are only logged and aggregated.
+
+"""
@@ -0,0 +1,106 @@
+# file instrumentation/middleware.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import random
+
+from django.conf import settings
+from django.utils import simplejson
+
+from metarho.instrumentation import recorder
+
+log = logging.getLogger('metarho.instrumentation')
+
+class InstrumentationMiddleware(object):
+    '''
+    Measures a sample of requests and reports SQL and template timings.
+
+    ``INSTRUMENTATION_SAMPLE_RATE`` sets the fraction of requests measured,
+    requests outside the sample pay for one random number only.  Streamed
+    responses are reported once their body is read, see MeasuredBody.
+
+    '''
+
+    def process_request(self, request):
+        rate = getattr(settings, 'INSTRUMENTATION_SAMPLE_RATE', 0.0)
+        if rate and random.random() < rate:
+            request._instrumented = True
+            request._instrumented_view = request.path
+            recorder.start(getattr(settings, 'INSTRUMENTATION_SLOWEST', 5))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(request, '_instrumented', False):
+            name = '%s.%s' % (view_func.__module__, getattr(view_func, '__name__', view_func.__class__.__name__))
+            fmt = request.GET.get('format')
+            if fmt:
+                name = '%s?format=%s' % (name, fmt)
+            request._instrumented_view = name
+
+    def process_response(self, request, response):
+        if not getattr(request, '_instrumented', False):
+            return response
+        request._instrumented = False
+        if not response._is_string:
+            # Streamed bodies run their queries while they are read, the
+            # request is reported after the last chunk.  Its headers are
+            # sent by then, so only the log and stats have its numbers.
+            response._container = MeasuredBody(response._container,
+                    lambda: self._report(request, response))
+            return response
+        summary = self._report(request, response)
+        response['X-SQL-Queries'] = str(summary['queries'])
+        response['X-SQL-Time'] = '%.2f' % summary['sql_time']
+        response['X-SQL-Duplicates'] = str(sum(summary['duplicates'].values()))
+        # Template times are inclusive, the slowest one is the outermost.
+        response['X-Render-Time'] = '%.2f' % max(summary['templates'].values() or [0])
+        return response
+
+    def _report(self, request, response):
+        '''Stops recording, adds the request to the stats and logs it.'''
+        summary = recorder.stop().summary()
+        view = request._instrumented_view
+        recorder.stats.add(view, summary)
+        log.info('request %s', simplejson.dumps(dict(summary, view=view,
+                 path=request.path, status=response.status_code)))
+        return summary
+
+class MeasuredBody(object):
+    '''
+    Iterates a streamed response body and calls ``finish`` once, after the
+    last chunk or when the response is closed without being read.
+
+    '''
+
+    def __init__(self, body, finish):
+        self.body = body
+        self.finish = finish
+
+    def __iter__(self):
+        try:
+            for chunk in self.body:
+                yield chunk
+        finally:
+            self.close()
+
+    def close(self):
+        if self.finish is None:
+            return
+        finish, self.finish = self.finish, None
+        try:
+            if hasattr(self.body, 'close'):
+                self.body.close()
+        finally:
+            finish()
@@ -0,0 +1,204 @@
+# file instrumentation/recorder.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import time
+from threading import local
+from threading import Lock
+
+from django.db import connection
+from django.template import Template
+from django.utils.hashcompat import md5_constructor
+
+_state = local()
+
+WHITESPACE = re.compile(r'\s+')
+
+def fingerprint(sql):
+    '''
+    Returns a short fingerprint for a SQL statement.  Parameters are passed
+    separately from the statement so identical statements with different
+    values share a fingerprint.
+
+    '''
+    return md5_constructor(WHITESPACE.sub(' ', sql).strip()).hexdigest()[:10]
+
+class Recorder(object):
+    '''Collects the SQL and template timings of a single request.'''
+
+    def __init__(self, slowest=5):
+        self.started = time.time()
+        self.slowest_count = slowest
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = {} # fingerprint -> [count, total time, sql]
+        self.slowest = [] # (time, sql)
+        self.templates = {} # template name -> total time
+
+    def add_query(self, sql, elapsed):
+        '''Records an executed statement and the time it took.'''
+        self.queries += 1
+        self.sql_time += elapsed
+        key = fingerprint(sql)
+        entry = self.statements.setdefault(key, [0, 0.0, sql])
+        entry[0] += 1
+        entry[1] += elapsed
+        if len(self.slowest) < self.slowest_count or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, sql))
+            self.slowest.sort(reverse=True)
+            del self.slowest[self.slowest_count:]
+
+    def add_template(self, name, elapsed):
+        '''
+        Records the time spent rendering a template.  Times include the
+        templates it extends or includes.
+
+        '''
+        self.templates[name] = self.templates.get(name, 0.0) + elapsed
+
+    def duplicates(self):
+        '''Returns {fingerprint: count} for statements executed more than once.'''
+        return dict([(key, entry[0]) for key, entry in self.statements.items() if entry[0] > 1])
+
+    def summary(self):
+        '''Returns the measurements as a dictionary, times in milliseconds.'''
+        return {
+            'total_time': round((time.time() - self.started) * 1000, 2),
+            'queries': self.queries,
+            'sql_time': round(self.sql_time * 1000, 2),
+            'duplicates': self.duplicates(),
+            'slowest': [{'time': round(t * 1000, 2), 'sql': sql} for t, sql in self.slowest],
+            'templates': dict([(name, round(t * 1000, 2)) for name, t in self.templates.items()]),
+        }
+
+def current():
+    '''Returns the Recorder of the request in this thread or None.'''
+    return getattr(_state, 'recorder', None)
+
+class TimedCursor(object):
+    '''Cursor wrapper reporting every statement to a Recorder.'''
+
+    def __init__(self, cursor, recorder):
+        self.cursor = cursor
+        self.recorder = recorder
+
+    def execute(self, sql, params=()):
+        start = time.time()
+        try:
+            return self.cursor.execute(sql, params)
+        finally:
+            self.recorder.add_query(sql, time.time() - start)
+
+    def executemany(self, sql, param_list):
+        start = time.time()
+        try:
+            return self.cursor.executemany(sql, param_list)
+        finally:
+            self.recorder.add_query(sql, time.time() - start)
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+def _timed_render(self, context):
+    '''Replacement for Template.render timing templates of sampled requests.'''
+    recorder = current()
+    if recorder is None:
+        return _timed_render.original(self, context)
+    start = time.time()
+    try:
+        return _timed_render.original(self, context)
+    finally:
+        recorder.add_template(self.name, time.time() - start)
+
+def start(slowest=5):
+    '''
+    Starts recording for the current thread and returns the Recorder.
+
+    The database connection object is thread local so the cursor wrapper is
+    installed on it as an instance attribute and only affects this thread.
+
+    '''
+    if Template.__dict__['render'] is not _timed_render:
+        _timed_render.original = Template.__dict__['render']
+        Template.render = _timed_render
+    recorder = Recorder(slowest)
+    _state.recorder = recorder
+    cursor = connection.__class__.cursor
+    connection.cursor = lambda: TimedCursor(cursor(connection), recorder)
+    return recorder
+
+def stop():
+    '''Stops recording for the current thread and returns the Recorder.'''
+    recorder = current()
+    _state.recorder = None
+    if 'cursor' in connection.__dict__:
+        del connection.cursor
+    return recorder
+
+class Stats(object):
+    '''Aggregates request measurements by view in process.'''
+
+    def __init__(self):
+        self.lock = Lock()
+        self.views = {}
+
+    def add(self, view, summary):
+        '''Adds the summary of a request to the totals of a view.'''
+        self.lock.acquire()
+        try:
+            totals = self.views.setdefault(view, {
+                'requests': 0, 'queries': 0, 'max_queries': 0, 'sql_time': 0.0,
+                'total_time': 0.0, 'max_time': 0.0, 'duplicates': 0,
+                'templates': {},
+            })
+            totals['requests'] += 1
+            totals['queries'] += summary['queries']
+            totals['max_queries'] = max(totals['max_queries'], summary['queries'])
+            totals['sql_time'] += summary['sql_time']
+            totals['total_time'] += summary['total_time']
+            totals['max_time'] = max(totals['max_time'], summary['total_time'])
+            totals['duplicates'] += sum(summary['duplicates'].values())
+            for name, t in summary['templates'].items():
+                totals['templates'][name] = totals['templates'].get(name, 0.0) + t
+        finally:
+            self.lock.release()
+
+    def report(self):
+        '''Returns the totals per view with averages added.'''
+        self.lock.acquire()
+        try:
+            report = {}
+            for view, totals in self.views.items():
+                entry = dict(totals, templates=dict(totals['templates']))
+                entry['avg_queries'] = round(float(totals['queries']) / totals['requests'], 2)
+                entry['avg_time'] = round(totals['total_time'] / totals['requests'], 2)
+                report[view] = entry
+            return report
+        finally:
+            self.lock.release()
+
+    def reset(self):
+        '''Clears all totals.'''
+        self.lock.acquire()
+        try:
+            self.views = {}
+        finally:
+            self.lock.release()
+
+stats = Stats()
@@ -0,0 +1,100 @@
+# file instrumentation/tests.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.urlresolvers import reverse
+from django.utils import simplejson
+
+from metarho.instrumentation import recorder
+from metarho.sitemeta.models import SiteInformation
+
+class RecorderTest(TestCase):
+    '''Tests collecting measurements for a request.'''
+
+    def test_duplicates(self):
+        '''Repeated statements share a fingerprint and are reported.'''
+        rec = recorder.Recorder(slowest=2)
+        rec.add_query('SELECT 1 FROM a WHERE id = %s', 0.1)
+        rec.add_query('SELECT 1 FROM a  WHERE id = %s', 0.3)
+        rec.add_query('SELECT 2', 0.2)
+        summary = rec.summary()
+        self.failUnlessEqual(3, summary['queries'], 'Expected 3 queries but recorded %s' % summary['queries'])
+        self.failUnlessEqual([2], summary['duplicates'].values(), 'Expected one duplicate pair but found %s' % summary['duplicates'])
+        times = [q['time'] for q in summary['slowest']]
+        self.failUnlessEqual([300.0, 200.0], times, 'Expected the two slowest but found %s' % times)
+
+class MiddlewareTest(TestCase):
+    '''Tests the middleware on sampled requests.'''
+
+    fixtures = ['loremauth.json', 'loremblog.json']
+
+    def setUp(self):
+        self.rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        settings.INSTRUMENTATION_SAMPLE_RATE = 1.0
+        recorder.stats.reset()
+
+    def tearDown(self):
+        settings.INSTRUMENTATION_SAMPLE_RATE = self.rate
+
+    def test_headers(self):
+        '''Sampled responses carry the measurements.'''
+        # The first request streams the page into the cache, the second is
+        # answered whole from it.
+        self.client.get(reverse('blog:index')).content
+        response = self.client.get(reverse('blog:index'))
+        for header in ('X-SQL-Queries', 'X-SQL-Time', 'X-SQL-Duplicates', 'X-Render-Time'):
+            self.failUnless(response.has_header(header), 'Missing %s header' % header)
+        self.failUnless(int(response['X-SQL-Queries']) > 0, 'No queries recorded')
+        report = recorder.stats.report()
+        self.failUnless('metarho.blog.views.post_all' in report, 'View missing from %s' % report.keys())
+
+    def test_streamed(self):
+        '''Queries run while a streamed feed is read are counted.'''
+        SiteInformation(title='Measured', site=Site.objects.get_current(), owner=User.objects.get(pk=1)).save()
+        timeout = settings.CACHE_VARIANTS_TIMEOUT
+        settings.CACHE_VARIANTS_TIMEOUT = 0
+        try:
+            response = self.client.get(reverse('blog:index'), {'format': 'atom'})
+            self.failIf(response.has_header('X-SQL-Queries'), 'A streamed response was measured before it was read.')
+            self.failIf(recorder.stats.report(), 'The feed was reported before it was read.')
+            before = recorder.current().summary()['queries']
+            response.content
+        finally:
+            settings.CACHE_VARIANTS_TIMEOUT = timeout
+        self.failUnlessEqual(None, recorder.current(), 'Recording did not stop after the last chunk.')
+        report = recorder.stats.report()
+        view = 'metarho.blog.views.post_all?format=atom'
+        self.failUnless(view in report, 'View missing from %s' % report.keys())
+        queries = report[view]['queries']
+        self.failUnless(queries > before, 'Counted %s queries, the body ran none of them.' % queries)
+
+    def test_stats(self):
+        '''The stats page is for staff only.'''
+        url = reverse('instrumentation-stats')
+        response = self.client.get(url)
+        self.failIf(response['Content-Type'].startswith('application/json'), 'Stats returned to anonymous user')
+
+        user = User.objects.create_user('staffer', 'staffer@example.com', 'secret')
+        user.is_staff = True
+        user.save()
+        self.client.login(username='staffer', password='secret')
+        self.client.get(reverse('blog:index')).content
+        response = self.client.get(url)
+        report = simplejson.loads(response.content)
+        self.failUnless('metarho.blog.views.post_all' in report, 'View missing from %s' % report.keys())
@@ -0,0 +1,33 @@
+# file instrumentation/views.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.http import HttpResponse
+from django.utils import simplejson
+from django.contrib.admin.views.decorators import staff_member_required
+
+from metarho.instrumentation import recorder
+
+@staff_member_required
+def stats(request):
+    """
+    Returns the aggregated request measurements of this process as JSON.
+    POST with ``reset`` to clear them.
+
+    """
+    if request.method == 'POST' and 'reset' in request.POST:
+        recorder.stats.reset()
+    return HttpResponse(simplejson.dumps(recorder.stats.report(), indent=2, sort_keys=True),
+                        mimetype='application/json')
@@ -0,0 +1,29 @@
+# file jobs/__init__.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Jobs
+====
+
+Long running tasks such as imports and rebuilds run in the background.
+Tasks are functions registered with ``metarho.jobs.tasks.task`` in the
+``jobs`` module of an installed app and ``enqueue`` stores a ``Job`` for
+them.  ``manage.py runjobs`` claims queued jobs from the database with a
+pool of threads or processes, records their progress and retries failed
+jobs up to ``JOB_MAX_ATTEMPTS`` times.  Jobs are listed in the admin with
+their progress, rate and ETA.
+
+"""
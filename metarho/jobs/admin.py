@@ -0,0 +1,59 @@
+# file jobs/admin.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+
+from django.contrib import admin
+
+from metarho.jobs.models import Job
+from metarho.jobs.models import QUEUED_STATUS
+from metarho.jobs.models import FAILED_STATUS
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__unicode__', 'status', 'done', 'items_per_second', 'eta',
+                    'attempts', 'worker', 'date_created', 'date_finished')
+    list_filter = ('status', 'name')
+    search_fields = ['name', 'message']
+    actions = ['retry_jobs', 'cancel_jobs']
+
+    def done(self, job):
+        if job.items_total:
+            return '%s of %s (%d%%)' % (job.items_done, job.items_total, 100 * job.items_done / job.items_total)
+        return job.items_done
+    done.short_description = 'Progress'
+
+    def items_per_second(self, job):
+        rate = job.rate()
+        return rate is not None and '%.1f' % rate or ''
+    items_per_second.short_description = 'Rate'
+
+    def eta(self, job):
+        return job.eta() or ''
+    eta.short_description = 'ETA'
+
+    def retry_jobs(self, request, queryset):
+        count = queryset.filter(status=FAILED_STATUS).update(
+                status=QUEUED_STATUS, attempts=0, run_after=datetime.now())
+        self.message_user(request, '%s failed jobs queued again.' % count)
+    retry_jobs.short_description = 'Retry selected failed jobs'
+
+    def cancel_jobs(self, request, queryset):
+        count = queryset.filter(status=QUEUED_STATUS).update(status=FAILED_STATUS,
+                message='Cancelled.', date_finished=datetime.now())
+        self.message_user(request, '%s queued jobs cancelled.' % count)
+    cancel_jobs.short_description = 'Cancel selected queued jobs'
+
+admin.site.register(Job, JobAdmin)
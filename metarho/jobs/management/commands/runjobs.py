@@ -0,0 +1,38 @@
+# file runjobs.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from metarho.jobs.worker import pool
+
+class Command(BaseCommand):
+    help = 'Runs queued jobs, ie imports and rebuilds, until stopped.  Progress is shown in the admin.'
+
+    option_list = BaseCommand.option_list + (
+            make_option("-c", "--concurrency", dest="concurrency", type="int", default=2,
+                        help="Number of jobs run at once."),
+            make_option("--processes", dest="processes", action="store_true", default=False,
+                        help="Run the jobs in processes rather than threads."),
+            make_option("--once", dest="once", action="store_true", default=False,
+                        help="Exit once no job is due."),
+            make_option("--interval", dest="interval", type="int", default=5,
+                        help="Seconds between polls of an empty queue."),
+        )
+
+    def handle(self, *args, **options):
+        pool(max(options['concurrency'], 1), options['processes'], options['once'], options['interval'])
@@ -0,0 +1,123 @@
+# file jobs/models.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+from datetime import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import simplejson
+
+QUEUED_STATUS = 'Q'
+RUNNING_STATUS = 'R'
+DONE_STATUS = 'D'
+FAILED_STATUS = 'F'
+JOB_STATUS = (
+               (QUEUED_STATUS, 'Queued'),
+               (RUNNING_STATUS, 'Running'),
+               (DONE_STATUS, 'Done'),
+               (FAILED_STATUS, 'Failed'),
+)
+
+def _seconds(delta):
+    return delta.days * 86400 + delta.seconds + delta.microseconds / 1000000.0
+
+class JobManager(models.Manager):
+    '''Adds the jobs a worker may claim to the default manager.'''
+
+    def due(self, now=None):
+        '''Returns the queued jobs whose run_after passed, oldest first.'''
+        return self.filter(status=QUEUED_STATUS, run_after__lte=now or datetime.now()).order_by('run_after', 'pk')
+
+class Job(models.Model):
+    '''
+    A call of a registered task, see metarho.jobs.tasks.  Workers keep the
+    progress fields current while the task runs.
+
+    '''
+
+    name = models.CharField(max_length=100, db_index=True, help_text='Registered name of the task.')
+    arguments = models.TextField(default='{}', help_text='Keyword arguments of the task as JSON.')
+    status = models.CharField(max_length=1, choices=JOB_STATUS, default=QUEUED_STATUS, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    run_after = models.DateTimeField(default=datetime.now, db_index=True, help_text='Not run before this time.')
+    worker = models.CharField(max_length=100, blank=True, help_text='Worker running the latest attempt.')
+    items_done = models.PositiveIntegerField(default=0)
+    items_total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.TextField(blank=True, help_text='Result, progress note or traceback.')
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_started = models.DateTimeField(null=True, blank=True)
+    date_finished = models.DateTimeField(null=True, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True, help_text='Last progress of a running job.')
+
+    objects = JobManager()
+
+    def __unicode__(self):
+        return u'%s #%s' % (self.name, self.pk)
+
+    def kwargs(self):
+        '''Returns the arguments as keyword arguments.'''
+        return dict([(str(key), value) for key, value in simplejson.loads(self.arguments).items()])
+
+    def elapsed(self):
+        '''Returns the seconds the latest attempt ran for, None before it starts.'''
+        if not self.date_started:
+            return None
+        return _seconds((self.date_finished or datetime.now()) - self.date_started)
+
+    def rate(self):
+        '''Returns the items done per second by the latest attempt.'''
+        elapsed = self.elapsed()
+        if not elapsed or not self.items_done:
+            return None
+        return self.items_done / elapsed
+
+    def eta(self):
+        '''Returns when a running job should be done at its current rate.'''
+        rate = self.rate()
+        if self.status != RUNNING_STATUS or not rate or self.items_total is None:
+            return None
+        return datetime.now() + timedelta(seconds=max(self.items_total - self.items_done, 0) / rate)
+
+    def progress(self, done, total=None, message=None):
+        '''
+        Records the progress of a running job, tasks may call it for every
+        item.  It is written at most every JOB_PROGRESS_INTERVAL seconds and
+        once the total is reached, with an UPDATE that sends no signals.
+
+        :param done: Items done so far.
+        :param total: Items to do, when known.
+        :param message: Note shown in the admin.
+
+        '''
+        self.items_done = done
+        if total is not None:
+            self.items_total = total
+        if message is not None:
+            self.message = message
+        now = time.time()
+        interval = getattr(settings, 'JOB_PROGRESS_INTERVAL', 2)
+        if now - getattr(self, '_written', 0) < interval and done != self.items_total:
+            return
+        self._written = now
+        self.heartbeat = datetime.now()
+        Job.objects.filter(pk=self.pk).update(items_done=self.items_done, items_total=self.items_total,
+                                              message=self.message, heartbeat=self.heartbeat)
+
+    class Meta:
+        ordering = ['-date_created']
@@ -0,0 +1,77 @@
+# file jobs/tasks.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The tasks jobs run.  A task is a function taking the running Job followed
+# by the keyword arguments it was enqueued with, it reports progress with
+# job.progress() and may return a message for the admin.
+
+import imp
+
+from django.conf import settings
+from django.utils import simplejson
+from django.utils.importlib import import_module
+
+from metarho.jobs.models import Job
+
+TASKS = {}
+
+def task(name):
+    '''
+    Registers a function as the task of a name, ie::
+
+        @task('blog.rebuildcards')
+        def rebuild_cards(job, chunk_size=500):
+            ...
+
+    '''
+    def _decorator(fn):
+        TASKS[name] = fn
+        return fn
+    return _decorator
+
+_discovered = False
+
+def autodiscover():
+    '''Imports the ``jobs`` module of every installed app so its tasks are registered.'''
+    global _discovered
+    if _discovered:
+        return
+    _discovered = True
+    for app in settings.INSTALLED_APPS:
+        package = import_module(app)
+        try:
+            imp.find_module('jobs', getattr(package, '__path__', None))
+        except ImportError:
+            continue
+        import_module('%s.jobs' % app)
+
+def enqueue(name, run_after=None, max_attempts=None, **kwargs):
+    '''
+    Stores a job calling the task ``name`` with ``kwargs`` and returns it.
+
+    :param run_after: Datetime the job may not run before, now by default.
+    :param max_attempts: Times the task is tried, JOB_MAX_ATTEMPTS by default.
+
+    '''
+    autodiscover()
+    if name not in TASKS:
+        raise KeyError('No task named %s.' % name)
+    job = Job(name=name, arguments=simplejson.dumps(kwargs),
+              max_attempts=max_attempts or getattr(settings, 'JOB_MAX_ATTEMPTS', 3))
+    if run_after:
+        job.run_after = run_after
+    job.save()
+    return job
@@ -0,0 +1,101 @@
+# file jobs/tests.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from datetime import datetime
+from datetime import timedelta
+
+from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from metarho.blog.models import Post
+from metarho.jobs.models import Job
+from metarho.jobs.models import QUEUED_STATUS
+from metarho.jobs.models import RUNNING_STATUS
+from metarho.jobs.models import DONE_STATUS
+from metarho.jobs.models import FAILED_STATUS
+from metarho.jobs.tasks import task
+from metarho.jobs.tasks import enqueue
+from metarho.jobs import worker
+
+calls = []
+
+@task('jobs.test.flaky')
+def flaky(job, fail=1):
+    '''Fails the first ``fail`` attempts.'''
+    calls.append(job.attempts)
+    if job.attempts <= fail:
+        raise ValueError('Attempt %s failed.' % job.attempts)
+    for i in range(10):
+        job.progress(i + 1, 10)
+    return 'Done after %s attempts.' % job.attempts
+
+class JobTest(TestCase):
+    '''Tests queueing, running and retrying jobs.'''
+
+    fixtures = ['loremauth.json',]
+
+    def setUp(self):
+        del calls[:]
+
+    def test_retry(self):
+        '''Failed jobs are queued again until they ran max_attempts times.'''
+        job = enqueue('jobs.test.flaky', max_attempts=2, fail=1)
+        self.failUnlessEqual(1, worker.work('test', once=True), 'Expected one job to run.')
+        job = Job.objects.get(pk=job.pk)
+        self.failUnlessEqual(QUEUED_STATUS, job.status, 'Expected the job queued again but was %s' % job.status)
+        self.failUnless('Attempt 1 failed.' in job.message, 'The traceback was not kept: %s' % job.message)
+        self.failUnless(job.run_after > datetime.now(), 'The retry is not delayed.')
+        self.failUnlessEqual(0, worker.work('test', once=True), 'A delayed job ran early.')
+
+        Job.objects.filter(pk=job.pk).update(run_after=datetime.now())
+        worker.work('test', once=True)
+        job = Job.objects.get(pk=job.pk)
+        self.failUnlessEqual(DONE_STATUS, job.status, 'Expected the job done but was %s' % job.status)
+        self.failUnlessEqual('Done after 2 attempts.', job.message, 'Unexpected message %s' % job.message)
+        self.failUnlessEqual((10, 10), (job.items_done, job.items_total), 'The progress was not recorded.')
+        self.failUnlessEqual([1, 2], calls, 'Expected two attempts but ran %s' % calls)
+
+        job = enqueue('jobs.test.flaky', max_attempts=1, fail=1)
+        worker.work('test', once=True)
+        self.failUnlessEqual(FAILED_STATUS, Job.objects.get(pk=job.pk).status, 'Expected the job to fail.')
+
+    def test_stale(self):
+        '''Jobs of workers that stopped are queued again.'''
+        job = enqueue('jobs.test.flaky', fail=0)
+        claimed = worker.claim('gone')
+        self.failUnlessEqual(job.pk, claimed.pk, 'Expected the queued job to be claimed.')
+        running = Job.objects.get(pk=job.pk)
+        self.failUnlessEqual((RUNNING_STATUS, 'gone', 1), (running.status, running.worker, running.attempts),
+                             'Unexpected claimed job %s' % ((running.status, running.worker, running.attempts),))
+        self.failIf(worker.claim('other'), 'A running job was claimed twice.')
+        self.failUnlessEqual(0, worker.requeue_stale(), 'A job with recent progress was queued again.')
+        Job.objects.filter(pk=job.pk).update(heartbeat=datetime.now() - timedelta(seconds=settings.JOB_STALE_SECONDS + 1))
+        self.failUnlessEqual(1, worker.requeue_stale(), 'The stale job was not queued again.')
+        self.failUnlessEqual(QUEUED_STATUS, Job.objects.get(pk=job.pk).status, 'Expected the job queued again.')
+
+    def test_import(self):
+        '''Imports run as jobs with their progress.'''
+        path = os.path.abspath('blog/fixtures/wordpress.test.xml')
+        job = enqueue('blog.import', file=path, username=User.objects.get(pk=1).username)
+        worker.work('test', once=True)
+        job = Job.objects.get(pk=job.pk)
+        self.failUnlessEqual(DONE_STATUS, job.status, 'Expected the import done but was %s: %s' % (job.status, job.message))
+        self.failUnless(Post.objects.count(), 'No posts were imported.')
+        self.failUnless(job.items_total and job.items_done == job.items_total, 'Unexpected progress %s of %s' % (job.items_done, job.items_total))
+        self.failUnless(job.rate() > 0, 'Expected a rate but was %s' % job.rate())
@@ -0,0 +1,158 @@
+# file jobs/worker.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Runs queued jobs.  A job is claimed with an UPDATE that only matches while
+# it is still queued, so any number of workers on any number of hosts can
+# share the queue.  Every worker of a pool claims and runs jobs on its own.
+
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db import transaction
+from django.db.models import F
+
+from metarho.jobs.models import Job
+from metarho.jobs.models import QUEUED_STATUS
+from metarho.jobs.models import RUNNING_STATUS
+from metarho.jobs.models import DONE_STATUS
+from metarho.jobs.models import FAILED_STATUS
+from metarho.jobs.tasks import TASKS
+from metarho.jobs.tasks import autodiscover
+
+def worker_name(number=0):
+    '''Returns a name telling the host, process and pool slot of a worker.'''
+    return '%s:%s:%s' % (socket.gethostname(), os.getpid(), number)
+
+def claim(worker, now=None):
+    '''
+    Marks the oldest due job as run by ``worker`` and returns it, or None
+    when no job is due.  Jobs claimed by another worker in between are
+    skipped.
+
+    '''
+    now = now or datetime.now()
+    for pk in Job.objects.due(now).values_list('pk', flat=True)[:10]:
+        if Job.objects.filter(pk=pk, status=QUEUED_STATUS).update(status=RUNNING_STATUS,
+                worker=worker, attempts=F('attempts') + 1, date_started=now, heartbeat=now,
+                date_finished=None, items_done=0, items_total=None):
+            return Job.objects.get(pk=pk)
+    return None
+
+def retry_delay(attempts):
+    '''Returns the seconds before a job failed ``attempts`` times is tried again.'''
+    return getattr(settings, 'JOB_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+
+def _finish(job, status, message, **fields):
+    job.status, job.message, job.date_finished = status, message, datetime.now()
+    Job.objects.filter(pk=job.pk).update(status=status, message=message,
+                                         date_finished=job.date_finished, **fields)
+
+def execute(job):
+    '''
+    Runs a claimed job.  A failed job is queued again after retry_delay()
+    until it ran max_attempts times, the traceback is kept in its message.
+
+    '''
+    autodiscover()
+    fn = TASKS.get(job.name)
+    if fn is None:
+        _finish(job, FAILED_STATUS, 'No task named %s.' % job.name)
+        return job
+    try:
+        result = fn(job, **job.kwargs())
+    except Exception:
+        transaction.rollback_unless_managed()
+        message = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.run_after = datetime.now() + timedelta(seconds=retry_delay(job.attempts))
+            _finish(job, QUEUED_STATUS, message, run_after=job.run_after)
+        else:
+            _finish(job, FAILED_STATUS, message)
+    else:
+        if job.items_total is not None:
+            job.items_done = job.items_total
+        _finish(job, DONE_STATUS, result and unicode(result) or job.message, items_done=job.items_done)
+    return job
+
+def requeue_stale(now=None):
+    '''
+    Queues again the running jobs without progress for JOB_STALE_SECONDS,
+    their worker died.  Returns the number of jobs queued or failed.
+
+    '''
+    now = now or datetime.now()
+    stale = Job.objects.filter(status=RUNNING_STATUS,
+                               heartbeat__lt=now - timedelta(seconds=getattr(settings, 'JOB_STALE_SECONDS', 3600)))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(status=FAILED_STATUS,
+                          date_finished=now, message='The worker stopped.')
+    return failed + stale.update(status=QUEUED_STATUS, run_after=now)
+
+def work(worker, once=False, interval=5):
+    '''
+    Runs due jobs one after the other.  Waits ``interval`` seconds whenever
+    the queue is empty, or returns with ``once``.  Returns the number of
+    jobs run.
+
+    '''
+    autodiscover()
+    count = 0
+    while True:
+        job = claim(worker)
+        if job is not None:
+            execute(job)
+            count += 1
+            continue
+        if once:
+            return count
+        requeue_stale()
+        # Do not keep a connection open while idle.
+        connection.close()
+        time.sleep(interval)
+
+def _slot(number, once, interval):
+    # The name is taken in the worker so processes get their own pid.
+    try:
+        work(worker_name(number), once, interval)
+    finally:
+        connection.close()
+
+def pool(concurrency=1, processes=False, once=False, interval=5):
+    '''
+    Runs ``concurrency`` workers in threads, or in processes with
+    ``processes``, until they return.  A single worker runs in the calling
+    thread.
+
+    '''
+    if concurrency <= 1:
+        return work(worker_name(), once, interval)
+    if processes:
+        from multiprocessing import Process as runner
+        # Children must open their own connection.
+        connection.close()
+    else:
+        runner = threading.Thread
+    workers = [runner(target=_slot, args=(number, once, interval)) for number in range(concurrency)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
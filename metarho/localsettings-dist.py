@@ -33,5 +33,17 @@ DATABASE_PASSWORD = ''         # Not used with sqlite3.
 DATABASE_HOST = ''             # Set to empty string for localhost. Not used with sqlite3.
 DATABASE_PORT = ''             # Set to empty string for default. Not used with sqlite3.
 
+# Read only replicas, settings left out are those of the primary.
+# DATABASE_REPLICAS = [
+#     {'DATABASE_HOST': 'replica1.example.com'},
+# ]
+
+# Cache backend shared by every web process, worker and management command.
+# Generations, cached pages, lookups and the replica write marker are kept in
+# it, a command or a process that bumps a generation is only seen by the
+# others through it.  The default locmem:// backend is private to each
+# process, use it for development with a single process only.
+# CACHE_BACKEND = 'memcached://127.0.0.1:11211/'
+
 # Make this unique, and don't share it with anybody.
 SECRET_KEY = ''
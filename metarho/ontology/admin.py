@@ -14,16 +14,51 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from django import forms
 from django.contrib import admin
 
+from metarho.actions import bulk_form
+from metarho.ontology import bulk
 from metarho.ontology.models import Tag
 from metarho.ontology.models import Topic
 
+class MergeTagsForm(forms.Form):
+    target = forms.ModelChoiceField(Tag.objects.all(), help_text='Tag the selected tags are merged into.')
+
+class MergeTopicsForm(forms.Form):
+    target = forms.ModelChoiceField(Topic.objects.all(), help_text='Topic the selected topics are merged into.')
+
 class TagAdmin(admin.ModelAdmin):
     search_fields = ['text']
+    actions = ['merge_tags', 'delete_unused_tags']
+
+    # Bulk actions, see metarho.ontology.bulk.
+    def merge_tags(self, request, queryset):
+        return bulk_form(self, request, queryset, MergeTagsForm,
+                         lambda qs, data: bulk.merge_tags(data['target'], qs), '%s tag links moved.')
+    merge_tags.short_description = 'Merge selected tags into another tag'
+
+    def delete_unused_tags(self, request, queryset):
+        self.message_user(request, '%s unused tags deleted.' % bulk.delete_unused_tags(queryset))
+    delete_unused_tags.short_description = 'Delete selected tags without posts'
 
 class TopicAdmin(admin.ModelAdmin):
     search_fields = ['text']
+    actions = ['merge_topics', 'delete_unused_topics']
+
+    def merge_topics(self, request, queryset):
+        def apply(qs, data):
+            try:
+                return bulk.merge_topics(data['target'], qs)
+            except ValueError, e:
+                self.message_user(request, str(e))
+                return 0
+        return bulk_form(self, request, queryset, MergeTopicsForm, apply, '%s topic links moved.')
+    merge_topics.short_description = 'Merge selected topics into another topic'
+
+    def delete_unused_topics(self, request, queryset):
+        self.message_user(request, '%s unused topics deleted.' % bulk.delete_unused_topics(queryset))
+    delete_unused_topics.short_description = 'Delete selected topics without posts'
 
 
 admin.site.register(Tag, TagAdmin)
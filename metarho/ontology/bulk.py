@@ -0,0 +1,331 @@
+# file ontology/bulk.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Set based changes to tags, topics and the TaggedItem and TopicCatalog links
+# of many objects.  These write SQL directly so no signals are sent, callers
+# bump the caches, ie with metarho.caching.generations.batch.
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db import transaction
+
+from metarho import unique_slug
+from metarho.caching.generations import batch
+from metarho.ontology.models import Tag
+from metarho.ontology.models import TaggedItem
+from metarho.ontology.models import Topic
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.models import tag_by_slug
+from metarho.ontology.signals import links_changed
+
+CHUNK_SIZE = 500
+
+def chunks(values, size=CHUNK_SIZE):
+    '''Yields ``values`` as lists of at most ``size`` items.'''
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+def _params(values):
+    return ', '.join(['%s'] * len(values))
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+def _linked(link_model, field, target_ids):
+    '''Returns the primary keys of the objects linked to targets by content type id.'''
+    objects = {}
+    for chunk in chunks(target_ids):
+        for ct_id, object_id in link_model.objects.filter(**{'%s__in' % field: chunk}).order_by(
+                ).values_list('content_type', 'object_id').distinct():
+            objects.setdefault(ct_id, set()).add(object_id)
+    return objects
+
+def _changed(link_model, objects):
+    '''Sends links_changed for objects by content type id.'''
+    for ct_id, object_ids in objects.items():
+        links_changed.send(sender=link_model, content_type=ContentType.objects.get_for_id(ct_id),
+                           object_ids=sorted(object_ids))
+
+def _columns(link_model, field):
+    '''Returns the quoted table and target, content type and object columns.'''
+    qn = connection.ops.quote_name
+    opts = link_model._meta
+    return (qn(opts.db_table), qn(opts.get_field(field).column),
+            qn(opts.get_field('content_type').column), qn(opts.get_field('object_id').column))
+
+def add_links(link_model, field, content_type, object_ids, target_ids):
+    '''
+    Links every object to every target that it is not linked to yet and
+    returns the number of rows inserted.
+
+    :param link_model: TaggedItem or TopicCatalog.
+    :param field: Name of the foreign key to the target, 'tag' or 'topic'.
+    :param content_type: ContentType of the objects.
+    :param object_ids: Primary keys of the objects.
+    :param target_ids: Primary keys of the tags or topics.
+
+    '''
+    target_ids = list(target_ids)
+    if not target_ids:
+        return 0
+    rows = []
+    for ids in chunks(object_ids):
+        existing = set(link_model.objects.filter(content_type=content_type, object_id__in=ids,
+                **{'%s__in' % field: target_ids}).values_list(field, 'object_id'))
+        rows.extend([(target, content_type.pk, obj) for obj in ids for target in target_ids
+                     if (target, obj) not in existing])
+    if rows:
+        sql = 'INSERT INTO %s (%s, %s, %s) VALUES (%%s, %%s, %%s)' % _columns(link_model, field)
+        connection.cursor().executemany(sql, rows)
+        transaction.set_dirty()
+        _changed(link_model, {content_type.pk: set([obj for target, ct, obj in rows])})
+    return len(rows)
+
+def remove_links(link_model, field, content_type, object_ids, target_ids):
+    '''
+    Removes the links between the objects and the targets and returns the
+    number of rows deleted.  Arguments are as for ``add_links``.
+
+    '''
+    target_ids = list(target_ids)
+    if not target_ids:
+        return 0
+    table, target, ct, obj = _columns(link_model, field)
+    cursor = connection.cursor()
+    removed = 0
+    for ids in chunks(object_ids):
+        sql = 'DELETE FROM %s WHERE %s = %%s AND %s IN (%s) AND %s IN (%s)' % (
+            table, ct, target, _params(target_ids), obj, _params(ids))
+        cursor.execute(sql, [content_type.pk] + target_ids + ids)
+        removed += cursor.rowcount
+    transaction.set_dirty()
+    if removed:
+        _changed(link_model, {content_type.pk: set(object_ids)})
+    return removed
+
+def repoint_links(link_model, field, target_id, source_ids):
+    '''
+    Moves every link of the sources to the target with one UPDATE, then
+    deletes the duplicate links this leaves with one DELETE, keeping the
+    oldest.  Sends links_changed for the objects of the moved links and
+    returns the number of links moved.
+
+    :param link_model: TaggedItem or TopicCatalog.
+    :param field: Name of the foreign key to the target, 'tag' or 'topic'.
+    :param target_id: Primary key of the tag or topic kept.
+    :param source_ids: Primary keys of the tags or topics merged into it.
+
+    '''
+    objects = _linked(link_model, field, source_ids)
+    table, target, ct, obj = _columns(link_model, field)
+    pk = connection.ops.quote_name(link_model._meta.pk.column)
+    cursor = connection.cursor()
+    cursor.execute('UPDATE %s SET %s = %%s WHERE %s IN (%s)' % (table, target, target, _params(source_ids)),
+                   [target_id] + list(source_ids))
+    moved = cursor.rowcount
+    # The derived table lets MySQL read the table it deletes from.
+    cursor.execute('DELETE FROM %(table)s WHERE %(target)s = %%s AND %(pk)s NOT IN '
+                   '(SELECT keep FROM (SELECT MIN(%(pk)s) AS keep FROM %(table)s WHERE %(target)s = %%s '
+                   'GROUP BY %(ct)s, %(obj)s) kept)' % {'table': table, 'target': target, 'pk': pk,
+                   'ct': ct, 'obj': obj}, [target_id, target_id])
+    transaction.set_dirty()
+    _changed(link_model, objects)
+    return moved
+
+def _delete(model, ids):
+    '''Deletes rows by primary key without loading them.'''
+    qn = connection.ops.quote_name
+    cursor = connection.cursor()
+    for chunk in chunks(ids):
+        cursor.execute('DELETE FROM %s WHERE %s IN (%s)' % (qn(model._meta.db_table),
+                       qn(model._meta.pk.column), _params(chunk)), chunk)
+    transaction.set_dirty()
+
+def _delete_topics(ids):
+    '''
+    Deletes topics without loading them.  ``ids`` must hold the descendants
+    of every topic in it, their parents are cleared first so no chunk
+    deletes a topic a row of a later chunk still points to.
+
+    '''
+    for chunk in chunks(ids):
+        Topic.objects.filter(pk__in=chunk).update(parent=None)
+    _delete(Topic, ids)
+
+def _merge_tags(target_id, source_ids):
+    moved = repoint_links(TaggedItem, 'tag', target_id, source_ids)
+    _delete(Tag, source_ids)
+    return moved
+
+@batch('ontology', 'blog', tag_by_slug.generation)
+def merge_tags(target, sources):
+    '''
+    Merges tags into ``target``.  Their links are moved to it and they are
+    deleted.  Returns the number of links moved.
+
+    :param target: Tag or primary key of the tag kept.
+    :param sources: Tags or primary keys of the tags merged into it.
+
+    '''
+    target_id = _pk(target)
+    source_ids = [_pk(s) for s in sources if _pk(s) != target_id]
+    if not source_ids:
+        return 0
+    return _merge_tags(target_id, source_ids)
+
+@batch('ontology', 'blog', tag_by_slug.generation)
+def rename_tag(tag, text):
+    '''
+    Renames a tag and makes a new slug for it.  When another tag already has
+    that text or slug the tag is merged into it.  Returns the tag kept.
+
+    '''
+    slug_len = Tag._meta.get_field('slug').max_length
+    slug = unique_slug(text, set(), slug_len)
+    twins = Tag.objects.exclude(pk=tag.pk).filter(text=text) or Tag.objects.exclude(pk=tag.pk).filter(slug=slug)
+    if twins:
+        _merge_tags(twins[0].pk, [tag.pk])
+        return twins[0]
+    Tag.objects.filter(pk=tag.pk).update(text=text, slug=slug)
+    tag.text, tag.slug = text, slug
+    _changed(TaggedItem, _linked(TaggedItem, 'tag', [tag.pk]))
+    return tag
+
+@batch('ontology', 'blog', tag_by_slug.generation)
+def delete_unused_tags(tags=None):
+    '''
+    Deletes the tags without any links with one statement and returns their
+    number.
+
+    :param tags: Only consider these tags, all tags by default.
+
+    '''
+    qn = connection.ops.quote_name
+    table, pk = qn(Tag._meta.db_table), qn(Tag._meta.pk.column)
+    links, target = _columns(TaggedItem, 'tag')[:2]
+    sql = 'DELETE FROM %s WHERE NOT EXISTS (SELECT 1 FROM %s WHERE %s.%s = %s.%s)' % (
+        table, links, links, target, table, pk)
+    params = []
+    if tags is not None:
+        params = [_pk(t) for t in tags]
+        if not params:
+            return 0
+        sql += ' AND %s IN (%s)' % (pk, _params(params))
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    transaction.set_dirty()
+    return cursor.rowcount
+
+def rebuild_paths():
+    '''
+    Stores the path of every topic whose parents or slugs changed.  Topics
+    are read with one query and only changed paths are written.
+
+    '''
+    rows = dict([(pk, (parent, slug, path)) for pk, parent, slug, path
+                 in Topic.objects.order_by().values_list('pk', 'parent', 'slug', 'path')])
+    paths = {}
+    def path(pk):
+        if pk not in paths:
+            parent, slug, stored = rows[pk]
+            paths[pk] = (parent and path(parent) or '') + '%s/' % slug
+        return paths[pk]
+    changed = 0
+    for pk, (parent, slug, stored) in rows.items():
+        if path(pk) != stored:
+            Topic.objects.filter(pk=pk).update(path=path(pk))
+            changed += 1
+    return changed
+
+def _merge_topics(target_id, source_ids):
+    moved = repoint_links(TopicCatalog, 'topic', target_id, source_ids)
+    children = Topic.objects.filter(parent=target_id).values_list('pk', 'slug', 'text')
+    slugs = dict([(slug, pk) for pk, slug, text in children])
+    texts = dict([(text, pk) for pk, slug, text in children])
+    for pk, slug, text in Topic.objects.filter(parent__in=source_ids).values_list('pk', 'slug', 'text'):
+        twin = slugs.get(slug) or texts.get(text)
+        if twin:
+            moved += _merge_topics(twin, [pk])
+        else:
+            Topic.objects.filter(pk=pk).update(parent=target_id)
+            slugs[slug], texts[text] = pk, pk
+    _delete(Topic, source_ids)
+    return moved
+
+@batch('ontology', 'blog')
+def merge_topics(target, sources):
+    '''
+    Merges topics into ``target``.  Their links are moved to it, their
+    children are moved under it, children sharing a slug or text with one
+    of its own are merged as well, and paths are rebuilt.  Returns the
+    number of links moved.
+
+    :param target: Topic or primary key of the topic kept.
+    :param sources: Topics or primary keys of the topics merged into it.
+
+    Raises ValueError when the target is within one of the sources.
+
+    '''
+    target_id = _pk(target)
+    source_ids = [_pk(s) for s in sources if _pk(s) != target_id]
+    if not source_ids:
+        return 0
+    parents = dict(Topic.objects.order_by().values_list('pk', 'parent'))
+    ancestor = parents.get(target_id)
+    while ancestor is not None:
+        if ancestor in source_ids:
+            raise ValueError('Topic %s is within topic %s and cannot be merged into it.' % (target_id, ancestor))
+        ancestor = parents.get(ancestor)
+    moved = _merge_topics(target_id, source_ids)
+    rebuild_paths()
+    # Moved children are named after the target now.
+    parents = dict(Topic.objects.order_by().values_list('pk', 'parent'))
+    subtree, level = [target_id], [target_id]
+    while level:
+        level = set(level)
+        level = [pk for pk, parent in parents.items() if parent in level]
+        subtree.extend(level)
+    _changed(TopicCatalog, _linked(TopicCatalog, 'topic', subtree))
+    return moved
+
+@batch('ontology', 'blog')
+def delete_unused_topics(topics=None):
+    '''
+    Deletes topics that have no links and no descendants with links, and
+    returns their number.
+
+    :param topics: Only consider these topics, all topics by default.  A
+                   topic is kept when one of its children is kept.
+
+    '''
+    parents = dict(Topic.objects.order_by().values_list('pk', 'parent'))
+    keep = set()
+    for topic_id in TopicCatalog.objects.order_by().values_list('topic', flat=True).distinct():
+        while topic_id is not None and topic_id not in keep:
+            keep.add(topic_id)
+            topic_id = parents.get(topic_id)
+    if topics is not None:
+        considered = set([_pk(t) for t in topics])
+        for topic_id in parents:
+            if topic_id not in considered:
+                while topic_id is not None and topic_id not in keep:
+                    keep.add(topic_id)
+                    topic_id = parents.get(topic_id)
+    # A kept topic keeps its ancestors, so unused holds whole subtrees.
+    unused = [topic_id for topic_id in parents if topic_id not in keep]
+    _delete_topics(unused)
+    return len(unused)
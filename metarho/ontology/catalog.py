@@ -0,0 +1,170 @@
+# file ontology/catalog.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Resolves the generic relations of TaggedItem and TopicCatalog rows in bulk.
+
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.contrib.contenttypes.models import ContentType
+
+from metarho.caching.generations import versions
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.tree import topic_tree
+from metarho.replicas import route
+
+def published_objects(model):
+    '''
+    Returns a queryset of the publicly visible objects of a model.  Models
+    with a manager providing ``published()`` are filtered by it, all others
+    are considered public.
+
+    :param model: Model class to return the queryset for.
+
+    '''
+    manager = model._default_manager
+    if hasattr(manager, 'published'):
+        return manager.published()
+    return manager.all()
+
+def _newest_first(key):
+    # Undated objects sort last, datetimes and None can't be compared.
+    date, ct_id, pk = key
+    return (date is not None, date or datetime.min, ct_id, pk)
+
+class CatalogObjects(object):
+    '''
+    The published content objects referenced by catalog rows, newest first,
+    as a list that only loads the objects it is sliced for.  Paginator and
+    ``{% autopaginate %}`` page it like a queryset.
+
+    :param keys: List of (date, content type id, pk) tuples in order.
+    :param types: Dictionary of the models of the content type ids.
+
+    '''
+
+    def __init__(self, keys, types):
+        self.keys = keys
+        self.types = types
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._load(self.keys[index])
+        return self._load([self.keys[index]])[0]
+
+    def _load(self, keys):
+        '''Loads the objects of keys with one query per content type.'''
+        wanted = {}
+        for date, ct_id, pk in keys:
+            wanted.setdefault(ct_id, []).append(pk)
+        objects = {}
+        for ct_id, pks in wanted.items():
+            for obj in route(self.types[ct_id]._default_manager.filter(pk__in=pks)):
+                objects[(ct_id, obj.pk)] = obj
+        return [objects[(ct_id, pk)] for date, ct_id, pk in keys if (ct_id, pk) in objects]
+
+def catalog_objects(catalog):
+    '''
+    Returns the CatalogObjects referenced by a queryset of TaggedItem or
+    TopicCatalog rows.
+
+    Rows are grouped by content type and each type is resolved with a single
+    filtered query instead of one ``content_object`` lookup per row.  Only the
+    primary key and date of each object are read to order the full list, the
+    objects themselves are loaded for the slice that is shown.  Objects are
+    ordered by the ``get_latest_by`` field of their model.
+
+    :param catalog: Queryset of TaggedItem or TopicCatalog rows.
+
+    '''
+    catalog = route(catalog)
+    keys = []
+    types = {}
+    ct_ids = catalog.order_by().values_list('content_type', flat=True).distinct()
+    for ct_id in ct_ids:
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        if model is None: # Stale content type for a removed model.
+            continue
+        types[ct_id] = model
+        object_ids = catalog.filter(content_type=ct_id).values('object_id')
+        qs = published_objects(model).filter(pk__in=object_ids).order_by()
+        date_field = model._meta.get_latest_by
+        if date_field:
+            rows = qs.values_list(date_field, 'pk')
+        else:
+            rows = [(None, pk) for pk in qs.values_list('pk', flat=True)]
+        keys.extend([(date, ct_id, pk) for date, pk in rows])
+    keys.sort(key=_newest_first, reverse=True)
+    return CatalogObjects(keys, types)
+
+def resolve_catalog(catalog, page=1, per_page=20):
+    '''
+    Returns a page of the catalog_objects() of a queryset of TaggedItem or
+    TopicCatalog rows.
+
+    :param catalog: Queryset of TaggedItem or TopicCatalog rows.
+    :param page: Page number to return.
+    :param per_page: Number of objects per page.
+
+    Raises ``django.core.paginator.InvalidPage`` for pages out of range.
+
+    '''
+    return Paginator(catalog_objects(catalog), per_page).page(page)
+
+def topic_counts(model, descendants=True):
+    '''
+    Returns a dictionary of the number of published objects of ``model``
+    filed under each topic, topics without any are left out.
+
+    The distinct (topic, object) pairs are read with a single query over
+    TopicCatalog and the subtree totals are added up in memory, an object
+    filed under a topic and one of its descendants counts once.  Both
+    counts are cached until the ontology or the app of ``model`` changes.
+
+    :param model: Model class of the cataloged objects, ie Post.
+    :param descendants: Include objects filed under descendant topics.
+
+    '''
+    app_label = model._meta.app_label
+    key = 'topic-counts:%s.%s:%s' % (app_label, model._meta.object_name,
+                                     versions('ontology', app_label))
+    counts = cache.get(key)
+    if counts is None:
+        ct = ContentType.objects.get_for_model(model)
+        published = published_objects(model).order_by().values('pk')
+        pairs = route(TopicCatalog.objects.all()).filter(content_type=ct, object_id__in=published
+                ).order_by().values_list('topic', 'object_id').distinct()
+        direct = {}
+        for topic_id, object_id in pairs:
+            direct.setdefault(topic_id, set()).add(object_id)
+
+        topics = topic_tree().topics
+        subtree = {}
+        for topic_id, objects in direct.items():
+            while topic_id is not None:
+                subtree.setdefault(topic_id, set()).update(objects)
+                topic_id = topic_id in topics and topics[topic_id].parent_id or None
+        counts = {
+            'direct': dict([(t, len(o)) for t, o in direct.items()]),
+            'subtree': dict([(t, len(o)) for t, o in subtree.items()]),
+        }
+        cache.set(key, counts, getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600))
+    return counts[descendants and 'subtree' or 'direct']
@@ -0,0 +1,69 @@
+# file tidyontology.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+
+from metarho.ontology import bulk
+from metarho.ontology.models import Tag
+from metarho.ontology.tree import topic_tree
+
+USAGE = '''
+    merge-tags TARGET SOURCE [SOURCE ...]     tags are given by slug
+    merge-topics TARGET SOURCE [SOURCE ...]   topics are given by path, ie python/django/
+    rename-tag SLUG TEXT
+    delete-unused'''
+
+class Command(BaseCommand):
+    help = 'Merges, renames and deletes unused tags and topics.'
+    args = USAGE
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError('Give one of:%s' % USAGE)
+        action, args = args[0], args[1:]
+        if action == 'merge-tags' and len(args) > 1:
+            tags = [self._tag(slug) for slug in args]
+            sys.stderr.write('Moved %s tag links.\n' % bulk.merge_tags(tags[0], tags[1:]))
+        elif action == 'merge-topics' and len(args) > 1:
+            topics = [self._topic(path) for path in args]
+            try:
+                moved = bulk.merge_topics(topics[0], topics[1:])
+            except ValueError, e:
+                raise CommandError(str(e))
+            sys.stderr.write('Moved %s topic links.\n' % moved)
+        elif action == 'rename-tag' and len(args) == 2:
+            tag = bulk.rename_tag(self._tag(args[0]), args[1].decode('utf-8'))
+            sys.stderr.write('Tag is now %s (%s).\n' % (tag.text, tag.slug))
+        elif action == 'delete-unused' and not args:
+            sys.stderr.write('Deleted %s tags and %s topics.\n' % (
+                bulk.delete_unused_tags(), bulk.delete_unused_topics()))
+        else:
+            raise CommandError('Give one of:%s' % USAGE)
+
+    def _tag(self, slug):
+        try:
+            return Tag.objects.get(slug=slug)
+        except Tag.DoesNotExist:
+            raise CommandError('No tag %s.' % slug)
+
+    def _topic(self, path):
+        topic = topic_tree().by_path(path.strip('/') + '/')
+        if topic is None:
+            raise CommandError('No topic %s.' % path)
+        return topic
@@ -15,9 +15,15 @@
 # limitations under the License.
 
 from django.db import models
+from django.core.exceptions import ValidationError
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 
+from metarho import replicas
+from metarho import unique_slugify
+from metarho.caching.lookups import ModelLookup
+from metarho.caching.generations import namespace
+
 class Tag(models.Model):
     '''
     Tags for blog entries that can cross relate information between users
@@ -101,17 +107,21 @@ class Topic(models.Model):
     date_created = models.DateTimeField(auto_now_add=True)
     date_modified = models.DateTimeField(auto_now_add=True, auto_now=True)
 
+    def get_ancestors(self):
+        '''Returns the parents of this topic, the top level topic first.'''
+        ontology = []
+        target = self.parent
+        while(target is not None):
+           ontology.insert(0, target)
+           target = target.parent
+        return ontology
+
     def get_path(self):
         '''
         Constructs the path value for this topic based on hierarchy.
 
         '''
-        ontology = []
-        target = self.parent
-        while(target is not None):
-           ontology.append(target.slug)
-           target = target.parent
-        ontology.append(self.slug)
+        ontology = [t.slug for t in self.get_ancestors()] + [self.slug]
         return '%s/' % '/'.join(ontology) # Needs a trailing slash too.
 
 
@@ -133,14 +143,15 @@ class Topic(models.Model):
         super(Topic, self).save(force_insert, force_update) # Actual Save method.
 
     def __unicode__(self):
-        '''Returns the name of the Topic as a it's chained relationship.'''
-        ontology = []
-        target = self.parent
-        while(target is not None):
-           ontology.append(target.text)
-           target = target.parent
-        ontology.append(self.text)
-        return ' - '.join(ontology)
+        '''
+        Returns the name of the Topic as a it's chained relationship.  Saved
+        topics are named from the cached TopicTree without any queries.
+
+        '''
+        if self.pk is None:
+            return ' - '.join([t.text for t in self.get_ancestors()] + [self.text])
+        from metarho.ontology.tree import topic_tree
+        return topic_tree().name(self)
 
     class Meta:
         ordering = ['path']
@@ -154,4 +165,10 @@ class TopicCatalog(models.Model):
     # Generic Content Type Items
     content_type = models.ForeignKey(ContentType)
     object_id = models.PositiveIntegerField()
-    content_object = generic.GenericForeignKey('content_type', 'object_id')
\ No newline at end of file
+    content_object = generic.GenericForeignKey('content_type', 'object_id')
+
+# Cached lookup used by views on every request, topics come from the TopicTree.
+tag_by_slug = ModelLookup(Tag, 'slug')
+
+namespace('ontology').track(Tag, TaggedItem, Topic, TopicCatalog)
+replicas.track(Tag, TaggedItem, Topic, TopicCatalog)
@@ -0,0 +1,23 @@
+# file ontology/signals.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from django.dispatch import Signal
+
+# Sent by metarho.ontology.bulk after it changed the tags or topics of objects
+# with SQL, which sends no model signals.  ``sender`` is TaggedItem or
+# TopicCatalog, ``object_ids`` the primary keys of the objects of
+# ``content_type`` whose tags or topics changed.
+links_changed = Signal(providing_args=['content_type', 'object_ids'])
@@ -18,12 +18,27 @@ from django import template
 
 from metarho.ontology.models import Tag
 from metarho.ontology.models import TaggedItem
+from metarho.ontology.tree import topic_tree
+from metarho.ontology.catalog import topic_counts
+from metarho.blog.models import Post
+from metarho.caching.fragments import cached_inclusion_tag
 
 register = template.Library()
 
-@register.inclusion_tag('ontology/snippets/tag_cloud.xhtml')
+@cached_inclusion_tag(register, 'ontology/snippets/tag_cloud.xhtml', ('ontology',))
 def tag_cloud():
     '''Produces a tag cloud of tags used in the database.'''
     tags = Tag.objects.order_by('text').filter(taggeditem__isnull=False)
     total = TaggedItem.objects.all().count()
-    return {'tags': tags, 'total': total}
\ No newline at end of file
+    return {'tags': tags, 'total': total}
+
+@cached_inclusion_tag(register, 'ontology/snippets/topics_block.xhtml', ('ontology', 'blog'))
+def topics_block():
+    '''Produces a block listing the top level topics with their post counts.'''
+    counts = topic_counts(Post)
+    return {'topics': [(topic, counts.get(topic.pk, 0)) for topic in topic_tree().roots()]}
+
+@cached_inclusion_tag(register, 'ontology/snippets/topics_nav.xhtml', ('ontology',))
+def topics_nav():
+    '''Produces nav menu links to the top level topics.'''
+    return {'topics': topic_tree().roots()}
@@ -19,8 +19,16 @@
 # is more aptly tested there than here.  Tests here covers only functionality
 # completely encapsulated in this application.
 
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from metarho.ontology import bulk
 from metarho.ontology.models import Tag
+from metarho.ontology.models import TaggedItem
 from metarho.ontology.models import Topic
+from metarho.ontology.models import TopicCatalog
+from metarho.ontology.tree import topic_tree
+from metarho.instrumentation import recorder
 
 class TagTest(TestCase):
     '''Tag Model tests.'''
@@ -68,3 +76,125 @@ class TopicTest(TestCase):
         expected = 'child'
         actual = child3.slug
         self.failUnlessEqual(actual, expected, 'Child3 slug was %s but expected %s' % (actual, expected))
+
+class TopicTreeTest(TestCase):
+    '''Tests the in memory topic hierarchy.'''
+
+    def setUp(self):
+        self.python = Topic(text='Python')
+        self.python.save()
+        self.django = Topic(text='Django', parent=self.python)
+        self.django.save()
+        self.orm = Topic(text='ORM', parent=self.django)
+        self.orm.save()
+
+    def test_path(self):
+        '''Paths and names list the top level topic first.'''
+        expected = 'python/django/orm/'
+        self.failUnlessEqual(expected, self.orm.path, 'Expected path %s but was %s' % (expected, self.orm.path))
+        expected = 'Python - Django - ORM'
+        actual = unicode(Topic.objects.get(pk=self.orm.pk))
+        self.failUnlessEqual(expected, actual, 'Expected name %s but was %s' % (expected, actual))
+
+    def test_tree(self):
+        '''The tree is loaded with one query and walked without any.'''
+        rec = recorder.start()
+        try:
+            tree = topic_tree()
+            orm = tree.by_path('python/django/orm/')
+            crumbs = [t.text for t in tree.breadcrumbs(orm)]
+            children = [t.text for t in tree.children(tree.roots()[0])]
+            name = unicode(orm)
+            topic_tree()
+        finally:
+            recorder.stop()
+        self.failUnlessEqual(['Python', 'Django', 'ORM'], crumbs, 'Unexpected breadcrumbs %s' % crumbs)
+        self.failUnlessEqual(['Django'], children, 'Unexpected children %s' % children)
+        self.failUnlessEqual('Python - Django - ORM', name, 'Unexpected name %s' % name)
+        self.failUnlessEqual(1, rec.queries, 'Expected 1 query but ran %s' % rec.queries)
+
+        self.django.text = 'Flask'
+        self.django.save()
+        name = unicode(topic_tree().by_path('python/django/orm/'))
+        self.failUnlessEqual('Python - Flask - ORM', name, 'The tree was not rebuilt after a change.')
+
+class TidyTest(TestCase):
+    '''Tests merging, renaming and deleting tags and topics in SQL.'''
+
+    def setUp(self):
+        self.ct = ContentType.objects.get_for_model(Tag)
+        self.tags = []
+        for text in ['Python', 'python-2', 'PYTHON', 'Unused']:
+            tag = Tag(text=text)
+            tag.save()
+            self.tags.append(tag)
+
+    def _tag(self, tag, *object_ids):
+        for object_id in object_ids:
+            TaggedItem(tag=tag, content_type=self.ct, object_id=object_id).save()
+
+    def test_merge_tags(self):
+        '''Links are moved with a fixed number of queries and duplicates removed.'''
+        python, python2, upper, unused = self.tags
+        self._tag(python, 1, 2)
+        self._tag(python2, 2, 3)
+        self._tag(upper, 3, 4)
+        rec = recorder.start()
+        try:
+            bulk.merge_tags(python, [python2, upper])
+        finally:
+            recorder.stop()
+        self.failUnless(rec.queries <= 4, 'Expected at most 4 queries but ran %s' % rec.queries)
+        objects = sorted(TaggedItem.objects.filter(tag=python).values_list('object_id', flat=True))
+        self.failUnlessEqual([1, 2, 3, 4], objects, 'Unexpected tagged objects %s' % objects)
+        left = sorted(Tag.objects.values_list('text', flat=True))
+        self.failUnlessEqual([u'Python', u'Unused'], left, 'Unexpected tags %s' % left)
+
+        self.failUnlessEqual(1, bulk.delete_unused_tags(), 'Expected 1 unused tag to be deleted.')
+        renamed = bulk.rename_tag(python, 'Python Language')
+        self.failUnlessEqual('python-language', Tag.objects.get(pk=python.pk).slug, 'Tag slug was not renamed.')
+        other = Tag(text='Snakes')
+        other.save()
+        self._tag(other, 4, 5)
+        kept = bulk.rename_tag(other, 'Python Language')
+        self.failUnlessEqual(python.pk, kept.pk, 'Renaming to a taken text did not merge the tags.')
+        count = TaggedItem.objects.filter(tag=python).count()
+        self.failUnlessEqual(5, count, 'Expected 5 links after the merge but found %s' % count)
+
+    def test_merge_topics(self):
+        '''Children are moved or merged and paths are rebuilt.'''
+        python = Topic(text='Python')
+        python.save()
+        django = Topic(text='Django', parent=python)
+        django.save()
+        py = Topic(text='Py')
+        py.save()
+        twin = Topic(text='Django', parent=py)
+        twin.save()
+        orm = Topic(text='ORM', parent=twin)
+        orm.save()
+        for topic, object_id in [(python, 1), (py, 1), (py, 2), (twin, 3)]:
+            TopicCatalog(topic=topic, content_type=self.ct, object_id=object_id).save()
+        Topic(text='Empty', parent=python).save()
+
+        self.failUnlessRaises(ValueError, bulk.merge_topics, orm, [py])
+        bulk.merge_topics(python, [py])
+        paths = sorted(Topic.objects.values_list('path', flat=True))
+        expected = [u'python/', u'python/django/', u'python/django/orm/', u'python/empty/']
+        self.failUnlessEqual(expected, paths, 'Unexpected topic paths %s' % paths)
+        links = sorted(TopicCatalog.objects.values_list('topic', 'object_id'))
+        expected = [(python.pk, 1), (python.pk, 2), (django.pk, 3)]
+        self.failUnlessEqual(expected, links, 'Unexpected topic links %s' % links)
+        self.failUnless(topic_tree().by_path('python/django/orm/'), 'The topic tree was not rebuilt.')
+
+        self.failUnlessEqual(2, bulk.delete_unused_topics(), 'Expected 2 unused topics to be deleted.')
+        paths = sorted(Topic.objects.values_list('path', flat=True))
+        self.failUnlessEqual([u'python/', u'python/django/'], paths, 'Unexpected topic paths %s' % paths)
+
+        # Unused subtrees go with their parents cleared first, for InnoDB.
+        parent = None
+        for text in ('Deep', 'Deeper', 'Deepest'):
+            parent = Topic(text=text, parent=parent)
+            parent.save()
+        self.failUnlessEqual(3, bulk.delete_unused_topics(), 'Expected the unused subtree to be deleted.')
+        self.failIf(Topic.objects.filter(text__startswith='Deep'), 'Unused topics are left.')
@@ -0,0 +1,112 @@
+# file ontology/tree.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# The whole topic hierarchy loaded with one query and kept in memory.
+
+from django.conf import settings
+from django.core.cache import cache
+
+from metarho.caching.lru import local
+from metarho.caching.generations import namespace
+from metarho.ontology.models import Topic
+from metarho.replicas import route
+
+class TopicTree(object):
+    '''
+    All topics assembled into their hierarchy.  Each topic has its parent
+    set from the tree so walking up never queries the database.
+
+    :param topics: Every Topic, ie ``Topic.objects.all()``.
+
+    '''
+
+    def __init__(self, topics):
+        self.topics = {}
+        self._children = {}
+        for topic in topics:
+            self.topics[topic.pk] = topic
+        for topic in self.topics.values():
+            parent = self.topics.get(topic.parent_id)
+            topic._parent_cache = parent
+            self._children.setdefault(parent and parent.pk, []).append(topic)
+        for children in self._children.values():
+            children.sort(key=lambda t: t.text)
+        self._paths = dict([(self.path(t), t) for t in self.topics.values()])
+
+    def get(self, pk):
+        '''Returns the topic with a primary key or None.'''
+        return self.topics.get(pk)
+
+    def by_path(self, path):
+        '''Returns the topic with a path, ie "python/django/", or None.'''
+        return self._paths.get(path)
+
+    def roots(self):
+        '''Returns the top level topics ordered by text.'''
+        return self._children.get(None, [])
+
+    def children(self, topic):
+        '''Returns the direct children of a topic ordered by text.'''
+        return self._children.get(topic.pk, [])
+
+    def ancestors(self, topic):
+        '''Returns the parents of a topic, the top level topic first.'''
+        chain = []
+        parent = self.topics.get(topic.parent_id)
+        while parent is not None:
+            chain.append(parent)
+            parent = self.topics.get(parent.parent_id)
+        chain.reverse()
+        return chain
+
+    def breadcrumbs(self, topic):
+        '''Returns the ancestors of a topic followed by the topic itself.'''
+        return self.ancestors(topic) + [topic]
+
+    def path(self, topic):
+        '''Returns the path of a topic built from the slugs of its breadcrumbs.'''
+        return '%s/' % '/'.join([t.slug for t in self.breadcrumbs(topic)])
+
+    def name(self, topic):
+        '''Returns the display name of a topic, ie "Python - Django".'''
+        return ' - '.join([t.text for t in self.breadcrumbs(topic)])
+
+    def walk(self):
+        '''Returns every topic with each parent before its children.'''
+        ordered = []
+        level = self.roots()
+        while level:
+            ordered.extend(level)
+            level = [child for topic in level for child in self.children(topic)]
+        return ordered
+
+def topic_tree():
+    '''
+    Returns the TopicTree of the current ontology generation.  The topics
+    are kept in the cache backend and the assembled tree in the per process
+    LRU, any write to the ontology builds a new one.
+
+    '''
+    key = 'topic-tree:%s' % namespace('ontology').get()
+    tree = local.get(key)
+    if tree is None:
+        topics = cache.get(key)
+        if topics is None:
+            topics = list(route(Topic.objects.all()))
+            cache.set(key, topics, getattr(settings, 'LOOKUP_CACHE_TIMEOUT', 3600))
+        tree = TopicTree(topics)
+        local.set(key, tree)
+    return tree
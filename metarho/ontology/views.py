@@ -14,11 +14,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 
 from metarho import render_with_context
-from metarho.ontology.models import Topic
+from metarho.ontology.catalog import catalog_objects
 from metarho.ontology.models import Tag
+from metarho.ontology.models import tag_by_slug
+from metarho.ontology.tree import topic_tree
 
 # Tag Related Stuff
 def tags(request):
@@ -39,23 +41,19 @@ def tag(request, slug):
     :param slug: Tag slug to return content for.
 
     """
-    tag = get_object_or_404(Tag, slug=slug)
-
-    catalog = tag.taggeditem_set.all() # @TODO Change to published Only!!
-
-    contentlist = [item for item in catalog if item.content_object.status == 'P']
+    tag = tag_by_slug.get_or_404(slug)
 
     return render_with_context(request, 'ontology/tag_items.xhtml', {
         'title': "Items Under %s" % tag.text,
         'tag': tag,
-        'contentlist': contentlist,
+        'contentlist': catalog_objects(tag.taggeditem_set.all()),
         })
 
 # Topic Related Stuff
 def topics(request):
     """Returns a list of all top level topics for display and linking."""
 
-    topics = Topic.objects.filter(parent__isnull=True) # all top level topics.
+    topics = topic_tree().roots() # all top level topics.
 
     return render_with_context(request, 'ontology/topic_list.xhtml', {
             'title': 'All Topics',
@@ -70,4 +68,14 @@ def topic(request, path):
     :param path: Topics path value.
 
     """
-    pass
\ No newline at end of file
+    tree = topic_tree()
+    topic = tree.by_path(path)
+    if topic is None:
+        raise Http404
+
+    return render_with_context(request, 'ontology/topic_items.xhtml', {
+        'title': "Items Under %s" % topic,
+        'topic': topic,
+        'breadcrumbs': tree.breadcrumbs(topic),
+        'contentlist': catalog_objects(topic.topiccatalog_set.all()),
+        })
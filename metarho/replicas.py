@@ -0,0 +1,195 @@
+# file replicas.py
+#
+# Copyright 2010 Scott Turnbull
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#   http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Sends the read only queries of public pages to replicas of the database.
+# Django 1.1 has a single connection so a routed QuerySet is given the
+# connection of a replica, everything else keeps using the primary.
+#
+# Reads are routed only while a GET request outside REPLICA_PRIMARY_PATHS is
+# handled by ReplicaMiddleware and only when:
+#
+# * no write was made anywhere in the last REPLICA_MAX_LAG seconds, so pages
+#   and fragments cached after a write are read from the primary,
+# * the client made no write in the last REPLICA_STICKY_SECONDS, so editors
+#   read their own writes,
+# * the replica is no more than REPLICA_MAX_LAG seconds behind.
+#
+# The time of the last write is kept in the cache backend, writes made by
+# other processes are only seen when they all share it, see
+# localsettings-dist.py.
+
+import random
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signals
+from django.core.cache import cache
+from django.db import load_backend
+from django.db.models import Max
+from django.db.models import get_model
+from django.db.models import signals as model_signals
+
+DATABASE_KEYS = ('DATABASE_ENGINE', 'DATABASE_HOST', 'DATABASE_NAME', 'DATABASE_OPTIONS',
+                 'DATABASE_PASSWORD', 'DATABASE_PORT', 'DATABASE_USER', 'TIME_ZONE')
+
+# Time of the last write, shared by all processes through the cache.
+WRITTEN_KEY = 'replicas:written'
+
+# Cookie keeping a client on the primary after it made a write.
+STICKY_COOKIE = 'primary'
+
+_state = threading.local()
+
+class Replica(object):
+    '''
+    A read only copy of the primary database.
+
+    :param settings_dict: DATABASE_* settings of the replica, the ones left
+                          out are those of the primary.
+
+    '''
+
+    def __init__(self, settings_dict):
+        self.settings_dict = dict([(key, getattr(settings, key)) for key in DATABASE_KEYS])
+        self.settings_dict.update(settings_dict)
+        backend = load_backend(self.settings_dict['DATABASE_ENGINE'])
+        self.DatabaseError = backend.DatabaseError
+        # The wrapper is thread local, each thread opens its own connection.
+        self.connection = backend.DatabaseWrapper(self.settings_dict)
+        self.checked = None
+        self.healthy = True
+
+    def on(self, queryset):
+        '''Returns a copy of a queryset whose queries run on the replica.'''
+        queryset = queryset._clone()
+        queryset.query.connection = self.connection
+        return queryset
+
+    def lag(self):
+        '''
+        Returns for how many seconds the replica has been missing the newest
+        write to REPLICA_LAG_MODEL, 0 when it has it.
+
+        '''
+        model = get_model(*getattr(settings, 'REPLICA_LAG_MODEL', 'blog.Post').split('.'))
+        field = getattr(settings, 'REPLICA_LAG_FIELD', 'date_modified')
+        objects = model._default_manager.order_by()
+        latest = objects.aggregate(latest=Max(field))['latest']
+        copied = self.on(objects).aggregate(latest=Max(field))['latest']
+        if latest is None or (copied is not None and copied >= latest):
+            return 0
+        behind = datetime.now() - latest
+        return max(behind.days * 86400 + behind.seconds, 0)
+
+    def available(self):
+        '''
+        Returns whether the replica is reachable and within REPLICA_MAX_LAG,
+        measured at most every REPLICA_CHECK_INTERVAL seconds.
+
+        '''
+        now = time.time()
+        if self.checked is None or now - self.checked >= getattr(settings, 'REPLICA_CHECK_INTERVAL', 5):
+            self.checked = now
+            try:
+                self.healthy = self.lag() <= getattr(settings, 'REPLICA_MAX_LAG', 30)
+            except self.DatabaseError:
+                self.connection.close()
+                self.healthy = False
+        return self.healthy
+
+_replicas = None
+
+def replicas():
+    '''Returns the Replicas of DATABASE_REPLICAS.'''
+    global _replicas
+    if _replicas is None:
+        _replicas = [Replica(d) for d in getattr(settings, 'DATABASE_REPLICAS', [])]
+    return _replicas
+
+def route(queryset):
+    '''
+    Returns ``queryset`` running on a replica when the current request may
+    read from one, otherwise returns it unchanged.  All the queries of a
+    request go to the same replica.
+
+    '''
+    if not getattr(_state, 'reads', False):
+        return queryset
+    if getattr(_state, 'replica', None) is None:
+        healthy = [r for r in replicas() if r.available()]
+        _state.replica = healthy and random.choice(healthy) or False
+    if not _state.replica:
+        return queryset
+    return _state.replica.on(queryset)
+
+def written(**kwargs):
+    '''
+    Records a write, usable as a signal receiver.  The rest of the request
+    and every request for the next REPLICA_MAX_LAG seconds read from the
+    primary.
+
+    '''
+    _state.reads = False
+    _state.wrote = True
+    if replicas():
+        max_lag = getattr(settings, 'REPLICA_MAX_LAG', 30)
+        cache.set(WRITTEN_KEY, time.time(), max_lag)
+
+def track(*models):
+    '''
+    Records a write whenever an instance of ``models`` is saved or deleted.
+    Only content shown on public pages is tracked, sessions, logins and
+    jobs are written all the time and would keep every read on the primary.
+
+    '''
+    for model in models:
+        uid = 'replicas.written:%s.%s' % (model._meta.app_label, model._meta.object_name)
+        model_signals.post_save.connect(written, sender=model, dispatch_uid=uid)
+        model_signals.post_delete.connect(written, sender=model, dispatch_uid=uid)
+
+def _close(**kwargs):
+    for replica in _replicas or []:
+        replica.connection.close()
+signals.request_finished.connect(_close, dispatch_uid='replicas.close')
+
+class ReplicaMiddleware(object):
+    '''
+    Lets public GET requests read from the replicas, see ``route``.  Any
+    other request keeps the client on the primary for
+    REPLICA_STICKY_SECONDS.
+
+    '''
+
+    def process_request(self, request):
+        _state.replica = None
+        _state.wrote = False
+        paths = getattr(settings, 'REPLICA_PRIMARY_PATHS', ('/admin',))
+        _state.reads = bool(replicas() and request.method in ('GET', 'HEAD')
+                            and STICKY_COOKIE not in request.COOKIES
+                            and not [p for p in paths if request.path.startswith(p)])
+        if _state.reads:
+            last = cache.get(WRITTEN_KEY)
+            if last and time.time() - last < getattr(settings, 'REPLICA_MAX_LAG', 30):
+                _state.reads = False
+
+    def process_response(self, request, response):
+        if replicas() and (request.method not in ('GET', 'HEAD') or getattr(_state, 'wrote', False)):
+            response.set_cookie(STICKY_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 60))
+        _state.reads = _state.wrote = False
+        _state.replica = None
+        return response
@@ -87,11 +87,67 @@ TEMPLATE_CONTEXT_PROCESSORS = (
 
 MIDDLEWARE_CLASSES = (
     'django.middleware.common.CommonMiddleware',
+    'metarho.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'pagination.middleware.PaginationMiddleware',
+    'metarho.instrumentation.middleware.InstrumentationMiddleware',
 )
 
+# Fraction of requests measured by the instrumentation middleware.  Measured
+# requests get X-SQL-* headers, unless they are streamed, and are aggregated
+# on the staff stats page.
+INSTRUMENTATION_SAMPLE_RATE = 0.01
+
+# Seconds a response version and its compressed variants stay cached and the
+# largest response in bytes that is cached, see metarho.caching.variants.
+CACHE_VARIANTS_TIMEOUT = 600
+CACHE_VARIANTS_MAX_SIZE = 1024 * 1024
+
+# Model lookups kept in the per process LRU in front of the cache backend, how
+# many seconds they stay there and in the cache backend, see
+# metarho.caching.lookups.
+LOOKUP_CACHE_SIZE = 1000
+LOOKUP_CACHE_LOCAL_TIMEOUT = 30
+LOOKUP_CACHE_TIMEOUT = 3600
+
+# Seconds the rendered sidebar blocks stay cached, 0 renders them every time.
+# They are rendered again as soon as the models they show change, see
+# metarho.caching.fragments.
+FRAGMENT_CACHE_TIMEOUT = 600
+
+# Read only replicas of the database for public GET requests, a list of
+# dictionaries of DATABASE_* settings, see metarho.replicas.  Replicas more
+# than REPLICA_MAX_LAG seconds behind the newest write to REPLICA_LAG_MODEL
+# are skipped, checked every REPLICA_CHECK_INTERVAL seconds.  Clients that
+# wrote stay on the primary for REPLICA_STICKY_SECONDS.
+DATABASE_REPLICAS = []
+REPLICA_MAX_LAG = 30
+REPLICA_CHECK_INTERVAL = 5
+REPLICA_STICKY_SECONDS = 60
+REPLICA_LAG_MODEL = 'blog.Post'
+REPLICA_PRIMARY_PATHS = ('/admin',)
+
+# Background jobs, see metarho.jobs.  Failed jobs are tried JOB_MAX_ATTEMPTS
+# times, JOB_RETRY_DELAY seconds apart doubling each time.  Progress is
+# written at most every JOB_PROGRESS_INTERVAL seconds and running jobs
+# without progress for JOB_STALE_SECONDS are queued again.
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 60
+JOB_PROGRESS_INTERVAL = 2
+JOB_STALE_SECONDS = 3600
+
+# Fingerprinted copies of the media written by buildassets, see
+# metarho.assets.  Their hashed names are served under ASSETS_URL and cached
+# by clients for ASSETS_MAX_AGE seconds.  Processes check the manifest of the
+# build for changes every ASSETS_CHECK_INTERVAL seconds.
+ASSETS_SOURCE = path.join(BASE_DIR, '../media')
+ASSETS_ROOT = path.join(BASE_DIR, '../assets')
+ASSETS_URL = '/assets/'
+ASSETS_MAX_AGE = 60 * 60 * 24 * 365
+ASSETS_CHECK_INTERVAL = 5
+
+
 ROOT_URLCONF = 'metarho.urls'
 
 TEMPLATE_DIRS = (
@@ -112,6 +168,9 @@ INSTALLED_APPS = (
     'metarho.sitemeta',
     'metarho.blog',
     'metarho.ontology',
+    'metarho.instrumentation',
+    'metarho.jobs',
+    'metarho.assets',
 )
 
 EXTENSION_DIRS = (
@@ -18,17 +18,16 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 
+from metarho import replicas
 from metarho import unique_slugify
-
-SITE_CACHE = {}
+from metarho.caching.lookups import ModelLookup
+from metarho.caching.generations import namespace
 
 class SiteInformation(models.Model):
     '''
     This sets information about the site in general terms and provides defaults
     for use throughout the site.
 
-    @TODO Set this information in the site cache for better performance.
-    
     '''
     title = models.CharField(max_length=75)
     site = models.ForeignKey(Site, help_text='Which Site is this  related to?')
@@ -49,10 +48,6 @@ class SiteInformation(models.Model):
     def save(self, force_insert=False, force_update=False):
         '''Custom save method performs some needed juggling of the object.'''
 
-        # Make sure cached info is synced with current state of the object.
-        if self.pk in SITE_CACHE:
-            del SITE_CACHE[self.pk]
-
         if self.default: # Make sure there is only one default site information.
             SiteInformation.objects.all().update(default=False)
 
@@ -60,8 +55,14 @@ class SiteInformation(models.Model):
              unique_slugify(self, self.title)
         super(SiteInformation, self).save(force_insert, force_update)
 
-    def delete(self):
-        """Delete needs to interact with cache as well."""
-        super(Site, self).delete()
-        if self.pk in SITE_CACHE:
-            del SITE_CACHE[self.pk]
\ No newline at end of file
+# Cached lookup of the default SiteInformation with its site.  The owner is
+# left out so their password hash never reaches the cache, read them through
+# metarho.blog.models.authors.
+site_information = ModelLookup(SiteInformation, 'default', related=('site',), depends=(Site,))
+
+def default_site_information():
+    '''Returns the default SiteInformation or None when there is none.'''
+    return site_information.get(True)
+
+namespace('sitemeta').track(SiteInformation, Site)
+replicas.track(SiteInformation, Site)
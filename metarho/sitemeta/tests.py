@@ -19,6 +19,7 @@ from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
 
 from metarho.sitemeta.models import SiteInformation
+from metarho.sitemeta.models import default_site_information
 from metarho.blog.importer import WordPressExportParser
 
 class WordPressExportParserTest(TestCase):
@@ -43,3 +44,16 @@ class WordPressExportParserTest(TestCase):
         si = SiteInformation.objects.get(slug='streamweavers-blog')
         expected = 'Just another WordPress.com weblog'
         self.failUnlessEqual(expected, si.description, 'Expected description to read %s but returned %s' % (expected, si.description))
+
+class SiteInformationTest(TestCase):
+    '''Tests the cached lookup of the default site information.'''
+
+    fixtures = ['loremauth.json',]
+
+    def test_lookup(self):
+        '''The site information is cached without its owner.'''
+        info = SiteInformation(title='Cached Site', site=Site.objects.get_current(), owner=User.objects.get(pk=1))
+        info.save()
+        cached = default_site_information()
+        self.failUnlessEqual(info.pk, cached.pk, 'Looked up the wrong site information.')
+        self.failIf(hasattr(cached, '_owner_cache'), 'The owner was cached with the site information.')
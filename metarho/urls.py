@@ -24,6 +24,7 @@ admin.autodiscover()
 urlpatterns = patterns('',
     url(r'^$', 'metarho.blog.views.post_all', name='site-index'),
     (r'^admin/', include(admin.site.urls)),
+    url(r'^admin-stats/$', 'metarho.instrumentation.views.stats', name='instrumentation-stats'),
     #(r'tag/', include("metarho.ontology.tag_urls", namespace="tag")),
     #(r'topic/', include("metarho.ontology.topic_urls", namespace="topic")),
     (r'^', include("metarho.blog.urls", namespace="blog")),
@@ -36,4 +37,5 @@ if settings.DEV_ENV:
         (r'^sitemedia/(?P<path>.*)$', 'django.views.static.serve', {
             'document_root': path.join(settings.BASE_DIR, '../media')
             }),
+        (r'^%s(?P<path>.*)$' % settings.ASSETS_URL.lstrip('/'), 'metarho.assets.views.serve'),
     )